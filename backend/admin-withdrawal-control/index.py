@@ -1,6 +1,6 @@
 import json
 import os
-import psycopg2
+from db_pool import get_db_connection
 from datetime import datetime
 from typing import Dict, Any
 
@@ -48,7 +48,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(dsn)
+    conn = get_db_connection()
     cur = conn.cursor()
     
     try:
@@ -6,19 +6,13 @@ Returns: HTTP response dict с результатами операций или
 '''
 
 import json
-import os
 from typing import Dict, Any, List
 from datetime import datetime, timezone
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 
 SCHEMA = 't_p32599880_plugin_site_developm'
 
-def get_db_connection():
-    """Получить подключение к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-
 def serialize_datetime(obj):
     """Сериализация datetime объектов в ISO формат с UTC"""
     if isinstance(obj, datetime):
@@ -40,6 +34,34 @@ def log_admin_action(admin_id: str, action_type: str, target_type: str, target_i
         (admin_id, action_type, target_type, target_id, details)
     )
 
+def bump_cache_version(cur, name: str):
+    """Увеличить версию кэша, чтобы другие функции перестроили его (см. forum/category_cache.py)"""
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.cache_versions (name, version)
+        VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE
+        SET version = {SCHEMA}.cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (name,))
+
+def refresh_topic_comment_stats(cur, topic_ids=None):
+    """Пересчитать comments_count/last_comment_at тем (всех, если topic_ids не указан)"""
+    if topic_ids is not None and not topic_ids:
+        return
+    topics_filter = "WHERE t.id = ANY(%s)" if topic_ids is not None else ""
+    cur.execute(f"""
+        UPDATE {SCHEMA}.forum_topics ft
+        SET comments_count = stats.comments_count,
+            last_comment_at = stats.last_comment_at
+        FROM (
+            SELECT t.id, COUNT(fc.id) AS comments_count, MAX(fc.created_at) AS last_comment_at
+            FROM {SCHEMA}.forum_topics t
+            LEFT JOIN {SCHEMA}.forum_comments fc ON fc.topic_id = t.id AND fc.removed_at IS NULL
+            {topics_filter}
+            GROUP BY t.id
+        ) stats
+        WHERE ft.id = stats.id
+    """, (list(topic_ids),) if topic_ids is not None else None)
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -59,7 +81,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     headers = event.get('headers', {})
     user_id = headers.get('X-User-Id') or headers.get('x-user-id')
     
-    conn = get_db_connection()
+    conn = get_db_connection(cursor_factory=RealDictCursor)
     cur = conn.cursor()
     
     try:
@@ -403,7 +425,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     cur.execute(f"DELETE FROM {SCHEMA}.security_logs WHERE user_id = %s", (target_user_id,))
                 except: pass
                 try:
-                    cur.execute(f"DELETE FROM {SCHEMA}.forum_comments WHERE author_id = %s", (target_user_id,))
+                    cur.execute(f"DELETE FROM {SCHEMA}.forum_comments WHERE author_id = %s RETURNING topic_id", (target_user_id,))
+                    refresh_topic_comment_stats(cur, {row['topic_id'] for row in cur.fetchall() if row['topic_id']})
                 except: pass
                 try:
                     cur.execute(f"DELETE FROM {SCHEMA}.forum_topics WHERE author_id = %s", (target_user_id,))
@@ -470,6 +493,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         SET username = %s, 
                             email = %s, 
                             avatar_url = NULL, 
+                            avatar_sha256 = NULL, 
                             vk_url = NULL, 
                             telegram = NULL, 
                             discord = NULL, 
@@ -954,6 +978,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 cur.execute(f"DELETE FROM {SCHEMA}.escrow_messages WHERE sender_id != %s", (admin_id_int,))
                 cur.execute(f"DELETE FROM {SCHEMA}.forum_comments WHERE author_id != %s", (admin_id_int,))
                 cur.execute(f"DELETE FROM {SCHEMA}.forum_topics WHERE author_id != %s", (admin_id_int,))
+                refresh_topic_comment_stats(cur)
                 cur.execute(f"DELETE FROM {SCHEMA}.messages WHERE sender_id != %s AND receiver_id != %s", (admin_id_int, admin_id_int))
                 cur.execute(f"DELETE FROM {SCHEMA}.referrals WHERE referrer_id != %s AND referred_id != %s", (admin_id_int, admin_id_int))
                 cur.execute(f"DELETE FROM {SCHEMA}.support_tickets WHERE user_id != %s", (admin_id_int,))
@@ -1006,6 +1031,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     
                     new_category = cur.fetchone()
                     log_admin_action(user_id, 'create_category', 'forum_category', new_category['id'], f'Category: {name}', cur)
+                    bump_cache_version(cur, 'forum_categories')
                     conn.commit()
                     
                     return {
@@ -1063,6 +1089,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 
                 cur.execute(f"DELETE FROM {SCHEMA}.forum_categories WHERE id = %s", (category_id,))
                 log_admin_action(user_id, 'delete_category', 'forum_category', category_id, f'Category: {category["name"]}', cur)
+                bump_cache_version(cur, 'forum_categories')
                 conn.commit()
                 
                 return {
@@ -1163,9 +1190,12 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             elif target_type == 'comment':
                 cur.execute(
-                    f"UPDATE {SCHEMA}.forum_comments SET removed_at = CURRENT_TIMESTAMP, removed_by = %s WHERE id = %s",
+                    f"UPDATE {SCHEMA}.forum_comments SET removed_at = CURRENT_TIMESTAMP, removed_by = %s WHERE id = %s AND removed_at IS NULL RETURNING topic_id",
                     (user_id, target_id)
                 )
+                removed = cur.fetchone()
+                if removed:
+                    refresh_topic_comment_stats(cur, [removed['topic_id']])
                 log_admin_action(user_id, 'remove_comment', 'comment', int(target_id), '', cur)
             
             else:
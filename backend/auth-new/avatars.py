@@ -0,0 +1,123 @@
+"""
+Аватары пользователей в blob_store
+Загруженная картинка сохраняется один раз под своим SHA-256, из неё сразу
+делаются квадратные JPEG-копии AVATAR_SIZES (центральная обрезка), которые
+записываются в blob_derivatives с format = 'avatar'. В users.avatar_url
+хранится короткий адрес /api/file?avatar=<sha256> - списки тем, комментариев
+и сделок больше не тянут картинку в каждой строке. Адрес меняется вместе с
+картинкой, поэтому file-proxy отдаёт копии с бессрочным кэшем и ETag.
+Одинаковые картинки разных пользователей хранятся и уменьшаются один раз.
+
+Использование:
+    from avatars import store_avatar, AvatarError          # auth-new (upload_avatar)
+    from avatars import parse_avatar_request               # file-proxy (?avatar=...&s=...)
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import re
+from typing import Dict, Optional, Tuple
+
+from blob_store import blob_exists, put_blob, register_blob
+
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_DEFAULT_SIZE = 128
+AVATAR_FORMAT = 'avatar'
+AVATAR_CONTENT_TYPE = 'image/jpeg'
+AVATAR_MAX_BYTES = 5 * 1024 * 1024
+AVATAR_QUALITY = 85
+AVATAR_MAX_PIXELS = 40_000_000
+AVATAR_URL_PREFIX = '/api/file?avatar='
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class AvatarError(Exception):
+    """Некорректная картинка аватара"""
+
+
+def avatar_url(sha256: str) -> str:
+    return f'{AVATAR_URL_PREFIX}{sha256}'
+
+
+def parse_avatar_request(sha256: Optional[str], size: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(sha256, сторона копии) для ?avatar=...&s=...; None - некорректный ключ"""
+    if not sha256 or not _SHA256_RE.match(sha256):
+        return None
+    try:
+        requested = int(size) if size else AVATAR_DEFAULT_SIZE
+    except (TypeError, ValueError):
+        requested = AVATAR_DEFAULT_SIZE
+    return sha256, next((s for s in AVATAR_SIZES if s >= requested), AVATAR_SIZES[-1])
+
+
+def decode_data_url(value: str) -> bytes:
+    """Байты картинки из data URL (data:image/...;base64,...)"""
+    if not isinstance(value, str) or not value.startswith('data:image/'):
+        raise AvatarError('Аватар должен быть изображением')
+    header, _, data = value.partition(',')
+    if ';base64' not in header:
+        raise AvatarError('Аватар должен быть передан в base64')
+    if len(data) > 4 * (AVATAR_MAX_BYTES // 3 + 1):
+        raise AvatarError('Размер аватара не должен превышать 5MB')
+    try:
+        return base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise AvatarError('Некорректные данные изображения')
+
+
+def make_avatar_variants(data: bytes) -> Dict[int, bytes]:
+    """Квадратные JPEG-копии всех размеров AVATAR_SIZES"""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = AVATAR_MAX_PIXELS
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        variants = {}
+        for size in AVATAR_SIZES:
+            square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            output = io.BytesIO()
+            square.save(output, 'JPEG', quality=AVATAR_QUALITY, optimize=True)
+            variants[size] = output.getvalue()
+        return variants
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise AvatarError('Не удалось обработать изображение')
+
+
+def store_avatar(cur, data: bytes) -> str:
+    """Сохранить аватар и его копии, вернуть SHA-256 оригинала"""
+    if len(data) > AVATAR_MAX_BYTES:
+        raise AvatarError('Размер аватара не должен превышать 5MB')
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    cur.execute(
+        "SELECT COUNT(*) FROM blob_derivatives WHERE source_sha256 = %s AND format = %s",
+        (sha256, AVATAR_FORMAT)
+    )
+    if cur.fetchone()[0] == len(AVATAR_SIZES) and blob_exists(sha256):
+        return sha256
+
+    variants = make_avatar_variants(data)
+    put_blob(data)
+    register_blob(cur, sha256, len(data))
+    for size, variant in variants.items():
+        variant_sha256 = put_blob(variant)
+        register_blob(cur, variant_sha256, len(variant))
+        cur.execute("""
+            INSERT INTO blob_derivatives (source_sha256, width, format, derivative_sha256, size, content_type)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (source_sha256, width, format) DO NOTHING
+        """, (sha256, size, AVATAR_FORMAT, variant_sha256, len(variant), AVATAR_CONTENT_TYPE))
+    return sha256
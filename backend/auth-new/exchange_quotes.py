@@ -0,0 +1,139 @@
+"""
+Котировки для обмена USDT <-> криптовалюта (action=get_quote)
+Цена берётся на сервере из кэша price_oracle с теми же наценками, что и в
+crypto-prices, и возвращается клиенту в виде подписанного quote_id
+(base64url(JSON) + HMAC-SHA256). Действия exchange_* принимают только
+quote_id: подпись, срок жизни QUOTE_TTL, пользователь и направление сделки
+проверяются без обращения к БД и внешним API. Котировка одноразовая: её nonce
+записывается в used_quotes в транзакции сделки (consume_quote), повторный
+обмен по той же котировке отклоняется.
+
+Секрет подписи - обязательная переменная окружения QUOTE_SIGNING_SECRET,
+общая для всех контейнеров. Без неё котировки не выдаются и не принимаются.
+
+Использование:
+    from exchange_quotes import issue_quote, verify_quote, consume_quote, QuoteError
+
+    quote = issue_quote(user_id, 'BTC', 'buy')
+    quote = verify_quote(quote_id, user_id, 'buy')
+    consume_quote(cur, quote, user_id)  # до изменения балансов, затем commit
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Any, Dict
+
+from price_oracle import SYMBOLS, PriceUnavailableError, get_price
+
+QUOTE_TTL = int(os.environ.get('QUOTE_TTL', '90'))
+
+BUY_MARKUP = 0.5   # +0.5% для покупки криптовалюты, как в crypto-prices
+SELL_DISCOUNT = 0.5  # -0.5% для продажи криптовалюты
+
+QUOTE_SIDES = ('buy', 'sell')
+
+_secret = os.environ.get('QUOTE_SIGNING_SECRET', '').encode()
+if not _secret:
+    print('[QUOTES] QUOTE_SIGNING_SECRET not configured, exchange disabled')
+
+
+class QuoteError(Exception):
+    """Котировка не может быть выдана или недействительна"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    if not _secret:
+        raise QuoteError('Обмен временно недоступен')
+    return _b64encode(hmac.new(_secret, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_quote(user_id: Any, crypto_symbol: str, side: str) -> Dict[str, Any]:
+    """Выдать котировку пользователю"""
+    if crypto_symbol not in SYMBOLS:
+        raise QuoteError('Неподдерживаемая криптовалюта')
+    if side not in QUOTE_SIDES:
+        raise QuoteError('Неверное направление обмена')
+
+    try:
+        real_price = get_price(crypto_symbol)
+    except PriceUnavailableError:
+        raise QuoteError('Не удалось получить курс, попробуйте позже')
+
+    if side == 'buy':
+        price = round(real_price * (1 + BUY_MARKUP / 100), 8)
+    else:
+        price = round(real_price * (1 - SELL_DISCOUNT / 100), 8)
+
+    expires_at = int(time.time()) + QUOTE_TTL
+    payload = _b64encode(json.dumps({
+        'u': str(user_id),
+        's': crypto_symbol,
+        'd': side,
+        'p': price,
+        'e': expires_at,
+        'n': secrets.token_hex(16)
+    }, separators=(',', ':')).encode())
+
+    return {
+        'quote_id': f'{payload}.{_sign(payload)}',
+        'crypto_symbol': crypto_symbol,
+        'side': side,
+        'price': price,
+        'expires_at': expires_at,
+        'ttl': QUOTE_TTL
+    }
+
+
+def verify_quote(quote_id: Any, user_id: Any, side: str) -> Dict[str, Any]:
+    """Проверить котировку, вернуть {'crypto_symbol', 'price', 'nonce', 'expires_at'}"""
+    if not isinstance(quote_id, str) or '.' not in quote_id:
+        raise QuoteError('Некорректная котировка')
+
+    payload, signature = quote_id.rsplit('.', 1)
+    if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        raise QuoteError('Некорректная котировка')
+
+    try:
+        data = json.loads(_b64decode(payload))
+    except ValueError:
+        raise QuoteError('Некорректная котировка')
+
+    if data.get('u') != str(user_id) or data.get('d') != side:
+        raise QuoteError('Котировка выдана для другой операции')
+    if data.get('e', 0) < time.time() or not data.get('n'):
+        raise QuoteError('Котировка устарела, запросите курс заново')
+
+    return {
+        'crypto_symbol': data['s'],
+        'price': float(data['p']),
+        'nonce': data['n'],
+        'expires_at': data['e']
+    }
+
+
+def consume_quote(cur, quote: Dict[str, Any], user_id: Any) -> None:
+    """Отметить котировку использованной в текущей транзакции сделки"""
+    cur.execute("DELETE FROM used_quotes WHERE expires_at < NOW() - INTERVAL '1 minute'")
+    # Параллельный обмен с тем же nonce ждёт на первичном ключе до фиксации
+    # первой сделки и затем получает конфликт
+    cur.execute(
+        """INSERT INTO used_quotes (nonce, user_id, expires_at)
+        VALUES (%s, %s, to_timestamp(%s)::timestamp)
+        ON CONFLICT (nonce) DO NOTHING""",
+        (quote['nonce'], user_id, quote['expires_at'])
+    )
+    if cur.rowcount == 0:
+        raise QuoteError('Котировка уже использована, запросите курс заново')
@@ -3,16 +3,12 @@
 '''
 
 import json
-import os
-import psycopg2
 from datetime import datetime
 import secrets
 import hashlib
-
-def get_db_connection():
-    """Подключение к базе данных"""
-    dsn = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(dsn)
+from db_pool import get_db_connection
+from exchange_quotes import issue_quote, verify_quote, consume_quote, QuoteError
+from rate_limit import rate_limited
 
 def hash_password(password):
     """Хеширование пароля"""
@@ -22,6 +18,8 @@ def generate_token():
     """Генерация токена авторизации"""
     return secrets.token_urlsafe(32)
 
+# Запрос без action обработчик выполняет как login - и лимит у него как у входа
+@rate_limited(default_action='login')
 def handler(event, context):
     """Обработчик авторизации и регистрации"""
     
@@ -333,13 +331,40 @@ def handler(event, context):
                 'isBase64Encoded': False
             }
         
+        elif action == 'get_quote':
+            user_id = event.get('headers', {}).get('X-User-Id') or event.get('headers', {}).get('x-user-id')
+            
+            if not user_id:
+                return {
+                    'statusCode': 401,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': 'Требуется авторизация'}),
+                    'isBase64Encoded': False
+                }
+            
+            try:
+                quote = issue_quote(user_id, body.get('crypto_symbol'), body.get('side'))
+            except QuoteError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
+            
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': json.dumps({'success': True, **quote}),
+                'isBase64Encoded': False
+            }
+        
         elif action == 'exchange_usdt_to_crypto':
             user_id = event.get('headers', {}).get('X-User-Id') or event.get('headers', {}).get('x-user-id')
             usdt_amount = body.get('usdt_amount')
-            crypto_symbol = body.get('crypto_symbol')
-            crypto_price = body.get('crypto_price')
+            quote_id = body.get('quote_id')
             
-            if not user_id or not usdt_amount or not crypto_symbol or not crypto_price:
+            if not user_id or not usdt_amount or not quote_id:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
@@ -347,6 +372,21 @@ def handler(event, context):
                     'isBase64Encoded': False
                 }
             
+            # Курс только из подписанной котировки сервера; котировка
+            # расходуется вместе со сделкой и откатывается, если сделки нет
+            try:
+                quote = verify_quote(quote_id, user_id, 'buy')
+                consume_quote(cur, quote, user_id)
+            except QuoteError as e:
+                return {
+                    'statusCode': 409,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': str(e), 'requote': True}),
+                    'isBase64Encoded': False
+                }
+            crypto_symbol = quote['crypto_symbol']
+            crypto_price = quote['price']
+            
             cur.execute("SELECT balance FROM users WHERE id = %s", (user_id,))
             user = cur.fetchone()
             
@@ -390,10 +430,9 @@ def handler(event, context):
         elif action == 'exchange_crypto_to_usdt':
             user_id = event.get('headers', {}).get('X-User-Id') or event.get('headers', {}).get('x-user-id')
             crypto_amount = body.get('crypto_amount')
-            crypto_symbol = body.get('crypto_symbol')
-            crypto_price = body.get('crypto_price')
+            quote_id = body.get('quote_id')
             
-            if not user_id or not crypto_amount or not crypto_symbol or not crypto_price:
+            if not user_id or not crypto_amount or not quote_id:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
@@ -401,6 +440,21 @@ def handler(event, context):
                     'isBase64Encoded': False
                 }
             
+            # Курс только из подписанной котировки сервера; котировка
+            # расходуется вместе со сделкой и откатывается, если сделки нет
+            try:
+                quote = verify_quote(quote_id, user_id, 'sell')
+                consume_quote(cur, quote, user_id)
+            except QuoteError as e:
+                return {
+                    'statusCode': 409,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': str(e), 'requote': True}),
+                    'isBase64Encoded': False
+                }
+            crypto_symbol = quote['crypto_symbol']
+            crypto_price = quote['price']
+            
             balance_field = f"{crypto_symbol.lower()}_balance"
             cur.execute(f"SELECT balance, {balance_field} FROM users WHERE id = %s", (user_id,))
             user = cur.fetchone()
@@ -662,6 +716,63 @@ def handler(event, context):
                 'isBase64Encoded': False
             }
         
+        elif action == 'upload_avatar':
+            user_id = event.get('headers', {}).get('X-User-Id') or event.get('headers', {}).get('x-user-id')
+
+            if not user_id:
+                return {
+                    'statusCode': 401,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': 'Требуется авторизация'}),
+                    'isBase64Encoded': False
+                }
+
+            # Картинка сохраняется в blob_store, в users остаётся только короткий адрес.
+            # Импорт здесь: без настроенного хранилища ломается только загрузка аватара
+            from avatars import AvatarError, avatar_url, decode_data_url, store_avatar
+            from blob_store import BlobStoreConfigError
+            try:
+                avatar_sha256 = store_avatar(cur, decode_data_url(body.get('image')))
+            except AvatarError as e:
+                conn.rollback()
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
+            except BlobStoreConfigError as e:
+                conn.rollback()
+                print(f'[AVATARS] {e}')
+                return {
+                    'statusCode': 503,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': 'Загрузка аватаров временно недоступна'}),
+                    'isBase64Encoded': False
+                }
+
+            cur.execute(
+                "UPDATE users SET avatar_url = %s, avatar_sha256 = %s WHERE id = %s RETURNING avatar_url",
+                (avatar_url(avatar_sha256), avatar_sha256, user_id)
+            )
+            updated = cur.fetchone()
+            if not updated:
+                conn.rollback()
+                return {
+                    'statusCode': 404,
+                    'headers': cors_headers,
+                    'body': json.dumps({'error': 'Пользователь не найден'}),
+                    'isBase64Encoded': False
+                }
+            conn.commit()
+
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': json.dumps({'success': True, 'avatar_url': updated[0]}),
+                'isBase64Encoded': False
+            }
+
         elif action == 'change_password':
             user_id = event.get('headers', {}).get('X-User-Id') or event.get('headers', {}).get('x-user-id')
             old_password = body.get('old_password')
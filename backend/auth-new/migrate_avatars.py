@@ -0,0 +1,95 @@
+"""
+Перенос аватаров из users.avatar_url (base64 data URL) в blob_store
+Пользователи с data URL в avatar_url обрабатываются пачками по id: картинка
+сохраняется через avatars.store_avatar, и только после того, как оригинал и
+копии перечитаны из хранилища и их хэши совпали (verify_blob), avatar_url
+заменяется коротким адресом /api/file?avatar=<sha256>. Картинки, которые не
+удаётся разобрать или сохранить, остаются в avatar_url как есть и попадают в
+статистику failed вместе с id пользователя. Пачка блокируется FOR UPDATE
+SKIP LOCKED, перенос можно запускать параллельно и повторно. Ссылки
+(http...) и уже перенесённые аватары не трогаются.
+
+Без общего постоянного хранилища (BLOB_STORE_BUCKET или явный
+BLOB_STORE_PATH) перенос не запускается (require_blob_store).
+
+Место в таблице освобождается после VACUUM FULL users.
+
+Запуск:
+    python3 migrate_avatars.py [batch_size]
+"""
+
+import sys
+from typing import Dict, Tuple
+
+from avatars import AVATAR_FORMAT, AvatarError, avatar_url, decode_data_url, store_avatar
+from blob_store import require_blob_store, verify_blob
+
+MIGRATE_BATCH_SIZE = 20
+
+
+def migrate_batch(conn, after_id: int = 0, batch_size: int = MIGRATE_BATCH_SIZE) -> Tuple[Dict[str, int], int]:
+    """Перенести одну пачку аватаров после after_id, вернуть (статистика, последний id)"""
+    stats = {'migrated': 0, 'failed': 0, 'bytes': 0}
+    last_id = after_id
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id FROM users
+            WHERE id > %s AND avatar_url LIKE 'data:%%'
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (after_id, batch_size))
+        ids = [row[0] for row in cur.fetchall()]
+
+        for user_id in ids:
+            last_id = user_id
+            cur.execute("SELECT avatar_url FROM users WHERE id = %s", (user_id,))
+            try:
+                data = decode_data_url(cur.fetchone()[0])
+                sha256 = store_avatar(cur, data)
+            except AvatarError as e:
+                print(f'[AVATARS] user {user_id}: {e}, avatar left in place')
+                stats['failed'] += 1
+                continue
+            cur.execute(
+                "SELECT derivative_sha256 FROM blob_derivatives WHERE source_sha256 = %s AND format = %s",
+                (sha256, AVATAR_FORMAT)
+            )
+            if not all(verify_blob(key) for key in [sha256] + [row[0] for row in cur.fetchall()]):
+                print(f'[AVATARS] user {user_id}: stored files do not match, avatar left in place')
+                stats['failed'] += 1
+                continue
+            cur.execute(
+                "UPDATE users SET avatar_url = %s, avatar_sha256 = %s WHERE id = %s",
+                (avatar_url(sha256), sha256, user_id)
+            )
+            stats['migrated'] += 1
+            stats['bytes'] += len(data)
+    conn.commit()
+    return stats, last_id
+
+
+def migrate_avatars(conn, batch_size: int = MIGRATE_BATCH_SIZE) -> Dict[str, int]:
+    """Перенести все аватары"""
+    total = {'migrated': 0, 'failed': 0, 'bytes': 0}
+    last_id = 0
+    while True:
+        stats, last_id = migrate_batch(conn, last_id, batch_size)
+        if not stats['migrated'] and not stats['failed']:
+            return total
+        for key in total:
+            total[key] += stats[key]
+        print(f"[AVATARS] migrated {total['migrated']} avatars, {total['bytes']} bytes, failed {total['failed']}")
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    require_blob_store()
+
+    worker_conn = get_db_connection()
+    try:
+        result = migrate_avatars(worker_conn, int(sys.argv[1]) if len(sys.argv) > 1 else MIGRATE_BATCH_SIZE)
+        print(f"[AVATARS] done: {result}")
+    finally:
+        worker_conn.close()
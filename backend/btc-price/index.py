@@ -6,28 +6,18 @@ Returns: HTTP response с курсом BTC
 '''
 
 import json
-import urllib.request
 from typing import Dict, Any
+from price_oracle import PriceUnavailableError, get_price
+
+BTC_MARKUP = 1000
 
 def get_real_btc_price() -> float:
-    """Получить реальную цену BTC с Binance API"""
+    """Получить цену BTC из кэша price_oracle (Binance, резерв - Coinbase) с markup"""
     try:
-        # Пробуем Binance API (наиболее надёжный источник)
-        with urllib.request.urlopen('https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT', timeout=5) as response:
-            data = json.loads(response.read().decode())
-            real_price = float(data['price'])
-            return real_price + 1000
-    except Exception as e:
-        print(f'Error fetching BTC price from Binance: {e}')
-        # Fallback на Coinbase API
-        try:
-            with urllib.request.urlopen('https://api.coinbase.com/v2/prices/BTC-USD/spot', timeout=5) as response:
-                data = json.loads(response.read().decode())
-                real_price = float(data['data']['amount'])
-                return real_price + 1000
-        except Exception as e2:
-            print(f'Error fetching BTC price from Coinbase: {e2}')
-            return 0
+        return get_price('BTC') + BTC_MARKUP
+    except PriceUnavailableError as e:
+        print(f'Error fetching BTC price: {e}')
+        return 0
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
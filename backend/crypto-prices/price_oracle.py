@@ -0,0 +1,186 @@
+"""
+Общий оракул курсов криптовалют (crypto-prices, btc-price, auth-new)
+Курсы держатся в памяти контейнера по схеме stale-while-revalidate:
+- моложе PRICE_CACHE_TTL - отдаются сразу;
+- старше TTL, но моложе PRICE_MAX_STALENESS - отдаются сразу, а обновление
+  запускается в фоне (одно на контейнер);
+- старше PRICE_MAX_STALENESS или кэша нет - обновление синхронно; если оно не
+  удалось, используется последний удачный курс в пределах PRICE_MAX_STALENESS,
+  иначе PriceUnavailableError.
+
+Основной источник - один запрос Binance /ticker/price?symbols=[...] только по
+нужным парам. Если он не ответил или вернул не все пары, резервные источники
+(зеркало Binance и Coinbase) опрашиваются параллельно.
+
+Использование:
+    from price_oracle import get_prices, get_price, PriceUnavailableError
+
+    prices = get_prices()          # {'BTC': 97000.0, 'ETH': ...}
+    btc = get_price('BTC')
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+PRICE_CACHE_TTL = float(os.environ.get('PRICE_CACHE_TTL', '10'))
+PRICE_MAX_STALENESS = float(os.environ.get('PRICE_MAX_STALENESS', '300'))
+PRICE_FETCH_TIMEOUT = float(os.environ.get('PRICE_FETCH_TIMEOUT', '5'))
+
+SYMBOLS = {
+    'BTC': 'BTCUSDT',
+    'ETH': 'ETHUSDT',
+    'BNB': 'BNBUSDT',
+    'SOL': 'SOLUSDT',
+    'XRP': 'XRPUSDT',
+    'TRX': 'TRXUSDT'
+}
+
+BINANCE_API = 'https://api.binance.com'
+BINANCE_MIRROR_API = 'https://api1.binance.com'
+COINBASE_API = 'https://api.coinbase.com'
+
+
+class PriceUnavailableError(Exception):
+    """Нет ни свежего, ни допустимо устаревшего курса"""
+
+
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_prices: Dict[str, float] = {}
+_updated_at: Dict[str, float] = {}
+_refreshing = False
+_attempted_at = float('-inf')
+_stats = {'hits': 0, 'stale_hits': 0, 'refreshes': 0, 'refresh_failures': 0, 'fallback_fetches': 0}
+
+
+def _get_json(url: str):
+    with urllib.request.urlopen(url, timeout=PRICE_FETCH_TIMEOUT) as response:
+        return json.loads(response.read().decode())
+
+
+def _fetch_binance(base_url: str, assets: List[str]) -> Dict[str, float]:
+    """Курсы только нужных пар одним запросом"""
+    symbols = json.dumps([SYMBOLS[asset] for asset in assets], separators=(',', ':'))
+    data = _get_json(f'{base_url}/api/v3/ticker/price?symbols={urllib.parse.quote(symbols)}')
+    by_symbol = {item['symbol']: float(item['price']) for item in data}
+    return {asset: by_symbol[SYMBOLS[asset]] for asset in assets if SYMBOLS[asset] in by_symbol}
+
+
+def _fetch_coinbase(asset: str) -> Dict[str, float]:
+    data = _get_json(f'{COINBASE_API}/v2/prices/{asset}-USD/spot')
+    return {asset: float(data['data']['amount'])}
+
+
+def _fetch_fallbacks(assets: List[str]) -> Dict[str, float]:
+    """Параллельно опросить резервные источники, первый ответ по каждой паре выигрывает"""
+    jobs: List[Callable[[], Dict[str, float]]] = [lambda: _fetch_binance(BINANCE_MIRROR_API, assets)]
+    jobs.extend((lambda asset=asset: _fetch_coinbase(asset)) for asset in assets)
+
+    found: Dict[str, float] = {}
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(job) for job in jobs]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f'Price fallback source failed: {e}')
+                continue
+            for asset, price in result.items():
+                found.setdefault(asset, price)
+    return found
+
+
+def _fetch(assets: List[str]) -> Dict[str, float]:
+    try:
+        prices = _fetch_binance(BINANCE_API, assets)
+    except Exception as e:
+        print(f'Error fetching prices from Binance: {e}')
+        prices = {}
+
+    missing = [asset for asset in assets if asset not in prices]
+    if missing:
+        _stats['fallback_fetches'] += 1
+        for asset, price in _fetch_fallbacks(missing).items():
+            prices.setdefault(asset, price)
+    return {asset: price for asset, price in prices.items() if price > 0}
+
+
+def refresh_prices() -> bool:
+    """Обновить все курсы; при параллельном вызове дождаться уже идущего обновления"""
+    global _refreshing, _attempted_at
+    if not _refresh_lock.acquire(blocking=False):
+        with _refresh_lock:
+            return True
+    try:
+        _attempted_at = time.monotonic()
+        _stats['refreshes'] += 1
+        fetched = _fetch(list(SYMBOLS))
+        now = time.monotonic()
+        with _lock:
+            _prices.update(fetched)
+            for asset in fetched:
+                _updated_at[asset] = now
+        if len(fetched) < len(SYMBOLS):
+            _stats['refresh_failures'] += 1
+        return bool(fetched)
+    finally:
+        _refreshing = False
+        _refresh_lock.release()
+
+
+def _refresh_in_background() -> None:
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=refresh_prices, daemon=True).start()
+
+
+def _ages(assets: Iterable[str]) -> List[float]:
+    now = time.monotonic()
+    return [now - _updated_at[asset] if asset in _updated_at else float('inf') for asset in assets]
+
+
+def get_prices(assets: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Курсы в USDT без наценок; отсутствующие в пределах PRICE_MAX_STALENESS пары не возвращаются"""
+    assets = list(assets or SYMBOLS)
+    oldest = max(_ages(assets))
+
+    if oldest < PRICE_CACHE_TTL:
+        _stats['hits'] += 1
+    elif oldest < PRICE_MAX_STALENESS:
+        _stats['stale_hits'] += 1
+        _refresh_in_background()
+    elif time.monotonic() - _attempted_at >= PRICE_CACHE_TTL:
+        # Не дёргать источники на каждый запрос, если пара недоступна дольше TTL
+        refresh_prices()
+
+    now = time.monotonic()
+    with _lock:
+        prices = {
+            asset: _prices[asset] for asset in assets
+            if asset in _prices and now - _updated_at[asset] < PRICE_MAX_STALENESS
+        }
+    if not prices:
+        raise PriceUnavailableError('Курсы недоступны')
+    return prices
+
+
+def get_price(asset: str) -> float:
+    """Курс одной пары в USDT"""
+    prices = get_prices([asset])
+    if asset not in prices:
+        raise PriceUnavailableError(f'Курс {asset} недоступен')
+    return prices[asset]
+
+
+def get_oracle_stats() -> Dict[str, float]:
+    """Счётчики кэша и возраст самого старого курса, с"""
+    return {**_stats, 'max_age': max(_ages(SYMBOLS))}
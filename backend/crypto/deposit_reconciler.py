@@ -0,0 +1,379 @@
+"""
+Сверка пополнений USDT TRC20 с блокчейном
+Ожидающие платежи crypto_payments группируются по wallet_address: история
+TRC20 каждого адреса запрашивается у TronGrid один раз за цикл (общий
+requests.Session) и только начиная с курсора адреса (tron_wallet_cursors) -
+уже полученные переводы хранятся в tron_seen_transactions и переживают
+холодный старт. Несопоставленные переводы сопоставляются с платежами через
+индекс по сумме в центах, а все найденные зачисления проводятся одной
+транзакцией; зачтённый перевод помечается payment_id и повторно не
+используется. Истёкшие заявки отменяются в том же цикле.
+
+Запускается по расписанию (GET ?action=reconcile функции crypto с заголовком
+X-Job-Secret) или воркером:
+    python3 deposit_reconciler.py
+
+Использование:
+    from deposit_reconciler import reconcile_deposits, credit_payment
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+
+import requests
+from psycopg2.extras import RealDictCursor, execute_values
+
+from notification_outbox import enqueue_notification
+
+SCHEMA = 't_p32599880_plugin_site_developm'
+TRONGRID_API = 'https://api.trongrid.io'
+USDT_TRC20_CONTRACT = 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t'
+
+RECONCILE_MIN_INTERVAL = float(os.environ.get('RECONCILE_MIN_INTERVAL', '15'))
+RECONCILE_POLL_INTERVAL = float(os.environ.get('RECONCILE_POLL_INTERVAL', '30'))
+TRONGRID_PAGE_LIMIT = 200
+TRONGRID_MAX_PAGES = 5
+# Ключ advisory lock для проведения зачислений
+DEPOSIT_CREDIT_LOCK_KEY = 7310042
+# Допуск совпадения суммы перевода и заявки, USDT
+AMOUNT_TOLERANCE = 0.01
+WALLET_THROTTLE_CACHE_SIZE = 10000
+
+_session = requests.Session()
+_lock = threading.Lock()
+_reconciled_at = 0.0
+# Время последней сверки отдельных адресов (confirm_payment) в контейнере
+_wallet_reconciled_at: 'OrderedDict[str, float]' = OrderedDict()
+
+
+def fetch_trc20_transfers(wallet_address: str, min_timestamp: int) -> List[Dict[str, Any]]:
+    """Входящие USDT переводы на адрес начиная с min_timestamp (мс), по возрастанию времени"""
+    api_key = os.environ.get('TRONGRID_API_KEY', '')
+    headers = {'TRON-PRO-API-KEY': api_key} if api_key else {}
+    params = {
+        'only_to': 'true',
+        'only_confirmed': 'true',
+        'contract_address': USDT_TRC20_CONTRACT,
+        'min_timestamp': min_timestamp,
+        'order_by': 'block_timestamp,asc',
+        'limit': TRONGRID_PAGE_LIMIT
+    }
+
+    transfers = []
+    for _ in range(TRONGRID_MAX_PAGES):
+        response = _session.get(f'{TRONGRID_API}/v1/accounts/{wallet_address}/transactions/trc20',
+                                params=params, headers=headers, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+
+        for tx in data.get('data', []):
+            token_info = tx.get('token_info', {})
+            if token_info.get('address', '').lower() != USDT_TRC20_CONTRACT.lower():
+                continue
+            if tx.get('to') != wallet_address:
+                continue
+            transfers.append({
+                'tx_hash': tx.get('transaction_id'),
+                'amount': float(tx.get('value', 0)) / (10 ** int(token_info.get('decimals', 6))),
+                'timestamp': tx.get('block_timestamp'),
+                'from': tx.get('from'),
+                'to': tx.get('to')
+            })
+
+        fingerprint = data.get('meta', {}).get('fingerprint')
+        if not fingerprint:
+            break
+        params['fingerprint'] = fingerprint
+
+    return transfers
+
+
+def match_transfers(payments: List[Dict[str, Any]], transfers: List[Dict[str, Any]],
+                    used_hashes: set) -> List[Dict[str, Any]]:
+    """Сопоставить переводы с платежами: каждый перевод и платёж используются не более одного раза.
+    Перевод засчитывается самому раннему подходящему по сумме платежу, созданному до перевода."""
+    index: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for payment in sorted(payments, key=lambda p: (p['created_at'], p['id'])):
+        index[round(float(payment['amount']) * 100)].append(payment)
+
+    matches = []
+    for transfer in sorted(transfers, key=lambda t: t['timestamp'] or 0):
+        if not transfer['tx_hash'] or transfer['tx_hash'] in used_hashes:
+            continue
+        cents = round(transfer['amount'] * 100)
+        for key in (cents, cents - 1, cents + 1):
+            bucket = index.get(key)
+            if not bucket:
+                continue
+            candidate = next((
+                p for p in bucket
+                if abs(float(p['amount']) - transfer['amount']) < AMOUNT_TOLERANCE
+                and int(p['created_at'].timestamp() * 1000) <= (transfer['timestamp'] or 0)
+            ), None)
+            if candidate:
+                bucket.remove(candidate)
+                used_hashes.add(transfer['tx_hash'])
+                matches.append({'payment': candidate, 'transfer': transfer})
+                break
+    return matches
+
+
+def credit_payment(cur, payment: Dict[str, Any], tx_hash: str) -> Optional[float]:
+    """Подтвердить платёж и зачислить средства (бонусы, рефералы, уведомления).
+    Возвращает новый баланс или None, если платёж уже обработан другим процессом."""
+    cur.execute(
+        f"""UPDATE {SCHEMA}.crypto_payments
+           SET status = 'confirmed', confirmed_at = CURRENT_TIMESTAMP, tx_hash = %s
+           WHERE id = %s AND status = 'pending'
+           RETURNING id""",
+        (tx_hash, payment['id'])
+    )
+    if not cur.fetchone():
+        return None
+
+    user_id = int(payment['user_id'])
+    amount = float(payment['amount'])
+
+    cur.execute(
+        f"SELECT username, christmas_bonus_used, bonus_percent FROM {SCHEMA}.users WHERE id = %s",
+        (user_id,)
+    )
+    user = cur.fetchone()
+    username = user['username'] if user else f"ID {user_id}"
+
+    final_amount = amount
+    bonus_info = ""
+
+    if user and not user.get('christmas_bonus_used') and user.get('bonus_percent'):
+        bonus_percent = int(user['bonus_percent'])
+        bonus_amount = amount * (bonus_percent / 100)
+        final_amount = amount + bonus_amount
+        bonus_info = f" + бонус {bonus_percent}% ({bonus_amount:.2f} USDT)"
+
+        cur.execute(
+            f"UPDATE {SCHEMA}.users SET christmas_bonus_used = true WHERE id = %s",
+            (user_id,)
+        )
+
+    cur.execute(
+        f"UPDATE {SCHEMA}.users SET balance = COALESCE(balance, 0) + %s WHERE id = %s RETURNING balance",
+        (final_amount, user_id)
+    )
+    result = cur.fetchone()
+
+    cur.execute(
+        f"INSERT INTO {SCHEMA}.transactions (user_id, amount, type, description) VALUES (%s, %s, %s, %s)",
+        (user_id, final_amount, 'crypto_deposit', f"Пополнение через {payment['network']}{bonus_info}")
+    )
+
+    # Уведомление администратору фиксируется вместе с зачислением
+    enqueue_notification(
+        cur,
+        'balance_topup',
+        {'username': username, 'user_id': user_id},
+        {'amount': amount},
+        dedup_key=f"balance_topup:{int(payment['id'])}"
+    )
+
+    # Начисление реферального бонуса (10% от пополнения)
+    cur.execute(
+        f"""SELECT r.referrer_id, u.username
+           FROM {SCHEMA}.referrals r
+           JOIN {SCHEMA}.users u ON r.referrer_id = u.id
+           WHERE r.referred_user_id = %s AND r.status = 'pending'
+           LIMIT 1""",
+        (user_id,)
+    )
+    referrer = cur.fetchone()
+
+    if referrer:
+        referral_bonus = amount * 0.10
+
+        cur.execute(
+            f"UPDATE {SCHEMA}.users SET balance = COALESCE(balance, 0) + %s WHERE id = %s",
+            (referral_bonus, referrer['referrer_id'])
+        )
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.transactions (user_id, amount, type, description) VALUES (%s, %s, %s, %s)",
+            (referrer['referrer_id'], referral_bonus, 'referral_bonus', "Реферальный бонус 10% от пополнения реферала")
+        )
+        cur.execute(
+            f"UPDATE {SCHEMA}.referrals SET status = 'active', bonus_earned = COALESCE(bonus_earned, 0) + %s WHERE referrer_id = %s AND referred_user_id = %s",
+            (referral_bonus, referrer['referrer_id'], user_id)
+        )
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.notifications (user_id, type, title, message) VALUES (%s, %s, %s, %s)",
+            (referrer['referrer_id'], 'success', 'Реферальный бонус', f"Вы получили +{referral_bonus:.2f} USDT (10%) от пополнения вашего реферала!")
+        )
+
+    cur.execute(
+        f"INSERT INTO {SCHEMA}.notifications (user_id, type, title, message) VALUES (%s, %s, %s, %s)",
+        (user_id, 'success', 'Баланс пополнен', f"Ваш баланс успешно пополнен на {amount:.2f} USDT")
+    )
+
+    cur.execute(
+        f"""INSERT INTO {SCHEMA}.notifications (user_id, type, title, message)
+           SELECT id, 'admin_alert', 'Пополнение баланса', %s FROM {SCHEMA}.users WHERE role = 'admin'""",
+        (f"Пользователь {username} пополнил баланс на {amount:.2f} USDT",)
+    )
+
+    return float(result['balance']) if result else 0
+
+
+def store_transfers(cur, wallet_address: str, transfers: List[Dict[str, Any]]) -> int:
+    """Сохранить полученные переводы в tron_seen_transactions и сдвинуть курсор адреса.
+    Возвращает число новых переводов."""
+    rows = [
+        (t['tx_hash'], wallet_address, t['amount'], t['from'], t['timestamp'])
+        for t in transfers if t['tx_hash'] and t['timestamp']
+    ]
+    if not rows:
+        return 0
+
+    inserted = execute_values(cur, f"""
+        INSERT INTO {SCHEMA}.tron_seen_transactions
+            (transaction_id, wallet_address, amount, from_address, block_timestamp)
+        VALUES %s
+        ON CONFLICT (transaction_id) DO NOTHING
+        RETURNING transaction_id
+    """, rows, fetch=True)
+
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.tron_wallet_cursors (wallet_address, last_block_timestamp)
+        VALUES (%s, %s)
+        ON CONFLICT (wallet_address) DO UPDATE SET
+            last_block_timestamp = GREATEST(tron_wallet_cursors.last_block_timestamp, EXCLUDED.last_block_timestamp),
+            updated_at = CURRENT_TIMESTAMP
+    """, (wallet_address, max(row[4] for row in rows)))
+    return len(inserted)
+
+
+def reconcile_deposits(conn, wallet_address: Optional[str] = None, force: bool = False) -> Dict[str, int]:
+    """Один цикл сверки (всех адресов или одного wallet_address).
+    Без force не чаще RECONCILE_MIN_INTERVAL секунд на контейнер, для
+    отдельного адреса - не чаще того же интервала на адрес."""
+    global _reconciled_at
+    stats = {'wallets': 0, 'pending': 0, 'transfers': 0, 'confirmed': 0, 'cancelled': 0, 'errors': 0}
+
+    if not force:
+        now = time.monotonic()
+        with _lock:
+            if wallet_address is None:
+                if now - _reconciled_at < RECONCILE_MIN_INTERVAL:
+                    stats['skipped'] = 1
+                    return stats
+                _reconciled_at = now
+            else:
+                if now - _wallet_reconciled_at.get(wallet_address, 0.0) < RECONCILE_MIN_INTERVAL:
+                    stats['skipped'] = 1
+                    return stats
+                _wallet_reconciled_at[wallet_address] = now
+                _wallet_reconciled_at.move_to_end(wallet_address)
+                while len(_wallet_reconciled_at) > WALLET_THROTTLE_CACHE_SIZE:
+                    _wallet_reconciled_at.popitem(last=False)
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.crypto_payments SET status = 'cancelled'
+            WHERE status = 'pending' AND expires_at < CURRENT_TIMESTAMP
+        """)
+        stats['cancelled'] = cur.rowcount
+
+        cur.execute(f"""
+            SELECT id, user_id, wallet_address, amount, network, created_at
+            FROM {SCHEMA}.crypto_payments
+            WHERE status = 'pending' AND (expires_at IS NULL OR expires_at >= CURRENT_TIMESTAMP)
+              AND created_at > CURRENT_TIMESTAMP - INTERVAL '2 hours'
+              AND (%s::text IS NULL OR wallet_address = %s)
+        """, (wallet_address, wallet_address))
+        pending = cur.fetchall()
+
+        by_wallet: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for payment in pending:
+            by_wallet[payment['wallet_address']].append(payment)
+
+        cursors = {}
+        if by_wallet:
+            cur.execute(
+                f"SELECT wallet_address, last_block_timestamp FROM {SCHEMA}.tron_wallet_cursors WHERE wallet_address = ANY(%s)",
+                (list(by_wallet),)
+            )
+            cursors = {row['wallet_address']: int(row['last_block_timestamp']) for row in cur.fetchall()}
+    # Не держим транзакцию открытой на время запросов к TronGrid
+    conn.commit()
+
+    stats['wallets'] = len(by_wallet)
+    stats['pending'] = len(pending)
+    if not pending:
+        return stats
+
+    # Переводы раньше самой ранней заявки адреса не могут быть зачтены, а до
+    # курсора уже лежат в tron_seen_transactions - запрашиваются только новые
+    watermarks = {
+        address: min(int(p['created_at'].timestamp() * 1000) for p in payments)
+        for address, payments in by_wallet.items()
+    }
+    fetched = {}
+    for address, watermark in watermarks.items():
+        try:
+            fetched[address] = fetch_trc20_transfers(address, max(watermark, cursors.get(address, 0)))
+        except Exception as e:
+            print(f'Error fetching TRC20 transfers for {address}: {e}')
+            stats['errors'] += 1
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Зачисления сериализуются между контейнерами: несопоставленные переводы читаются под блокировкой
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (DEPOSIT_CREDIT_LOCK_KEY,))
+        for address, transfers in fetched.items():
+            stats['transfers'] += store_transfers(cur, address, transfers)
+
+        cur.execute(f"""
+            SELECT transaction_id, wallet_address, amount, from_address, block_timestamp
+            FROM {SCHEMA}.tron_seen_transactions
+            WHERE wallet_address = ANY(%s) AND payment_id IS NULL AND block_timestamp >= %s
+        """, (list(by_wallet), min(watermarks.values())))
+        unmatched: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in cur.fetchall():
+            unmatched[row['wallet_address']].append({
+                'tx_hash': row['transaction_id'],
+                'amount': float(row['amount']),
+                'timestamp': int(row['block_timestamp']),
+                'from': row['from_address'],
+                'to': row['wallet_address']
+            })
+
+        matches = []
+        for address, transfers in unmatched.items():
+            matches.extend(match_transfers(by_wallet[address], transfers, set()))
+
+        # Все зачисления цикла - одной транзакцией вместе с отметкой перевода
+        for match in matches:
+            tx_hash = match['transfer']['tx_hash']
+            if credit_payment(cur, match['payment'], tx_hash) is not None:
+                cur.execute(
+                    f"UPDATE {SCHEMA}.tron_seen_transactions SET payment_id = %s WHERE transaction_id = %s",
+                    (match['payment']['id'], tx_hash)
+                )
+                stats['confirmed'] += 1
+    conn.commit()
+
+    return stats
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    while True:
+        worker_conn = get_db_connection()
+        try:
+            result = reconcile_deposits(worker_conn, force=True)
+            if result['confirmed'] or result['cancelled'] or result['errors']:
+                print(f"[DEPOSITS] {result}")
+        except Exception as e:
+            print(f"[DEPOSITS] reconcile failed: {e}")
+        finally:
+            worker_conn.close()
+        time.sleep(RECONCILE_POLL_INTERVAL)
@@ -7,74 +7,15 @@ Returns: HTTP response dict с адресом кошелька или стату
 
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any
 from datetime import datetime, timedelta
-import psycopg2
 from psycopg2.extras import RealDictCursor
-import requests
+from db_pool import get_db_connection
+from deposit_reconciler import reconcile_deposits
+from scheduled_jobs import is_job_request
 
 SCHEMA = 't_p32599880_plugin_site_developm'
 
-def send_telegram_notification(event_type: str, user_info: Dict, details: Dict):
-    '''Send notification to admin via Telegram'''
-    try:
-        telegram_url = 'https://functions.poehali.dev/02d813a8-279b-4a13-bfe4-ffb7d0cf5a3f'
-        payload = {
-            'event_type': event_type,
-            'user_info': user_info,
-            'details': details
-        }
-        requests.post(telegram_url, json=payload, timeout=5)
-    except:
-        pass
-
-def get_db_connection():
-    """Получить подключение к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-
-def check_tron_transaction(wallet_address: str, amount: float, min_timestamp: int) -> Optional[Dict[str, Any]]:
-    """Проверить USDT транзакцию на TRON"""
-    try:
-        trongrid_api_key = os.environ.get('TRONGRID_API_KEY', '')
-        headers = {'TRON-PRO-API-KEY': trongrid_api_key} if trongrid_api_key else {}
-        
-        url = f'https://api.trongrid.io/v1/accounts/{wallet_address}/transactions/trc20'
-        params = {
-            'limit': 20,
-            'min_timestamp': min_timestamp
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        if response.status_code != 200:
-            return None
-        
-        data = response.json()
-        transactions = data.get('data', [])
-        
-        usdt_contract = 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t'
-        
-        for tx in transactions:
-            token_info = tx.get('token_info', {})
-            if token_info.get('address', '').lower() != usdt_contract.lower():
-                continue
-            
-            tx_amount = float(tx.get('value', 0)) / (10 ** token_info.get('decimals', 6))
-            
-            if abs(tx_amount - amount) < 0.01:
-                return {
-                    'tx_hash': tx.get('transaction_id'),
-                    'amount': tx_amount,
-                    'timestamp': tx.get('block_timestamp'),
-                    'from': tx.get('from'),
-                    'to': tx.get('to')
-                }
-        
-        return None
-    except Exception as e:
-        print(f'Error checking TRON transaction: {e}')
-        return None
-
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -92,7 +33,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(cursor_factory=RealDictCursor)
         cur = conn.cursor()
         
         if method == 'POST':
@@ -218,21 +159,21 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
-                created_timestamp = int(payment['created_at'].timestamp() * 1000)
+                # Сверка только адреса этого платежа, не чаще RECONCILE_MIN_INTERVAL
+                # на адрес: частые нажатия «Проверить» просто читают статус
+                conn.commit()
+                reconcile_deposits(conn, wallet_address=payment['wallet_address'])
                 
-                tron_tx = check_tron_transaction(
-                    payment['wallet_address'],
-                    float(payment['amount']),
-                    created_timestamp
+                cur.execute(
+                    f"""SELECT cp.status, u.balance FROM {SCHEMA}.crypto_payments cp
+                       JOIN {SCHEMA}.users u ON u.id = cp.user_id
+                       WHERE cp.id = %s""",
+                    (int(payment_id),)
                 )
+                result = cur.fetchone()
+                conn.commit()
                 
-                if not tron_tx:
-                    cur.execute(
-                        f"UPDATE {SCHEMA}.crypto_payments SET status = 'pending' WHERE id = %s",
-                        (int(payment_id),)
-                    )
-                    conn.commit()
-                    
+                if not result or result['status'] != 'confirmed':
                     return {
                         'statusCode': 202,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -244,137 +185,41 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
-                cur.execute(
-                    f"""UPDATE {SCHEMA}.crypto_payments 
-                       SET status = %s, confirmed_at = CURRENT_TIMESTAMP, tx_hash = %s 
-                       WHERE id = %s""",
-                    ('confirmed', tron_tx['tx_hash'], int(payment_id))
-                )
-                
-                cur.execute(
-                    f"SELECT christmas_bonus_used FROM {SCHEMA}.users WHERE id = %s",
-                    (int(user_id),)
-                )
-                user_bonus = cur.fetchone()
-                
-                final_amount = float(payment['amount'])
-                bonus_info = ""
-                
-                if user_bonus and not user_bonus.get('christmas_bonus_used'):
-                    cur.execute(
-                        f"SELECT bonus_percent FROM {SCHEMA}.users WHERE id = %s",
-                        (int(user_id),)
-                    )
-                    bonus_data = cur.fetchone()
-                    
-                    if bonus_data and bonus_data.get('bonus_percent'):
-                        bonus_percent = int(bonus_data['bonus_percent'])
-                        bonus_amount = final_amount * (bonus_percent / 100)
-                        final_amount = final_amount + bonus_amount
-                        bonus_info = f" + бонус {bonus_percent}% ({bonus_amount:.2f} USDT)"
-                        
-                        cur.execute(
-                            f"UPDATE {SCHEMA}.users SET christmas_bonus_used = true WHERE id = %s",
-                            (int(user_id),)
-                        )
-                
-                cur.execute(
-                    f"UPDATE {SCHEMA}.users SET balance = COALESCE(balance, 0) + %s WHERE id = %s RETURNING balance",
-                    (final_amount, int(user_id))
-                )
-                result = cur.fetchone()
-                
-                cur.execute(
-                    f"INSERT INTO {SCHEMA}.transactions (user_id, amount, type, description) VALUES (%s, %s, %s, %s)",
-                    (int(user_id), final_amount, 'crypto_deposit', f"Пополнение через {payment['network']}{bonus_info}")
-                )
-                
-                # Get username for notification
-                cur.execute(f"SELECT username FROM {SCHEMA}.users WHERE id = %s", (int(user_id),))
-                user_data = cur.fetchone()
-                username = user_data['username'] if user_data else 'Unknown'
-                
-                # Send Telegram notification
-                send_telegram_notification(
-                    'balance_topup',
-                    {'username': username, 'user_id': user_id},
-                    {'amount': float(payment['amount'])}
-                )
-                
-                # Начисление реферального бонуса (10% от пополнения)
-                cur.execute(
-                    f"""SELECT r.referrer_id, u.username 
-                       FROM {SCHEMA}.referrals r 
-                       JOIN {SCHEMA}.users u ON r.referrer_id = u.id 
-                       WHERE r.referred_user_id = %s AND r.status = 'pending'
-                       LIMIT 1""",
-                    (int(user_id),)
-                )
-                referrer = cur.fetchone()
-                
-                if referrer:
-                    referral_bonus = float(payment['amount']) * 0.10
-                    
-                    cur.execute(
-                        f"UPDATE {SCHEMA}.users SET balance = COALESCE(balance, 0) + %s WHERE id = %s",
-                        (referral_bonus, referrer['referrer_id'])
-                    )
-                    
-                    cur.execute(
-                        f"INSERT INTO {SCHEMA}.transactions (user_id, amount, type, description) VALUES (%s, %s, %s, %s)",
-                        (referrer['referrer_id'], referral_bonus, 'referral_bonus', f"Реферальный бонус 10% от пополнения реферала")
-                    )
-                    
-                    cur.execute(
-                        f"UPDATE {SCHEMA}.referrals SET status = 'active', bonus_earned = COALESCE(bonus_earned, 0) + %s WHERE referrer_id = %s AND referred_user_id = %s",
-                        (referral_bonus, referrer['referrer_id'], int(user_id))
-                    )
-                    
-                    cur.execute(
-                        f"INSERT INTO {SCHEMA}.notifications (user_id, type, title, message) VALUES (%s, %s, %s, %s)",
-                        (referrer['referrer_id'], 'success', 'Реферальный бонус', f"Вы получили +{referral_bonus:.2f} USDT (10%) от пополнения вашего реферала!")
-                    )
-                
-                cur.execute(
-                    f"INSERT INTO {SCHEMA}.notifications (user_id, type, title, message) VALUES (%s, %s, %s, %s)",
-                    (int(user_id), 'success', 'Баланс пополнен', f"Ваш баланс успешно пополнен на {float(payment['amount']):.2f} USDT")
-                )
-                
-                cur.execute(f"SELECT username FROM {SCHEMA}.users WHERE id = %s", (int(user_id),))
-                user_info = cur.fetchone()
-                username = user_info['username'] if user_info else f"ID {user_id}"
-                
-                cur.execute(
-                    f"SELECT id FROM {SCHEMA}.users WHERE role = 'admin'"
-                )
-                admins = cur.fetchall()
-                
-                for admin in admins:
-                    cur.execute(
-                        f"INSERT INTO {SCHEMA}.notifications (user_id, type, title, message) VALUES (%s, %s, %s, %s)",
-                        (admin['id'], 'admin_alert', 'Пополнение баланса', f"Пользователь {username} пополнил баланс на {float(payment['amount']):.2f} USDT")
-                    )
-                
-                conn.commit()
-                
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                     'body': json.dumps({
                         'success': True,
-                        'new_balance': float(result['balance']) if result else 0
+                        'new_balance': float(result['balance'] or 0)
                     }),
                     'isBase64Encoded': False
                 }
         
         elif method == 'GET':
-            params = event.get('queryStringParameters', {})
+            params = event.get('queryStringParameters') or {}
             payment_id = params.get('payment_id')
             action = params.get('action', '')
             
             headers = event.get('headers', {})
             user_id = headers.get('X-User-Id') or headers.get('x-user-id')
             
+            if action == 'reconcile':
+                # Вызывается по расписанию: одна сверка всех ожидающих адресов, только планировщик
+                if not is_job_request(event):
+                    return {
+                        'statusCode': 403,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Доступ запрещён'}),
+                        'isBase64Encoded': False
+                    }
+                stats = reconcile_deposits(conn)
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'success': True, **stats}),
+                    'isBase64Encoded': False
+                }
+            
             if action == 'all_deposits':
                 if not user_id:
                     return {
@@ -435,62 +280,33 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
+                # Дешёвое чтение статусов: зачисления проводит фоновая сверка (action=reconcile)
                 cur.execute(
-                    f"""SELECT * FROM {SCHEMA}.crypto_payments 
-                       WHERE user_id = %s AND status = 'pending' 
-                       AND created_at > NOW() - INTERVAL '2 hours'
+                    f"""SELECT id, amount, status, tx_hash, network, created_at, confirmed_at
+                       FROM {SCHEMA}.crypto_payments
+                       WHERE user_id = %s AND created_at > NOW() - INTERVAL '2 hours'
+                         AND status IN ('pending', 'confirmed')
                        ORDER BY created_at DESC""",
                     (int(user_id),)
                 )
-                pending_payments = cur.fetchall()
+                recent_payments = cur.fetchall()
                 
-                auto_confirmed = []
-                for payment in pending_payments:
-                    created_timestamp = int(payment['created_at'].timestamp() * 1000)
-                    tron_tx = check_tron_transaction(
-                        payment['wallet_address'],
-                        float(payment['amount']),
-                        created_timestamp
-                    )
-                    
-                    if tron_tx:
-                        cur.execute(
-                            """UPDATE crypto_payments 
-                               SET status = %s, confirmed_at = CURRENT_TIMESTAMP, tx_hash = %s 
-                               WHERE id = %s""",
-                            ('confirmed', tron_tx['tx_hash'], payment['id'])
-                        )
-                        
-                        cur.execute(
-                            "UPDATE users SET balance = COALESCE(balance, 0) + %s WHERE id = %s",
-                            (float(payment['amount']), int(user_id))
-                        )
-                        
-                        cur.execute(
-                            "INSERT INTO transactions (user_id, amount, type, description) VALUES (%s, %s, %s, %s)",
-                            (int(user_id), float(payment['amount']), 'crypto_deposit', f"Автоматическое зачисление USDT {payment['network']}")
-                        )
-                        
-                        cur.execute(
-                            "INSERT INTO notifications (user_id, type, title, message) VALUES (%s, %s, %s, %s)",
-                            (int(user_id), 'payment', 'Баланс пополнен', f"Зачислено {float(payment['amount']):.2f} USDT")
-                        )
-                        
-                        auto_confirmed.append({
-                            'payment_id': payment['id'],
-                            'amount': float(payment['amount']),
-                            'tx_hash': tron_tx['tx_hash']
-                        })
-                
-                conn.commit()
+                # Это не результат вызова: сам check_pending ничего не подтверждает,
+                # поэтому отдаём все платежи, зачисленные сверкой за последние 2 часа
+                recently_confirmed = [{
+                    'payment_id': payment['id'],
+                    'amount': float(payment['amount']),
+                    'tx_hash': payment['tx_hash']
+                } for payment in recent_payments if payment['status'] == 'confirmed']
                 
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                     'body': json.dumps({
                         'success': True,
-                        'auto_confirmed': auto_confirmed,
-                        'count': len(auto_confirmed)
+                        'recently_confirmed': recently_confirmed,
+                        'count': len(recently_confirmed),
+                        'pending': [p['id'] for p in recent_payments if p['status'] == 'pending']
                     }),
                     'isBase64Encoded': False
                 }
@@ -0,0 +1,67 @@
+"""
+Задачи по расписанию, вызываемые через HTTP (таймер-триггеры функций)
+Вызов принимается только с заголовком X-Job-Secret, равным переменной
+окружения JOB_SECRET; без неё HTTP-запуск отключён и задачи выполняет
+только воркер. За один вызов обрабатывается одна пачка: позиция задачи
+хранится в job_cursors, следующий вызов продолжает с неё, а после последней
+пачки курсор возвращается к началу. Параллельный вызов той же задачи не
+ждёт блокировку и сразу возвращает busy.
+
+Использование:
+    from scheduled_jobs import is_job_request, run_job_step
+
+    if not is_job_request(event):
+        return 403
+    stats = run_job_step(conn, 'reconcile_counters', reconcile_batch)
+"""
+
+import hmac
+import os
+from typing import Any, Callable, Dict, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+JOB_SECRET = os.environ.get('JOB_SECRET', '')
+
+
+def is_job_request(event: Dict[str, Any]) -> bool:
+    """Запрос пришёл от планировщика: X-Job-Secret совпадает с JOB_SECRET"""
+    if not JOB_SECRET:
+        return False
+    headers = event.get('headers') or {}
+    secret = next((v for k, v in headers.items() if k.lower() == 'x-job-secret'), None) or ''
+    return hmac.compare_digest(secret.encode(), JOB_SECRET.encode())
+
+
+def run_job_step(conn, name: str, step: Callable[[Any, int], Tuple[Dict[str, int], int]]) -> Dict[str, Any]:
+    """Выполнить одну пачку задачи name: step(conn, after_id) -> (статистика, последний id)"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Сессионная блокировка переживает коммиты внутри step
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s)) AS locked", (f'job:{name}',))
+        locked = cur.fetchone()['locked']
+        conn.commit()
+        if not locked:
+            return {'busy': True}
+
+        try:
+            cur.execute("""
+                INSERT INTO job_cursors (name) VALUES (%s)
+                ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+                RETURNING last_id
+            """, (name,))
+            after_id = cur.fetchone()['last_id']
+            conn.commit()
+
+            stats, last_id = step(conn, after_id)
+            # Пустая пачка - проход окончен, следующий вызов начнёт сначала
+            next_id = last_id if last_id != after_id else 0
+            cur.execute(
+                "UPDATE job_cursors SET last_id = %s, updated_at = NOW() WHERE name = %s",
+                (next_id, name)
+            )
+            conn.commit()
+            return {**stats, 'after_id': after_id, 'next_after_id': next_id}
+        finally:
+            conn.rollback()
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (f'job:{name}',))
+            conn.commit()
@@ -5,26 +5,13 @@ Returns: HTTP response с данными о сделках
 """
 
 import json
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor, execute_batch
+from db_pool import get_db_connection
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 from decimal import Decimal
-import requests
-
-def send_telegram_notification(event_type: str, user_info: Dict, details: Dict):
-    '''Send notification to admin via Telegram'''
-    try:
-        telegram_url = 'https://functions.poehali.dev/02d813a8-279b-4a13-bfe4-ffb7d0cf5a3f'
-        payload = {
-            'event_type': event_type,
-            'user_info': user_info,
-            'details': details
-        }
-        requests.post(telegram_url, json=payload, timeout=5)
-    except:
-        pass
+from notification_outbox import enqueue_notification
+from presence import attach_last_seen
 
 def serialize_datetime(obj):
     """Сериализация datetime и Decimal объектов"""
@@ -58,11 +45,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     headers = event.get('headers', {})
     user_id = headers.get('X-User-Id') or headers.get('x-user-id')
     
-    dsn = os.environ.get('DATABASE_URL')
     conn = None
     
     try:
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         if method == 'GET':
@@ -152,13 +138,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     """
                     cursor.execute(query)
                 
-                deals = cursor.fetchall()
+                deals = [dict(d) for d in cursor.fetchall()]
+                attach_last_seen(cursor, deals, 'seller_id', 'seller_last_seen')
+                attach_last_seen(cursor, deals, 'buyer_id', 'buyer_last_seen')
                 cursor.close()
                 
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'deals': [dict(d) for d in deals]}, default=serialize_datetime),
+                    'body': json.dumps({'deals': deals}, default=serialize_datetime),
                     'isBase64Encoded': False
                 }
             
@@ -244,6 +232,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
+                deal = dict(deal)
+                attach_last_seen(cursor, [deal], 'seller_id', 'seller_last_seen')
+                attach_last_seen(cursor, [deal], 'buyer_id', 'buyer_last_seen')
+                
                 # Сообщения отдельным оптимизированным запросом
                 messages_query = """
                     SELECT dm.id, dm.deal_id, dm.user_id, dm.message, dm.is_system, dm.created_at,
@@ -328,15 +320,18 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 user_data = cursor.fetchone()
                 username = user_data['username'] if user_data else 'Unknown'
                 
+                # Уведомление уходит через outbox в той же транзакции
+                enqueue_notification(
+                    cursor,
+                    'new_deal',
+                    {'username': username},
+                    {'title': title, 'price': price},
+                    dedup_key=f'new_deal:{deal_id}'
+                )
+                
                 conn.commit()
                 cursor.close()
                 
-                # Отправка уведомления асинхронно
-                try:
-                    send_telegram_notification('new_deal', {'username': username}, {'title': title, 'price': price})
-                except:
-                    pass
-                
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -0,0 +1,101 @@
+"""
+Кэш горячих вложений в памяти контейнера file-proxy
+- метаданные вложений (строки forum_attachments неизменяемы, кроме переноса
+  file_data в хранилище - тогда запись сбрасывается drop_meta) - до
+  ATTACHMENT_META_CACHE_SIZE записей на ATTACHMENT_META_TTL секунд;
+- содержимое файлов - LRU, ограниченный суммарным размером
+  ATTACHMENT_CACHE_MAX_BYTES; файлы крупнее ATTACHMENT_CACHE_MAX_ITEM_BYTES
+  не кэшируются и отдаются диапазонами прямо из хранилища.
+Популярные картинки горячих тем отдаются без запросов к PostgreSQL и хранилищу.
+
+Использование:
+    from attachment_cache import get_cached_meta, cache_meta, drop_meta, get_cached_bytes, cache_bytes
+
+    data = get_cached_bytes(key)
+    if data is None:
+        data = read_blob(sha256)
+        cache_bytes(key, data)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+ATTACHMENT_CACHE_MAX_BYTES = int(os.environ.get('ATTACHMENT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+ATTACHMENT_CACHE_MAX_ITEM_BYTES = int(os.environ.get('ATTACHMENT_CACHE_MAX_ITEM_BYTES', str(5 * 1024 * 1024)))
+ATTACHMENT_META_CACHE_SIZE = int(os.environ.get('ATTACHMENT_META_CACHE_SIZE', '5000'))
+ATTACHMENT_META_TTL = float(os.environ.get('ATTACHMENT_META_TTL', '300'))
+
+_lock = threading.Lock()
+_bytes: 'OrderedDict[str, bytes]' = OrderedDict()
+_bytes_total = 0
+_meta: 'OrderedDict[str, tuple]' = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'meta_hits': 0, 'meta_misses': 0}
+
+
+def get_cached_meta(file_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        entry = _meta.get(file_id)
+        if entry and time.monotonic() - entry[0] < ATTACHMENT_META_TTL:
+            _meta.move_to_end(file_id)
+            _stats['meta_hits'] += 1
+            return entry[1]
+        _stats['meta_misses'] += 1
+        return None
+
+
+def cache_meta(file_id: str, meta: Dict[str, Any]) -> None:
+    with _lock:
+        _meta[file_id] = (time.monotonic(), meta)
+        _meta.move_to_end(file_id)
+        while len(_meta) > ATTACHMENT_META_CACHE_SIZE:
+            _meta.popitem(last=False)
+
+
+def drop_meta(file_id: str) -> None:
+    with _lock:
+        _meta.pop(file_id, None)
+
+
+def get_cached_bytes(key: str) -> Optional[bytes]:
+    with _lock:
+        data = _bytes.get(key)
+        if data is None:
+            _stats['misses'] += 1
+            return None
+        _bytes.move_to_end(key)
+        _stats['hits'] += 1
+        return data
+
+
+def cache_bytes(key: str, data: bytes) -> None:
+    """Положить файл в LRU, вытесняя давно не запрошенные"""
+    global _bytes_total
+    if len(data) > ATTACHMENT_CACHE_MAX_ITEM_BYTES or len(data) > ATTACHMENT_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        previous = _bytes.pop(key, None)
+        if previous is not None:
+            _bytes_total -= len(previous)
+        _bytes[key] = data
+        _bytes_total += len(data)
+        while _bytes_total > ATTACHMENT_CACHE_MAX_BYTES:
+            _, evicted = _bytes.popitem(last=False)
+            _bytes_total -= len(evicted)
+            _stats['evictions'] += 1
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша и доля попаданий"""
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            **_stats,
+            'hit_rate': round(_stats['hits'] / lookups, 4) if lookups else 0.0,
+            'items': len(_bytes),
+            'bytes': _bytes_total,
+            'max_bytes': ATTACHMENT_CACHE_MAX_BYTES,
+            'meta_items': len(_meta)
+        }
@@ -1,13 +1,66 @@
+import base64
 import json
-import os
-import psycopg2
+from db_pool import get_db_connection
+from psycopg2.extras import RealDictCursor
 from typing import Dict, Any
 from cors_helper import fix_cors_response
+from blob_store import is_not_modified, read_blob, serve_blob, BlobNotFoundError
+from attachment_cache import (
+    ATTACHMENT_CACHE_MAX_ITEM_BYTES, cache_bytes, cache_meta, drop_meta, get_cache_stats, get_cached_bytes,
+    get_cached_meta
+)
+from thumbnails import THUMBNAIL_CONTENT_TYPES, get_thumbnail, select_format, select_width
+from avatars import AVATAR_FORMAT, parse_avatar_request
+
+def avatar_response(event: Dict[str, Any], query_params: Dict[str, Any]) -> Dict[str, Any]:
+    '''Квадратная копия аватара (?avatar=<sha256>&s=64|128|256); адрес неизменяем - кэш без срока'''
+    request = parse_avatar_request(query_params.get('avatar'), query_params.get('s'))
+    not_found = {
+        'statusCode': 404,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'isBase64Encoded': False,
+        'body': json.dumps({'error': 'Avatar not found'})
+    }
+    if not request:
+        return not_found
+    
+    meta_key = f'avatar:{request[0]}:{request[1]}'
+    meta = get_cached_meta(meta_key)
+    if meta is None:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT derivative_sha256, size, content_type FROM blob_derivatives
+            WHERE source_sha256 = %s AND width = %s AND format = %s
+        """, (request[0], request[1], AVATAR_FORMAT))
+        meta = cur.fetchone()
+        cur.close()
+        conn.close()
+        if not meta:
+            return not_found
+        cache_meta(meta_key, meta)
+    
+    sha256 = meta['derivative_sha256']
+    etag = f'"{sha256}"'
+    data = None
+    if not is_not_modified(event, etag):
+        data = get_cached_bytes(sha256)
+        if data is None:
+            try:
+                data = read_blob(sha256)
+            except BlobNotFoundError:
+                return not_found
+            cache_bytes(sha256, data)
+    return serve_blob(event, sha256, int(meta['size']), meta['content_type'], f'avatar-{request[1]}.jpg',
+                      data=data, etag=etag)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Proxy file requests to serve attachments from gitcrypto.pro domain
-    Args: event with httpMethod, path parameters containing file ID
+    Args: event with httpMethod, query parameters containing file ID and optional thumbnail width w
           context with request_id
     Returns: File data with proper content type
     '''
@@ -40,55 +93,152 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         query_params = event.get('queryStringParameters') or {}
         file_id = query_params.get('id')
         
-        if not file_id:
+        if query_params.get('action') == 'stats':
             return {
-                'statusCode': 400,
+                'statusCode': 200,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
                 'isBase64Encoded': False,
-                'body': json.dumps({'error': 'Missing file id'})
+                'body': json.dumps({'cache': get_cache_stats()})
             }
         
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT file_data, filename, content_type
-            FROM forum_attachments
-            WHERE id = %s
-        """, (file_id,))
-        
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        if query_params.get('avatar'):
+            return avatar_response(event, query_params)
         
-        if not result:
+        if not file_id:
             return {
-                'statusCode': 404,
+                'statusCode': 400,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
                 'isBase64Encoded': False,
-                'body': json.dumps({'error': 'File not found'})
+                'body': json.dumps({'error': 'Missing file id'})
             }
         
-        file_data, filename, content_type = result
-        
-        return {
-            'statusCode': 200,
+        not_found = {
+            'statusCode': 404,
             'headers': {
-                'Content-Type': content_type,
-                'Content-Disposition': f'inline; filename="{filename}"',
-                'Access-Control-Allow-Origin': '*',
-                'Cache-Control': 'public, max-age=31536000'
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
             },
-            'isBase64Encoded': True,
-            'body': file_data
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'File not found'})
         }
+        
+        # Метаданные неизменяемы: горячие вложения отдаются без запроса к БД
+        meta = get_cached_meta(file_id)
+        if meta is None:
+            conn = get_db_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute("""
+                SELECT id, blob_sha256, file_size, filename, content_type, created_at
+                FROM forum_attachments
+                WHERE id = %s
+            """, (file_id,))
+            meta = cur.fetchone()
+            cur.close()
+            conn.close()
+            
+            if not meta:
+                return not_found
+            cache_meta(file_id, meta)
+        
+        blob_sha256 = meta['blob_sha256']
+        file_size = meta['file_size']
+        content_type = meta['content_type']
+        
+        # Уменьшенная копия картинки (?w=): создаётся при первом запросе и хранится в blob_store
+        width = select_width(query_params.get('w'))
+        is_thumbnail = bool(width and blob_sha256 and content_type in THUMBNAIL_CONTENT_TYPES)
+        if is_thumbnail:
+            accept = ''
+            for key, value in (event.get('headers') or {}).items():
+                if key.lower() == 'accept':
+                    accept = value or ''
+                    break
+            
+            source_sha256 = blob_sha256
+            
+            def load_source() -> bytes:
+                source = get_cached_bytes(source_sha256)
+                if source is None:
+                    source = read_blob(source_sha256)
+                    cache_bytes(source_sha256, source)
+                return source
+            
+            try:
+                blob_sha256, file_size, content_type = get_thumbnail(
+                    get_db_connection, source_sha256, file_size, content_type,
+                    width, select_format(accept), load_source
+                )
+            except BlobNotFoundError:
+                return not_found
+        
+        # Ещё не перенесённое в хранилище вложение: валидатор по метаданным, file_data не читается
+        etag = f'"{blob_sha256}"' if blob_sha256 else f'"att-{meta["id"]}-{file_size}"'
+        data = None
+        
+        if not is_not_modified(event, etag, meta['created_at']):
+            cache_key = blob_sha256 or etag
+            if file_size <= ATTACHMENT_CACHE_MAX_ITEM_BYTES:
+                data = get_cached_bytes(cache_key)
+            
+            if data is None:
+                if blob_sha256:
+                    if file_size <= ATTACHMENT_CACHE_MAX_ITEM_BYTES:
+                        try:
+                            data = read_blob(blob_sha256)
+                        except BlobNotFoundError:
+                            return not_found
+                        cache_bytes(cache_key, data)
+                else:
+                    conn = get_db_connection()
+                    cur = conn.cursor(cursor_factory=RealDictCursor)
+                    cur.execute("""
+                        SELECT file_data, id, blob_sha256, file_size, filename, content_type, created_at
+                        FROM forum_attachments
+                        WHERE id = %s
+                    """, (meta['id'],))
+                    row = cur.fetchone()
+                    cur.close()
+                    conn.close()
+                    if not row or row['file_data'] is None:
+                        # Вложение перенесли в хранилище после кэширования метаданных:
+                        # устаревшая запись сбрасывается, файл отдаётся по свежим метаданным
+                        drop_meta(file_id)
+                        if not row or not row['blob_sha256']:
+                            return not_found
+                        del row['file_data']
+                        meta = row
+                        cache_meta(file_id, meta)
+                        blob_sha256 = meta['blob_sha256']
+                        file_size = meta['file_size']
+                        etag = f'"{blob_sha256}"'
+                        if file_size <= ATTACHMENT_CACHE_MAX_ITEM_BYTES:
+                            try:
+                                data = read_blob(blob_sha256)
+                            except BlobNotFoundError:
+                                return not_found
+                            cache_bytes(blob_sha256, data)
+                    else:
+                        data = base64.b64decode(row['file_data'])
+                        cache_bytes(cache_key, data)
+        
+        # Крупные файлы не кэшируются: serve_blob читает из хранилища только запрошенный диапазон
+        try:
+            response = serve_blob(event, blob_sha256, len(data) if data is not None else file_size,
+                                  content_type, meta['filename'], data=data, etag=etag,
+                                  last_modified=meta['created_at'])
+        except BlobNotFoundError:
+            return not_found
+        
+        if is_thumbnail:
+            # Формат копии зависит от Accept клиента
+            response['headers']['Vary'] = 'Accept'
+        return response
     
     except Exception as e:
         return {
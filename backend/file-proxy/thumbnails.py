@@ -0,0 +1,141 @@
+"""
+Уменьшенные копии картинок из blob_store (параметр w: file-proxy, user-verification)
+Ширина из параметра w округляется вверх до одной из THUMBNAIL_WIDTHS.
+Копия создаётся при первом запросе (WebP, если клиент принимает image/webp,
+иначе JPEG), сохраняется в blob_store рядом с оригиналом, а связь
+оригинал -> копия записывается в blob_derivatives. Если оригинал не шире
+запрошенной ширины или не поддерживается (анимация, повреждённый файл),
+в blob_derivatives записывается сам оригинал - повторно он не декодируется.
+
+Использование:
+    from thumbnails import select_width, select_format, get_thumbnail
+
+    width = select_width(query_params.get('w'))
+    sha256, size, content_type = get_thumbnail(get_db_connection, source_sha256, source_size,
+                                               source_content_type, width, fmt, load_source)
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from blob_store import put_blob, register_blob
+
+THUMBNAIL_WIDTHS = (160, 320, 640, 1280)
+THUMBNAIL_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+THUMBNAIL_FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_MAP_CACHE_SIZE = 10000
+# Защита от «бомб» распаковки: картинки больше 40 Мп не обрабатываются.
+# Pillow сам отказывает только выше 2 * MAX_IMAGE_PIXELS, поэтому размер
+# проверяется явно по заголовку, до декодирования
+THUMBNAIL_MAX_PIXELS = 40_000_000
+
+_lock = threading.Lock()
+_derivatives: 'OrderedDict[Tuple[str, int, str], Tuple[str, int, str]]' = OrderedDict()
+
+
+def select_width(value) -> Optional[int]:
+    """Ширина копии для параметра w; None - отдать оригинал"""
+    try:
+        requested = int(value)
+    except (TypeError, ValueError):
+        return None
+    if requested <= 0:
+        return None
+    return next((width for width in THUMBNAIL_WIDTHS if width >= requested), None)
+
+
+def select_format(accept: str) -> str:
+    return 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+
+
+def make_thumbnail(data: bytes, width: int, fmt: str) -> Optional[bytes]:
+    """Уменьшить картинку до ширины width; None - уменьшать не нужно или нельзя"""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = THUMBNAIL_MAX_PIXELS
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > THUMBNAIL_MAX_PIXELS:
+            print(f'Thumbnail skipped: {image.width}x{image.height} exceeds {THUMBNAIL_MAX_PIXELS} pixels')
+            return None
+        if getattr(image, 'is_animated', False) or image.width <= width:
+            return None
+        image = ImageOps.exif_transpose(image)
+        height = max(1, round(image.height * width / image.width))
+
+        if fmt == 'jpeg':
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        image = image.resize((width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        if fmt == 'webp':
+            image.save(output, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        else:
+            image.save(output, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f'Thumbnail generation failed: {e}')
+        return None
+
+
+def _remember(key: Tuple[str, int, str], value: Tuple[str, int, str]) -> None:
+    with _lock:
+        _derivatives[key] = value
+        _derivatives.move_to_end(key)
+        while len(_derivatives) > THUMBNAIL_MAP_CACHE_SIZE:
+            _derivatives.popitem(last=False)
+
+
+def get_thumbnail(conn_factory: Callable, source_sha256: str, source_size: int, source_content_type: str,
+                  width: int, fmt: str, load_source: Callable[[], bytes]) -> Tuple[str, int, str]:
+    """(sha256, size, content_type) копии нужной ширины - или самого оригинала"""
+    key = (source_sha256, width, fmt)
+    with _lock:
+        cached = _derivatives.get(key)
+        if cached:
+            _derivatives.move_to_end(key)
+            return cached
+
+    conn = conn_factory()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT derivative_sha256, size, content_type FROM blob_derivatives
+                WHERE source_sha256 = %s AND width = %s AND format = %s
+            """, key)
+            row = cur.fetchone()
+            if row:
+                result = (row[0], int(row[1]), row[2])
+                _remember(key, result)
+                return result
+
+            thumbnail = make_thumbnail(load_source(), width, fmt)
+            if thumbnail is None:
+                result = (source_sha256, source_size, source_content_type)
+            else:
+                result = (put_blob(thumbnail), len(thumbnail), THUMBNAIL_FORMATS[fmt])
+                register_blob(cur, result[0], result[1])
+
+            cur.execute("""
+                INSERT INTO blob_derivatives (source_sha256, width, format, derivative_sha256, size, content_type)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (source_sha256, width, format) DO NOTHING
+            """, (*key, *result))
+        conn.commit()
+    finally:
+        conn.close()
+
+    _remember(key, result)
+    return result
@@ -1,7 +1,7 @@
 import json
 import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 from datetime import datetime
 
 import requests
@@ -54,7 +54,7 @@ def handler(event, context):
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(dsn)
+    conn = get_db_connection()
     
     try:
         cur = conn.cursor(cursor_factory=RealDictCursor)
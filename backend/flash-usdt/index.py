@@ -1,8 +1,8 @@
 import json
 import os
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 import requests
 
 def send_telegram_notification(event_type: str, user_info: Dict, details: Dict):
@@ -33,7 +33,7 @@ def get_admin_orders(event: Dict[str, Any]) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Database configuration error'})
             }
         
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         cursor.execute('''
@@ -152,7 +152,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Database configuration error'})
             }
         
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         cursor.execute('SELECT id, balance, username FROM users WHERE id = %s', (user_id,))
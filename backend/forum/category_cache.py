@@ -0,0 +1,104 @@
+"""
+Кэш дерева категорий форума
+Сериализованное дерево (JSON тела ответа get_categories) хранится в памяти
+контейнера вместе с версией из cache_versions. Пока не истёк
+CATEGORY_CACHE_TTL, ответ отдаётся без запросов к БД; после этого сверяется
+одна строка cache_versions и дерево перестраивается только если версия
+изменилась. Все мутации категорий (forum admin_manage_categories, admin
+create_forum_category/delete_forum_category) вызывают bump_cache_version
+в той же транзакции.
+
+Использование:
+    from category_cache import get_categories_body, invalidate_categories, bump_cache_version
+
+    body, etag = get_categories_body(cur, serialize_datetime)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CATEGORY_CACHE_TTL = float(os.environ.get('CATEGORY_CACHE_TTL', '30'))
+CATEGORIES_CACHE_KEY = 'forum_categories'
+
+_lock = threading.Lock()
+_cached: Optional[Dict[str, Any]] = None
+
+
+def bump_cache_version(cur, name: str = CATEGORIES_CACHE_KEY) -> None:
+    """Увеличить версию кэша (вызывать в транзакции мутации)"""
+    cur.execute("""
+        INSERT INTO cache_versions (name, version)
+        VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE
+        SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (name,))
+
+
+def invalidate_categories() -> None:
+    """Сбросить кэш текущего контейнера"""
+    global _cached
+    with _lock:
+        _cached = None
+
+
+def _current_version(cur) -> int:
+    cur.execute("SELECT version FROM cache_versions WHERE name = %s", (CATEGORIES_CACHE_KEY,))
+    row = cur.fetchone()
+    return row['version'] if row else 0
+
+
+def _build_tree(cur):
+    cur.execute("""
+        SELECT id, name, slug, description, icon, color, display_order, created_at, parent_id
+        FROM forum_categories
+        WHERE removed_at IS NULL
+        ORDER BY display_order ASC, name ASC
+    """)
+    all_categories = cur.fetchall()
+
+    parent_categories = []
+    subcategories_map = {}
+
+    for cat in all_categories:
+        cat_dict = dict(cat)
+        if cat['parent_id'] is None:
+            cat_dict['subcategories'] = []
+            parent_categories.append(cat_dict)
+            subcategories_map[cat['id']] = cat_dict['subcategories']
+
+    for cat in all_categories:
+        if cat['parent_id'] is not None:
+            parent_id = cat['parent_id']
+            if parent_id in subcategories_map:
+                subcategories_map[parent_id].append(dict(cat))
+
+    return parent_categories
+
+
+def get_categories_body(cur, serializer: Callable[[Any], Any]) -> Tuple[str, str]:
+    """JSON тела ответа get_categories и его ETag"""
+    global _cached
+    now = time.monotonic()
+    cached = _cached
+    if cached and now - cached['checked_at'] < CATEGORY_CACHE_TTL:
+        return cached['body'], cached['etag']
+
+    version = _current_version(cur)
+    if cached and cached['version'] == version:
+        with _lock:
+            cached['checked_at'] = now
+        return cached['body'], cached['etag']
+
+    body = json.dumps({
+        'success': True,
+        'categories': _build_tree(cur)
+    }, default=serializer)
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+    with _lock:
+        _cached = {'version': version, 'body': body, 'etag': etag, 'checked_at': now}
+    return body, etag
@@ -0,0 +1,273 @@
+"""
+Пул подключений к PostgreSQL для backend функций
+Соединения живут на уровне модуля и переиспользуются между вызовами
+на "тёплом" контейнере, вместо нового TCP/auth handshake на каждый запрос.
+
+Использование:
+    from db_pool import get_db_connection, get_pool_stats
+
+    conn = get_db_connection(cursor_factory=RealDictCursor)
+    try:
+        ...
+    finally:
+        conn.close()  # возвращает соединение в пул
+
+Настройки (переменные окружения):
+    DB_POOL_MIN_SIZE            - сколько соединений открыть при создании пула (1)
+    DB_POOL_MAX_SIZE            - максимум одновременно открытых соединений (5)
+    DB_POOL_WAIT_TIMEOUT        - сколько секунд ждать свободное соединение (10)
+    DB_POOL_HEALTH_CHECK_AFTER  - после скольких секунд простоя проверять соединение SELECT 1 (30)
+    DB_POOL_MAX_LIFETIME        - максимальный возраст соединения в секундах (1800)
+"""
+
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '5'))
+POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '10'))
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', '30'))
+POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800'))
+
+# Шаг ожидания: соединение, потерянное обработчиком без close(), освобождает
+# место в пуле только после сборки мусора, уведомления об этом не приходит
+_WAIT_SLICE = 0.05
+
+
+class PoolExhaustedError(psycopg2.OperationalError):
+    """Нет свободного соединения за DB_POOL_WAIT_TIMEOUT секунд"""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Соединение, которое при close() возвращается в пул вместо закрытия"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool: Optional['ConnectionPool'] = None
+        self._in_use = False
+        self._created_at = time.monotonic()
+        self._released_at = self._created_at
+
+    def close(self):
+        if self._pool is None:
+            super().close()
+        elif self._in_use:
+            self._pool.release(self)
+
+    def close_physically(self):
+        """Действительно закрыть соединение с сервером"""
+        self._pool = None
+        self._in_use = False
+        if not self.closed:
+            super().close()
+
+
+class ConnectionPool:
+    """Потокобезопасный LIFO пул соединений с проверкой при выдаче"""
+
+    def __init__(self, dsn: str, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 wait_timeout: float = POOL_WAIT_TIMEOUT):
+        self.dsn = dsn
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.wait_timeout = wait_timeout
+        self._idle: List[PooledConnection] = []
+        self._in_use: 'weakref.WeakSet[PooledConnection]' = weakref.WeakSet()
+        self._opening = 0
+        self._cond = threading.Condition()
+        self._stats: Dict[str, float] = {
+            'checkouts': 0,
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_ms_total': 0.0,
+            'wait_time_ms_max': 0.0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'resets': 0,
+            'discarded': 0
+        }
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _connect(self) -> PooledConnection:
+        conn = psycopg2.connect(self.dsn, connection_factory=PooledConnection)
+        conn._pool = self
+        return conn
+
+    def prewarm(self):
+        """Открыть min_size соединений заранее"""
+        while True:
+            with self._cond:
+                if self._size() >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                conn = self._connect()
+            except psycopg2.Error:
+                with self._cond:
+                    self._opening -= 1
+                return
+            with self._cond:
+                self._opening -= 1
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - conn._created_at > POOL_MAX_LIFETIME:
+            return False
+        if now - conn._released_at < POOL_HEALTH_CHECK_AFTER:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: PooledConnection):
+        self._stats['discarded'] += 1
+        try:
+            conn.close_physically()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self, cursor_factory: Any = None) -> PooledConnection:
+        """Взять соединение из пула (или открыть новое, если есть место)"""
+        started = time.monotonic()
+        deadline = started + self.wait_timeout
+        waited = False
+
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size() >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolExhaustedError(
+                            f'Нет свободных соединений в пуле (max_size={self.max_size})'
+                        )
+                    waited = True
+                    self._cond.wait(min(remaining, _WAIT_SLICE))
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._in_use.add(conn)
+                else:
+                    self._opening += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use.add(conn)
+                    self._stats['misses'] += 1
+                break
+
+            if self._is_healthy(conn):
+                with self._cond:
+                    self._stats['hits'] += 1
+                break
+
+            with self._cond:
+                self._in_use.discard(conn)
+                self._stats['health_check_failures'] += 1
+                self._discard(conn)
+                self._cond.notify()
+
+        with self._cond:
+            self._stats['checkouts'] += 1
+            if waited:
+                wait_ms = (time.monotonic() - started) * 1000
+                self._stats['waits'] += 1
+                self._stats['wait_time_ms_total'] += wait_ms
+                self._stats['wait_time_ms_max'] = max(self._stats['wait_time_ms_max'], wait_ms)
+
+        conn.cursor_factory = cursor_factory
+        conn._in_use = True
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Вернуть соединение в пул; незавершённая транзакция откатывается"""
+        conn._in_use = False
+        reusable = not conn.closed
+        if reusable:
+            try:
+                status = conn.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    if status != psycopg2.extensions.TRANSACTION_STATUS_INTRANS:
+                        self._stats['resets'] += 1
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+                conn.cursor_factory = None
+            except psycopg2.Error:
+                reusable = False
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if reusable and len(self._idle) < self.max_size:
+                conn._released_at = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            result: Dict[str, Any] = dict(self._stats)
+            result['size'] = self._size()
+            result['idle'] = len(self._idle)
+            result['in_use'] = len(self._in_use)
+            result['min_size'] = self.min_size
+            result['max_size'] = self.max_size
+        checkouts = result['checkouts']
+        result['hit_rate'] = round(result['hits'] / checkouts, 4) if checkouts else 0.0
+        result['wait_time_ms_total'] = round(result['wait_time_ms_total'], 3)
+        result['wait_time_ms_max'] = round(result['wait_time_ms_max'], 3)
+        return result
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Пул текущего контейнера (создаётся при первом обращении)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(os.environ.get('DATABASE_URL'))
+                pool.prewarm()
+                _pool = pool
+    return _pool
+
+
+def get_db_connection(cursor_factory: Any = None) -> PooledConnection:
+    """Получить подключение к БД из пула"""
+    return get_pool().getconn(cursor_factory=cursor_factory)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Счётчики пула: hits/misses, ожидания и их суммарное время"""
+    if _pool is None:
+        return {}
+    return _pool.stats()
@@ -0,0 +1,113 @@
+"""
+Полнотекстовый поиск по форуму (action=search)
+Ищет по forum_topics.search_vector / forum_comments.search_vector
+(GIN индексы, поддерживаются триггерами, см. V0136). Запрос разбирается
+websearch_to_tsquery в русской и английской конфигурациях, результаты
+ранжируются ts_rank и подсвечиваются ts_headline только для строк
+текущей страницы. Пагинация keyset по (rank, id); все фильтры, включая
+удалённые темы для комментариев, применяются до LIMIT страницы.
+"""
+
+import html
+from typing import Any, Callable, Dict, List, Optional
+
+SEARCH_QUERY_MIN_LENGTH = 2
+SEARCH_QUERY_MAX_LENGTH = 200
+
+# Маркеры подсветки из Private Use Area: текст экранируется, затем маркеры заменяются на <mark>
+_MARK_START = '\ue000'
+_MARK_STOP = '\ue001'
+_HEADLINE_OPTIONS = f'StartSel="{_MARK_START}", StopSel="{_MARK_STOP}", MaxFragments=2, MaxWords=30, MinWords=10'
+_TITLE_HEADLINE_OPTIONS = f'StartSel="{_MARK_START}", StopSel="{_MARK_STOP}", HighlightAll=true'
+
+_QUERY_CTE = """
+    WITH q AS (
+        SELECT (websearch_to_tsquery('russian', %s) || websearch_to_tsquery('english', %s)) AS query
+    )
+"""
+
+
+def render_highlight(text: Optional[str]) -> Optional[str]:
+    """Экранировать HTML и превратить маркеры ts_headline в <mark>"""
+    if text is None:
+        return None
+    return html.escape(text).replace(_MARK_START, '<mark>').replace(_MARK_STOP, '</mark>')
+
+
+def search_forum(cur, query: str, scope: str, limit: int, cursor_values: Optional[List[Any]],
+                 encode_cursor: Callable[[List[Any]], str]) -> Dict[str, Any]:
+    """Страница результатов поиска по темам (scope=topics) или комментариям (scope=comments)"""
+    params: List[Any] = [query, query]
+    keyset_sql = ''
+    if cursor_values:
+        keyset_sql = " AND (ts_rank(src.search_vector, q.query)::float8, src.id) < (%s::float8, %s)"
+
+    if scope == 'comments':
+        sql = _QUERY_CTE + f"""
+            SELECT
+                page.id, page.rank, src.topic_id, src.parent_id, src.created_at,
+                ft.title as topic_title,
+                u.id as author_id, u.username as author_name,
+                ts_headline('russian', src.content, q.query, %s) as highlight
+            FROM (
+                SELECT src.id, ts_rank(src.search_vector, q.query)::float8 AS rank
+                FROM forum_comments src, q
+                WHERE src.search_vector @@ q.query AND src.removed_at IS NULL
+                  AND EXISTS (
+                      SELECT 1 FROM forum_topics t
+                      WHERE t.id = src.topic_id AND t.removed_at IS NULL
+                  ){keyset_sql}
+                ORDER BY rank DESC, src.id DESC
+                LIMIT %s
+            ) page
+            JOIN forum_comments src ON src.id = page.id
+            JOIN forum_topics ft ON ft.id = src.topic_id
+            LEFT JOIN users u ON u.id = src.author_id
+            CROSS JOIN q
+            ORDER BY page.rank DESC, page.id DESC
+        """
+        params.append(_HEADLINE_OPTIONS)
+    else:
+        sql = _QUERY_CTE + f"""
+            SELECT
+                page.id, page.rank, src.created_at, src.category_id, src.comments_count,
+                src.is_pinned, src.is_closed,
+                u.id as author_id, u.username as author_name,
+                ts_headline('russian', src.title, q.query, %s) as title_highlight,
+                ts_headline('russian', src.content, q.query, %s) as highlight
+            FROM (
+                SELECT src.id, ts_rank(src.search_vector, q.query)::float8 AS rank
+                FROM forum_topics src, q
+                WHERE src.search_vector @@ q.query AND src.removed_at IS NULL{keyset_sql}
+                ORDER BY rank DESC, src.id DESC
+                LIMIT %s
+            ) page
+            JOIN forum_topics src ON src.id = page.id
+            LEFT JOIN users u ON u.id = src.author_id
+            CROSS JOIN q
+            ORDER BY page.rank DESC, page.id DESC
+        """
+        params.extend([_TITLE_HEADLINE_OPTIONS, _HEADLINE_OPTIONS])
+
+    if cursor_values:
+        params.extend([float(cursor_values[0]), int(cursor_values[1])])
+    params.append(limit + 1)
+
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    results = []
+    for row in rows:
+        result = dict(row)
+        result['highlight'] = render_highlight(result['highlight'])
+        if 'title_highlight' in result:
+            result['title_highlight'] = render_highlight(result['title_highlight'])
+        results.append(result)
+
+    return {
+        'results': results,
+        'has_more': has_more,
+        'next_cursor': encode_cursor([rows[-1]['rank'], rows[-1]['id']]) if has_more else None
+    }
@@ -6,30 +6,18 @@ Returns: HTTP response dict с темами/комментариями или р
 '''
 
 import json
-import os
-from typing import Dict, Any, List
+import base64
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
-import psycopg2
 from psycopg2.extras import RealDictCursor
-import requests
-
-def send_telegram_notification(event_type: str, user_info: Dict, details: Dict):
-    '''Send notification to admin via Telegram'''
-    try:
-        telegram_url = 'https://functions.poehali.dev/02d813a8-279b-4a13-bfe4-ffb7d0cf5a3f'
-        payload = {
-            'event_type': event_type,
-            'user_info': user_info,
-            'details': details
-        }
-        requests.post(telegram_url, json=payload, timeout=5)
-    except:
-        pass
-
-def get_db_connection():
-    """Получить подключение к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+from db_pool import get_db_connection
+from topic_views import VIEWS_SQL, fold_batch, record_topic_view, merge_pending_views, flush_topic_views
+from scheduled_jobs import is_job_request, run_job_step
+from category_cache import get_categories_body, invalidate_categories, bump_cache_version
+from forum_search import SEARCH_QUERY_MIN_LENGTH, SEARCH_QUERY_MAX_LENGTH, search_forum
+from notification_outbox import enqueue_notification
+from presence import attach_last_seen
+from rate_limit import rate_limited
 
 def serialize_datetime(obj):
     """Сериализация datetime объектов в ISO формат с UTC"""
@@ -45,6 +33,122 @@ def is_admin(cur, user_id: str) -> bool:
     user = cur.fetchone()
     return user and user['role'] == 'admin'
 
+def categories_response(cur, event: Dict[str, Any]) -> Dict[str, Any]:
+    """Ответ get_categories из кэша, 304 если If-None-Match совпадает с ETag"""
+    body, etag = get_categories_body(cur, serialize_datetime)
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'Cache-Control': 'public, max-age=30',
+        'ETag': etag
+    }
+    
+    if_none_match = ''
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'if-none-match':
+            if_none_match = value or ''
+            break
+    client_etags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    if etag in client_etags or '*' in client_etags:
+        return {
+            'statusCode': 304,
+            'headers': headers,
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+TOPICS_PAGE_DEFAULT_LIMIT = 20
+TOPICS_PAGE_MAX_LIMIT = 100
+COMMENTS_PAGE_DEFAULT_LIMIT = 30
+
+def parse_page_limit(value: Any, default: int = TOPICS_PAGE_DEFAULT_LIMIT, maximum: int = TOPICS_PAGE_MAX_LIMIT) -> int:
+    """Размер страницы из query-параметра с ограничением сверху"""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), maximum))
+
+def encode_cursor(values: List[Any]) -> str:
+    """Упаковать ключ сортировки последней строки страницы в непрозрачный курсор"""
+    plain = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Распаковать курсор, ValueError если он повреждён"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Неверный курсор')
+    return values
+
+def fetch_comments_page(cur, filter_sql: str, filter_params: List[Any], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """Страница комментариев (keyset по created_at, id) с числом прямых ответов у каждого"""
+    query = f"""
+        SELECT 
+            fc.id, fc.content, fc.created_at, fc.parent_id,
+            fc.attachment_url, fc.attachment_filename, fc.attachment_size, fc.attachment_type,
+            u.id as author_id, u.username as author_name, u.avatar_url as author_avatar,
+            u.forum_role as author_forum_role,
+            u.is_verified as author_is_verified,
+            (
+                SELECT COUNT(*) FROM forum_comments r
+                WHERE r.parent_id = fc.id AND r.removed_at IS NULL
+            ) as replies_count
+        FROM forum_comments fc
+        LEFT JOIN users u ON fc.author_id = u.id
+        WHERE {filter_sql} AND fc.removed_at IS NULL
+    """
+    query_params = list(filter_params)
+    
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+        query += " AND (fc.created_at, fc.id) > (%s, %s)"
+        query_params.extend([datetime.fromisoformat(cursor_created_at), int(cursor_id)])
+    
+    query += " ORDER BY fc.created_at ASC, fc.id ASC LIMIT %s"
+    query_params.append(limit + 1)
+    
+    cur.execute(query, query_params)
+    comments = cur.fetchall()
+    
+    has_more = len(comments) > limit
+    comments = [dict(c) for c in comments[:limit]]
+    attach_last_seen(cur, comments, 'author_id', 'author_last_seen')
+    return {
+        'comments': comments,
+        'has_more': has_more,
+        'next_cursor': encode_cursor([comments[-1]['created_at'], comments[-1]['id']]) if has_more else None
+    }
+
+def remove_comment(cur, comment_id) -> None:
+    """Мягкое удаление комментария с пересчётом comments_count/last_comment_at темы"""
+    cur.execute("""
+        UPDATE forum_comments 
+        SET removed_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND removed_at IS NULL
+        RETURNING topic_id
+    """, (comment_id,))
+    removed = cur.fetchone()
+    
+    if removed:
+        cur.execute("""
+            UPDATE forum_topics 
+            SET comments_count = GREATEST(comments_count - 1, 0),
+                last_comment_at = (
+                    SELECT MAX(created_at) FROM forum_comments
+                    WHERE topic_id = %s AND removed_at IS NULL
+                )
+            WHERE id = %s
+        """, (removed['topic_id'], removed['topic_id']))
+
+@rate_limited()
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -54,14 +158,35 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, If-None-Match',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
     
-    conn = get_db_connection()
+    # Перенос просмотров в forum_topics.views по расписанию: только планировщик, одна пачка тем за вызов
+    if method == 'GET' and (event.get('queryStringParameters') or {}).get('action') == 'fold_views':
+        if not is_job_request(event):
+            return {
+                'statusCode': 403,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Доступ запрещён'}),
+                'isBase64Encoded': False
+            }
+        job_conn = get_db_connection()
+        try:
+            stats = run_job_step(job_conn, 'fold_views', fold_batch)
+        finally:
+            job_conn.close()
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': True, **stats}),
+            'isBase64Encoded': False
+        }
+    
+    conn = get_db_connection(cursor_factory=RealDictCursor)
     cur = conn.cursor()
     
     try:
@@ -69,13 +194,90 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             params = event.get('queryStringParameters', {}) or {}
             topic_id = params.get('topic_id')
             
-            if topic_id:
-                cur.execute("""
+            if params.get('action') in ('get_comments', 'get_replies'):
+                # Догрузка корневых комментариев темы или ответов на комментарий
+                if params['action'] == 'get_comments':
+                    filter_sql, filter_value = 'fc.topic_id = %s AND fc.parent_id IS NULL', topic_id
+                else:
+                    filter_sql, filter_value = 'fc.parent_id = %s', params.get('comment_id')
+                
+                if not filter_value:
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Не указан topic_id или comment_id'}),
+                        'isBase64Encoded': False
+                    }
+                
+                try:
+                    page = fetch_comments_page(
+                        cur, filter_sql, [filter_value],
+                        parse_page_limit(params.get('limit'), COMMENTS_PAGE_DEFAULT_LIMIT),
+                        params.get('cursor')
+                    )
+                except (ValueError, TypeError):
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Неверные параметры пагинации'}),
+                        'isBase64Encoded': False
+                    }
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps(page, default=serialize_datetime),
+                    'isBase64Encoded': False
+                }
+            elif params.get('action') == 'search':
+                search_query = (params.get('q') or '').strip()
+                scope = params.get('scope') or 'topics'
+                
+                if len(search_query) < SEARCH_QUERY_MIN_LENGTH or len(search_query) > SEARCH_QUERY_MAX_LENGTH:
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': f'Длина запроса от {SEARCH_QUERY_MIN_LENGTH} до {SEARCH_QUERY_MAX_LENGTH} символов'}),
+                        'isBase64Encoded': False
+                    }
+                
+                if scope not in ('topics', 'comments'):
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'scope должен быть topics или comments'}),
+                        'isBase64Encoded': False
+                    }
+                
+                try:
+                    cursor = params.get('cursor')
+                    page = search_forum(
+                        cur, search_query, scope,
+                        parse_page_limit(params.get('limit')),
+                        decode_cursor(cursor, 2) if cursor else None,
+                        encode_cursor
+                    )
+                except (ValueError, TypeError):
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Неверные параметры пагинации'}),
+                        'isBase64Encoded': False
+                    }
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps(page, default=serialize_datetime),
+                    'isBase64Encoded': False
+                }
+            elif topic_id:
+                cur.execute(f"""
                     SELECT 
-                        ft.id, ft.title, ft.content, ft.views, ft.is_pinned, ft.is_closed,
+                        ft.id, ft.title, ft.content, {VIEWS_SQL} as views, ft.is_pinned, ft.is_closed,
                         ft.created_at, ft.updated_at, ft.category_id,
                         u.id as author_id, u.username as author_name, u.avatar_url as author_avatar,
-                        u.forum_role as author_forum_role, u.last_seen_at as author_last_seen,
+                        u.forum_role as author_forum_role,
                         u.is_verified as author_is_verified,
                         p.id as plugin_id, p.title as plugin_title,
                         fc.name as category_name, fc.slug as category_slug, fc.color as category_color, fc.icon as category_icon,
@@ -98,83 +300,69 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
-                cur.execute("""
-                    SELECT 
-                        fc.id, fc.content, fc.created_at, fc.parent_id,
-                        fc.attachment_url, fc.attachment_filename, fc.attachment_size, fc.attachment_type,
-                        u.id as author_id, u.username as author_name, u.avatar_url as author_avatar,
-                        u.forum_role as author_forum_role, u.last_seen_at as author_last_seen,
-                        u.is_verified as author_is_verified
-                    FROM forum_comments fc
-                    LEFT JOIN users u ON fc.author_id = u.id
-                    WHERE fc.topic_id = %s AND fc.removed_at IS NULL
-                    ORDER BY fc.created_at ASC
-                """, (topic_id,))
-                comments = cur.fetchall()
+                response_data: Dict[str, Any] = {'topic': dict(topic)}
+                attach_last_seen(cur, [response_data['topic']], 'author_id', 'author_last_seen')
                 
-                cur.execute("UPDATE forum_topics SET views = views + 1 WHERE id = %s", (topic_id,))
-                conn.commit()
+                if params.get('limit'):
+                    # Первая страница корневых комментариев, ответы догружаются через get_replies
+                    try:
+                        comments_limit = parse_page_limit(params.get('limit'), COMMENTS_PAGE_DEFAULT_LIMIT)
+                    except (ValueError, TypeError):
+                        return {
+                            'statusCode': 400,
+                            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                            'body': json.dumps({'error': 'Неверные параметры пагинации'}),
+                            'isBase64Encoded': False
+                        }
+                    response_data.update(fetch_comments_page(
+                        cur, 'fc.topic_id = %s AND fc.parent_id IS NULL', [topic_id], comments_limit, None
+                    ))
+                else:
+                    cur.execute("""
+                        SELECT 
+                            fc.id, fc.content, fc.created_at, fc.parent_id,
+                            fc.attachment_url, fc.attachment_filename, fc.attachment_size, fc.attachment_type,
+                            u.id as author_id, u.username as author_name, u.avatar_url as author_avatar,
+                            u.forum_role as author_forum_role,
+                            u.is_verified as author_is_verified
+                        FROM forum_comments fc
+                        LEFT JOIN users u ON fc.author_id = u.id
+                        WHERE fc.topic_id = %s AND fc.removed_at IS NULL
+                        ORDER BY fc.created_at ASC
+                    """, (topic_id,))
+                    response_data['comments'] = [dict(c) for c in cur.fetchall()]
+                    attach_last_seen(cur, response_data['comments'], 'author_id', 'author_last_seen')
                 
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'topic': dict(topic),
-                        'comments': [dict(c) for c in comments]
-                    }, default=serialize_datetime),
-                    'isBase64Encoded': False
-                }
-            elif params.get('action') == 'get_categories':
-                cur.execute("""
-                    SELECT id, name, slug, description, icon, color, display_order, created_at, parent_id
-                    FROM forum_categories
-                    WHERE removed_at IS NULL
-                    ORDER BY display_order ASC, name ASC
-                """)
-                all_categories = cur.fetchall()
-                
-                parent_categories = []
-                subcategories_map = {}
-                
-                for cat in all_categories:
-                    cat_dict = dict(cat)
-                    if cat['parent_id'] is None:
-                        cat_dict['subcategories'] = []
-                        parent_categories.append(cat_dict)
-                        subcategories_map[cat['id']] = cat_dict['subcategories']
-                
-                for cat in all_categories:
-                    if cat['parent_id'] is not None:
-                        parent_id = cat['parent_id']
-                        if parent_id in subcategories_map:
-                            subcategories_map[parent_id].append(dict(cat))
+                record_topic_view(topic_id)
+                merge_pending_views([response_data['topic']])
+                flush_topic_views(conn)
                 
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'success': True,
-                        'categories': parent_categories
-                    }, default=serialize_datetime),
+                    'body': json.dumps(response_data, default=serialize_datetime),
                     'isBase64Encoded': False
                 }
+            elif params.get('action') == 'get_categories':
+                return categories_response(cur, event)
             else:
                 plugin_id = params.get('plugin_id')
                 category_slug = params.get('category')
-                query = """
+                # Пагинация включается параметром limit или cursor, без них - прежний полный список.
+                # Вместо content - превью (excerpt), полный текст отдаёт запрос по topic_id
+                paginated = bool(params.get('limit') or params.get('cursor'))
+                query = f"""
                     SELECT 
-                        ft.id, ft.title, ft.content, ft.views, ft.is_pinned, ft.is_closed, ft.created_at, ft.updated_at, ft.category_id,
+                        ft.id, ft.title, ft.excerpt, ft.content_length, {VIEWS_SQL} as views, ft.is_pinned, ft.is_closed, ft.created_at, ft.updated_at, ft.category_id,
                         u.id as author_id, u.username as author_name, u.avatar_url as author_avatar, 
-                        u.forum_role as author_forum_role, u.last_seen_at as author_last_seen,
+                        u.forum_role as author_forum_role,
                         u.is_verified as author_is_verified,
                         fcat.name as category_name, fcat.slug as category_slug, fcat.color as category_color, fcat.icon as category_icon,
                         parent_fc.name as parent_category_name, parent_fc.slug as parent_category_slug,
                         parent_fc.color as parent_category_color, parent_fc.icon as parent_category_icon,
-                        COUNT(fcom.id) as comments_count,
-                        MAX(fcom.created_at) as last_comment_at
+                        ft.comments_count, ft.last_comment_at
                     FROM forum_topics ft
                     LEFT JOIN users u ON ft.author_id = u.id
-                    LEFT JOIN forum_comments fcom ON ft.id = fcom.topic_id AND fcom.removed_at IS NULL
                     LEFT JOIN forum_categories fcat ON ft.category_id = fcat.id
                     LEFT JOIN forum_categories parent_fc ON fcat.parent_id = parent_fc.id
                     WHERE ft.removed_at IS NULL
@@ -186,20 +374,57 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     query_params.append(plugin_id)
                 
                 if category_slug:
-                    query += " AND fcat.slug = %s"
+                    query += " AND ft.category_id IN (SELECT id FROM forum_categories WHERE slug = %s)"
                     query_params.append(category_slug)
                 
-                query += " GROUP BY ft.id, ft.updated_at, u.id, u.username, u.avatar_url, u.forum_role, u.last_seen_at, fcat.id, fcat.name, fcat.slug, fcat.color, fcat.icon, parent_fc.id, parent_fc.name, parent_fc.slug, parent_fc.color, parent_fc.icon ORDER BY ft.is_pinned DESC, ft.created_at DESC"
+                limit = None
+                if paginated:
+                    try:
+                        limit = parse_page_limit(params.get('limit'))
+                        cursor = params.get('cursor')
+                        if cursor:
+                            cursor_pinned, cursor_created_at, cursor_id = decode_cursor(cursor, 3)
+                            query += " AND (ft.is_pinned, ft.created_at, ft.id) < (%s, %s, %s)"
+                            query_params.extend([
+                                bool(cursor_pinned),
+                                datetime.fromisoformat(cursor_created_at),
+                                int(cursor_id)
+                            ])
+                    except (ValueError, TypeError):
+                        return {
+                            'statusCode': 400,
+                            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                            'body': json.dumps({'error': 'Неверные параметры пагинации'}),
+                            'isBase64Encoded': False
+                        }
+                
+                query += " ORDER BY ft.is_pinned DESC, ft.created_at DESC, ft.id DESC"
+                
+                if limit is not None:
+                    query += " LIMIT %s"
+                    query_params.append(limit + 1)
                 
                 cur.execute(query, query_params)
                 topics = cur.fetchall()
                 
+                response_data: Dict[str, Any] = {}
+                if limit is not None:
+                    has_more = len(topics) > limit
+                    topics = topics[:limit]
+                    last_topic = topics[-1] if topics else None
+                    response_data['has_more'] = has_more
+                    response_data['next_cursor'] = encode_cursor([
+                        last_topic['is_pinned'], last_topic['created_at'], last_topic['id']
+                    ]) if has_more else None
+                response_data['topics'] = [dict(t) for t in topics]
+                attach_last_seen(cur, response_data['topics'], 'author_id', 'author_last_seen')
+                merge_pending_views(response_data['topics'])
+                flush_topic_views(conn)
+                
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'topics': [dict(t) for t in topics]
-                    }, default=serialize_datetime),
+                    'body': json.dumps(response_data, default=serialize_datetime),
                     'isBase64Encoded': False
                 }
         
@@ -272,7 +497,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 cur.execute("""
                     INSERT INTO forum_topics (title, content, author_id, plugin_id, category_id)
                     VALUES (%s, %s, %s, %s, %s)
-                    RETURNING id, title, content, views, created_at
+                    RETURNING id, title, content, excerpt, content_length, views, created_at
                 """, (title, content, user_id, plugin_id, category_id))
                 
                 new_topic = cur.fetchone()
@@ -286,15 +511,17 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 category_data = cur.fetchone()
                 category_name = category_data['name'] if category_data else 'Unknown'
                 
-                conn.commit()
-                
-                # Send Telegram notification to admin
-                send_telegram_notification(
+                # Уведомление администратору уходит через outbox вместе с темой
+                enqueue_notification(
+                    cur,
                     'forum_topic_created',
                     {'username': username, 'user_id': user_id},
-                    {'title': title, 'category': category_name}
+                    {'title': title, 'category': category_name},
+                    dedup_key=f"forum_topic_created:{new_topic['id']}"
                 )
                 
+                conn.commit()
+                
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -388,22 +615,28 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                             f'{commenter["username"]} оставил комментарий в теме "{topic_data["title"]}"',
                             f'/forum/topic/{topic_id}'
                         ))
+                        
+                        enqueue_notification(
+                            cur,
+                            'forum_comment',
+                            {'username': commenter['username'], 'user_id': user_id},
+                            {
+                                'topic_id': topic_id,
+                                'topic_title': topic_data['title'],
+                                'comment': content
+                            },
+                            dedup_key=f"forum_comment:{new_comment['id']}"
+                        )
                 
-                cur.execute("UPDATE forum_topics SET updated_at = CURRENT_TIMESTAMP WHERE id = %s", (topic_id,))
+                cur.execute("""
+                    UPDATE forum_topics 
+                    SET updated_at = CURRENT_TIMESTAMP,
+                        comments_count = comments_count + 1,
+                        last_comment_at = %s
+                    WHERE id = %s
+                """, (new_comment['created_at'], topic_id))
                 conn.commit()
                 
-                # Отправляем уведомление в Telegram
-                if commenter and topic_data:
-                    send_telegram_notification(
-                        'forum_comment',
-                        {'username': commenter['username'], 'user_id': user_id},
-                        {
-                            'topic_id': topic_id,
-                            'topic_title': topic_data['title'],
-                            'comment': content
-                        }
-                    )
-                
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -415,39 +648,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             elif action == 'get_categories':
-                cur.execute("""
-                    SELECT id, name, slug, description, icon, color, display_order, created_at, parent_id
-                    FROM forum_categories
-                    WHERE removed_at IS NULL
-                    ORDER BY display_order ASC, name ASC
-                """)
-                all_categories = cur.fetchall()
-                
-                parent_categories = []
-                subcategories_map = {}
-                
-                for cat in all_categories:
-                    cat_dict = dict(cat)
-                    if cat['parent_id'] is None:
-                        cat_dict['subcategories'] = []
-                        parent_categories.append(cat_dict)
-                        subcategories_map[cat['id']] = cat_dict['subcategories']
-                
-                for cat in all_categories:
-                    if cat['parent_id'] is not None:
-                        parent_id = cat['parent_id']
-                        if parent_id in subcategories_map:
-                            subcategories_map[parent_id].append(dict(cat))
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'success': True,
-                        'categories': parent_categories
-                    }, default=serialize_datetime),
-                    'isBase64Encoded': False
-                }
+                return categories_response(cur, event)
             
             elif action == 'admin_update_topic':
                 if not is_admin(cur, user_id):
@@ -498,7 +699,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     UPDATE forum_topics 
                     SET {', '.join(update_fields)}
                     WHERE id = %s
-                    RETURNING id, title, content, is_pinned, is_closed, category_id, updated_at
+                    RETURNING id, title, content, excerpt, content_length, is_pinned, is_closed, category_id, updated_at
                 """, update_values)
                 
                 updated_topic = cur.fetchone()
@@ -567,12 +768,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
-                cur.execute("""
-                    UPDATE forum_comments 
-                    SET removed_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (comment_id,))
-                
+                remove_comment(cur, comment_id)
                 conn.commit()
                 
                 return {
@@ -601,12 +797,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
-                cur.execute("""
-                    UPDATE forum_comments 
-                    SET removed_at = NOW()
-                    WHERE id = %s
-                """, (reply_id,))
-                
+                remove_comment(cur, reply_id)
                 conn.commit()
                 
                 return {
@@ -704,7 +895,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     """, (name, slug, description, icon, color, parent_id, display_order))
                     
                     new_category = cur.fetchone()
+                    bump_cache_version(cur)
                     conn.commit()
+                    invalidate_categories()
                     
                     return {
                         'statusCode': 200,
@@ -761,7 +954,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     """, update_values)
                     
                     updated_category = cur.fetchone()
+                    bump_cache_version(cur)
                     conn.commit()
+                    invalidate_categories()
                     
                     return {
                         'statusCode': 200,
@@ -790,7 +985,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         WHERE id = %s
                     """, (category_id,))
                     
+                    bump_cache_version(cur)
                     conn.commit()
+                    invalidate_categories()
                     
                     return {
                         'statusCode': 200,
@@ -0,0 +1,169 @@
+"""
+Буферизованный счётчик просмотров тем форума
+Просмотр темы не делает UPDATE forum_topics: инкременты копятся в памяти
+контейнера и раз в VIEW_FLUSH_INTERVAL секунд одним INSERT уходят в
+append-таблицу topic_view_deltas. Запрос к форуму только дописывает дельты и
+не блокирует строки forum_topics; перенос дельт в forum_topics.views одним
+UPDATE ... FROM (VALUES ...) на пачку тем выполняется отдельно - воркером:
+    python3 topic_views.py
+или по расписанию: GET ?action=fold_views функции forum с заголовком
+X-Job-Secret (scheduled_jobs.py), одна пачка тем за вызов. До переноса
+просмотры считаются через VIEWS_SQL.
+
+Использование:
+    from topic_views import record_topic_view, merge_pending_views, flush_topic_views
+
+    record_topic_view(topic_id)
+    merge_pending_views(rows)
+    flush_topic_views(conn)
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+VIEW_FLUSH_INTERVAL = float(os.environ.get('VIEW_FLUSH_INTERVAL', '10'))
+VIEW_FLUSH_MAX_PENDING = int(os.environ.get('VIEW_FLUSH_MAX_PENDING', '200'))
+VIEW_FOLD_INTERVAL = float(os.environ.get('VIEW_FOLD_INTERVAL', '60'))
+VIEW_FOLD_BATCH_SIZE = int(os.environ.get('VIEW_FOLD_BATCH_SIZE', '500'))
+
+# Ключ advisory lock: переносом дельт в forum_topics занимается один процесс за раз
+VIEW_FOLD_LOCK_KEY = 7310041
+
+# SQL-выражение просмотров с учётом ещё не перенесённых дельт
+VIEWS_SQL = "ft.views + COALESCE((SELECT SUM(tvd.delta) FROM topic_view_deltas tvd WHERE tvd.topic_id = ft.id), 0)"
+
+_pending: Dict[int, int] = {}
+_pending_total = 0
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def record_topic_view(topic_id: Any) -> None:
+    """Учесть просмотр темы в буфере процесса"""
+    global _pending_total
+    topic_id = int(topic_id)
+    with _lock:
+        _pending[topic_id] = _pending.get(topic_id, 0) + 1
+        _pending_total += 1
+
+
+def merge_pending_views(rows: Iterable[Dict[str, Any]]) -> None:
+    """Добавить к полю views строк буферизованные в процессе просмотры"""
+    with _lock:
+        if not _pending:
+            return
+        for row in rows:
+            row['views'] = (row.get('views') or 0) + _pending.get(row['id'], 0)
+
+
+def _take_pending() -> List[Tuple[int, int]]:
+    global _pending_total
+    with _lock:
+        batch = list(_pending.items())
+        _pending.clear()
+        _pending_total = 0
+    return batch
+
+
+def _restore_pending(batch: List[Tuple[int, int]]) -> None:
+    global _pending_total
+    with _lock:
+        for topic_id, delta in batch:
+            _pending[topic_id] = _pending.get(topic_id, 0) + delta
+            _pending_total += delta
+
+
+def fold_batch(conn, after_id: int = 0,
+               batch_size: int = VIEW_FOLD_BATCH_SIZE) -> Tuple[Dict[str, int], int]:
+    """Перенести дельты пачки тем после after_id в forum_topics.views, вернуть (статистика, последний id)"""
+    stats = {'topics': 0, 'views': 0}
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (VIEW_FOLD_LOCK_KEY,))
+        if not cur.fetchone()['locked']:
+            conn.commit()
+            stats['busy'] = 1
+            return stats, after_id
+
+        cur.execute("""
+            SELECT DISTINCT topic_id FROM topic_view_deltas
+            WHERE topic_id > %s
+            ORDER BY topic_id
+            LIMIT %s
+        """, (after_id, batch_size))
+        ids = [row['topic_id'] for row in cur.fetchall()]
+        if not ids:
+            conn.commit()
+            return stats, after_id
+
+        cur.execute("""
+            WITH moved AS (
+                DELETE FROM topic_view_deltas WHERE topic_id = ANY(%s) RETURNING topic_id, delta
+            )
+            SELECT topic_id, SUM(delta) AS delta FROM moved GROUP BY topic_id
+        """, (ids,))
+        totals = [(row['topic_id'], int(row['delta'])) for row in cur.fetchall()]
+        execute_values(cur, """
+            UPDATE forum_topics ft
+            SET views = ft.views + v.delta
+            FROM (VALUES %s) AS v(topic_id, delta)
+            WHERE ft.id = v.topic_id
+        """, totals)
+        stats['topics'] = len(totals)
+        stats['views'] = sum(delta for _, delta in totals)
+    conn.commit()
+    return stats, ids[-1]
+
+
+def fold_topic_view_deltas(conn, batch_size: int = VIEW_FOLD_BATCH_SIZE) -> Dict[str, int]:
+    """Перенести все дельты в forum_topics.views пачками тем"""
+    total = {'topics': 0, 'views': 0}
+    last_id = 0
+    while True:
+        stats, last_id = fold_batch(conn, last_id, batch_size)
+        if not stats['topics']:
+            return total
+        for key in total:
+            total[key] += stats[key]
+
+
+def flush_topic_views(conn, force: bool = False) -> None:
+    """Дописать буфер в topic_view_deltas, если подошёл срок или буфер полон.
+    Ошибки не пробрасываются: просмотры возвращаются в буфер до следующей попытки."""
+    global _flushed_at
+    now = time.monotonic()
+    if not force and _pending_total < VIEW_FLUSH_MAX_PENDING and now - _flushed_at < VIEW_FLUSH_INTERVAL:
+        return
+
+    batch = _take_pending()
+    _flushed_at = now
+    if not batch:
+        return
+
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, "INSERT INTO topic_view_deltas (topic_id, delta) VALUES %s", batch)
+        conn.commit()
+    except Exception as e:
+        print(f"[VIEWS] flush failed: {e}")
+        conn.rollback()
+        _restore_pending(batch)
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    while True:
+        worker_conn = get_db_connection()
+        try:
+            result = fold_topic_view_deltas(worker_conn)
+            if result['topics']:
+                print(f"[VIEWS] {result}")
+        except Exception as e:
+            print(f"[VIEWS] fold failed: {e}")
+        finally:
+            worker_conn.close()
+        time.sleep(VIEW_FOLD_INTERVAL)
@@ -0,0 +1,232 @@
+'''
+Business: Доставка уведомлений администратору из notification_outbox в telegram-notify
+Args: event - dict с httpMethod (вызывается по расписанию или воркером), queryStringParameters (limit),
+             headers (X-Job-Secret, см. scheduled_jobs.py)
+      context - объект с атрибутами: request_id, function_name
+Returns: HTTP response dict со статистикой прогона (claimed, sent, retried, failed)
+
+Записи забираются пачками через FOR UPDATE SKIP LOCKED, поэтому несколько
+параллельных прогонов не отправляют одно событие дважды. При заборе запись
+получает lease (next_attempt_at в будущем): если прогон упал после отправки,
+событие будет повторено только после истечения lease. Неудачные попытки
+переносятся с экспоненциальным backoff, после OUTBOX_MAX_ATTEMPTS запись
+помечается failed.
+
+Воркер: python3 index.py - бесконечный цикл с паузой OUTBOX_POLL_INTERVAL секунд.
+'''
+
+import json
+import os
+import time
+from typing import Dict, Any, List
+from psycopg2.extras import RealDictCursor, execute_values
+from db_pool import get_db_connection
+from scheduled_jobs import is_job_request
+import requests
+
+SCHEMA = 't_p32599880_plugin_site_developm'
+TELEGRAM_NOTIFY_URL = os.environ.get('TELEGRAM_NOTIFY_URL', 'https://functions.poehali.dev/02d813a8-279b-4a13-bfe4-ffb7d0cf5a3f')
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_MAX_BATCHES = int(os.environ.get('OUTBOX_MAX_BATCHES', '10'))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '120'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_BACKOFF_BASE = int(os.environ.get('OUTBOX_BACKOFF_BASE', '30'))
+OUTBOX_BACKOFF_MAX = int(os.environ.get('OUTBOX_BACKOFF_MAX', '3600'))
+OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', '7'))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_DELIVERY_TIMEOUT = float(os.environ.get('OUTBOX_DELIVERY_TIMEOUT', '30'))
+
+_session = requests.Session()
+
+
+def backoff_seconds(attempts: int) -> int:
+    """Задержка перед следующей попыткой: base * 2^(attempts-1), не больше OUTBOX_BACKOFF_MAX"""
+    return min(OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), OUTBOX_BACKOFF_MAX)
+
+
+def claim_batch(conn, limit: int) -> List[Dict[str, Any]]:
+    """Забрать пачку готовых к отправке записей и выдать им lease"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.notification_outbox o
+            SET attempts = o.attempts + 1,
+                next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+            WHERE o.id IN (
+                SELECT id FROM {SCHEMA}.notification_outbox
+                WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY next_attempt_at, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING o.id, o.event_type, o.user_info, o.details, o.attempts, o.created_at
+        """, (OUTBOX_LEASE_SECONDS, limit))
+        rows = cur.fetchall()
+    conn.commit()
+    rows.sort(key=lambda row: row['id'])
+    return rows
+
+
+def deliver_batch(rows: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Отправить пачку в telegram-notify, вернуть {id: ошибка} для недоставленных"""
+    events = [{
+        'id': row['id'],
+        'event_type': row['event_type'],
+        'user_info': row['user_info'],
+        'details': row['details'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None
+    } for row in rows]
+
+    try:
+        response = _session.post(TELEGRAM_NOTIFY_URL, json={'events': events}, timeout=OUTBOX_DELIVERY_TIMEOUT)
+        if response.status_code != 200:
+            return {row['id']: f'telegram-notify HTTP {response.status_code}' for row in rows}
+        results = {item.get('id'): item.get('success') for item in response.json().get('results', [])}
+    except Exception as e:
+        return {row['id']: str(e)[:500] for row in rows}
+
+    return {row['id']: 'telegram-notify reported failure' for row in rows if not results.get(row['id'])}
+
+
+def record_results(conn, rows: List[Dict[str, Any]], errors: Dict[int, str]) -> Dict[str, int]:
+    """Отметить доставленные, перенести неудачные с backoff или пометить failed"""
+    sent_ids = [row['id'] for row in rows if row['id'] not in errors]
+    retries = []
+    failed = []
+    for row in rows:
+        if row['id'] not in errors:
+            continue
+        if row['attempts'] >= OUTBOX_MAX_ATTEMPTS:
+            failed.append((row['id'], errors[row['id']]))
+        else:
+            retries.append((row['id'], backoff_seconds(row['attempts']), errors[row['id']]))
+
+    with conn.cursor() as cur:
+        if sent_ids:
+            cur.execute(f"""
+                UPDATE {SCHEMA}.notification_outbox
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                WHERE id = ANY(%s)
+            """, (sent_ids,))
+        if retries:
+            execute_values(cur, f"""
+                UPDATE {SCHEMA}.notification_outbox o
+                SET next_attempt_at = CURRENT_TIMESTAMP + v.delay * INTERVAL '1 second',
+                    last_error = v.error
+                FROM (VALUES %s) AS v(id, delay, error)
+                WHERE o.id = v.id
+            """, retries)
+        if failed:
+            execute_values(cur, f"""
+                UPDATE {SCHEMA}.notification_outbox o
+                SET status = 'failed', last_error = v.error
+                FROM (VALUES %s) AS v(id, error)
+                WHERE o.id = v.id
+            """, failed)
+    conn.commit()
+
+    return {'sent': len(sent_ids), 'retried': len(retries), 'failed': len(failed)}
+
+
+def purge_sent(conn) -> int:
+    """Удалить доставленные записи старше OUTBOX_RETENTION_DAYS"""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            DELETE FROM {SCHEMA}.notification_outbox
+            WHERE status = 'sent' AND sent_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'
+        """, (OUTBOX_RETENTION_DAYS,))
+        purged = cur.rowcount
+    conn.commit()
+    return purged
+
+
+def drain_outbox(conn, batch_size: int = OUTBOX_BATCH_SIZE, max_batches: int = OUTBOX_MAX_BATCHES) -> Dict[str, int]:
+    """Один прогон: до max_batches пачек по batch_size записей"""
+    stats = {'claimed': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+    for _ in range(max_batches):
+        rows = claim_batch(conn, batch_size)
+        if not rows:
+            break
+        stats['claimed'] += len(rows)
+        for key, value in record_results(conn, rows, deliver_batch(rows)).items():
+            stats[key] += value
+        if len(rows) < batch_size:
+            break
+    stats['purged'] = purge_sent(conn)
+    return stats
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'POST')
+
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    if method not in ('GET', 'POST'):
+        return {
+            'statusCode': 405,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    # Доставку запускает только планировщик
+    if not is_job_request(event):
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Доступ запрещён'}),
+            'isBase64Encoded': False
+        }
+
+    params = event.get('queryStringParameters') or {}
+    try:
+        batch_size = min(max(int(params.get('limit', OUTBOX_BATCH_SIZE)), 1), 500)
+    except (TypeError, ValueError):
+        batch_size = OUTBOX_BATCH_SIZE
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        stats = drain_outbox(conn, batch_size)
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': True, **stats}),
+            'isBase64Encoded': False
+        }
+    except Exception as e:
+        print(f"[OUTBOX] drain failed: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == '__main__':
+    while True:
+        worker_conn = get_db_connection()
+        try:
+            result = drain_outbox(worker_conn)
+            if result['claimed'] or result['purged']:
+                print(f"[OUTBOX] {result}")
+        except Exception as e:
+            print(f"[OUTBOX] drain failed: {e}")
+        finally:
+            worker_conn.close()
+        time.sleep(OUTBOX_POLL_INTERVAL)
@@ -6,16 +6,13 @@ Returns: HTTP response dict с данными уведомлений/сообщ
 '''
 
 import json
-import os
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
-import psycopg2
 from psycopg2.extras import RealDictCursor
-
-def get_db_connection():
-    """Получить подключение к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+from db_pool import get_db_connection
+from presence import attach_last_seen, flush_batch, record_heartbeat
+from scheduled_jobs import is_job_request, run_job_step
+from user_counters import get_user_counters, reconcile_batch
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -33,6 +30,31 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
+    params = event.get('queryStringParameters') or {}
+    
+    # Сверка счётчиков непрочитанного и перенос присутствия в users по расписанию:
+    # только планировщик, одна пачка за вызов
+    if method == 'GET' and params.get('action') in ('reconcile_counters', 'flush_presence'):
+        if not is_job_request(event):
+            return {
+                'statusCode': 403,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Доступ запрещён'}),
+                'isBase64Encoded': False
+            }
+        conn = get_db_connection()
+        try:
+            step = reconcile_batch if params['action'] == 'reconcile_counters' else flush_batch
+            stats = run_job_step(conn, params['action'], step)
+        finally:
+            conn.close()
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': True, **stats}),
+            'isBase64Encoded': False
+        }
+    
     headers = event.get('headers', {})
     user_id = headers.get('X-User-Id') or headers.get('x-user-id')
     
@@ -44,23 +66,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    conn = get_db_connection()
+    conn = get_db_connection(cursor_factory=RealDictCursor)
     cur = conn.cursor()
     
     try:
-        # Обновляем last_seen_at только если прошло больше 60 секунд с последнего обновления
-        cur.execute("""
-            UPDATE users
-            SET last_seen_at = NOW()
-            WHERE id = %s 
-            AND (last_seen_at IS NULL OR last_seen_at < NOW() - INTERVAL '60 seconds')
-        """, (user_id,))
-        conn.commit()
+        # Отметка присутствия в user_presence, не чаще раза в минуту
+        if record_heartbeat(cur, user_id):
+            conn.commit()
         if method == 'GET':
-            params = event.get('queryStringParameters') or {}
             action = params.get('action', 'notifications')
             
-            if action == 'notifications':
+            # Все значки одним запросом по первичному ключу user_counters
+            if action == 'counters':
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps(get_user_counters(cur, user_id)),
+                    'isBase64Encoded': False
+                }
+            
+            elif action == 'notifications':
                 cur.execute("""
                     SELECT id, type, title, message, link, is_read, created_at
                     FROM notifications
@@ -70,12 +95,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 """, (user_id,))
                 notifications = cur.fetchall()
                 
-                cur.execute("""
-                    SELECT COUNT(*) as count
-                    FROM notifications
-                    WHERE user_id = %s AND is_read = FALSE
-                """, (user_id,))
-                unread_count = cur.fetchone()['count']
+                unread_count = get_user_counters(cur, user_id)['notifications']
                 
                 return {
                     'statusCode': 200,
@@ -101,13 +121,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     LIMIT 100
                 """, (user_id, user_id))
                 messages = cur.fetchall()
+                attach_last_seen(cur, messages, 'from_user_id', 'from_last_seen')
+                attach_last_seen(cur, messages, 'to_user_id', 'to_last_seen')
                 
-                cur.execute("""
-                    SELECT COUNT(*) as count
-                    FROM messages
-                    WHERE to_user_id = %s AND is_read = FALSE
-                """, (user_id,))
-                unread_count = cur.fetchone()['count']
+                unread_count = get_user_counters(cur, user_id)['messages']
                 
                 return {
                     'statusCode': 200,
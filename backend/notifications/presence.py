@@ -0,0 +1,156 @@
+"""
+Присутствие пользователей (user_presence)
+Запрос пользователя отмечается в user_presence (UNLOGGED), а не в users:
+строка users с балансами больше не обновляется на каждый опрос. Повторные
+отметки в пределах PRESENCE_HEARTBEAT_INTERVAL не доходят до базы -
+экземпляр функции помнит время своей последней записи, а между экземплярами
+их отсекает условие в самом UPSERT. В users.last_seen_at время переносится
+пачками раз в PRESENCE_FLUSH_INTERVAL; строки users, занятые другими
+транзакциями, пропускаются до следующего переноса. Значки «в сети» в
+форуме и сделках читают только user_presence.
+
+Перенос запускается воркером (полный проход раз в PRESENCE_FLUSH_INTERVAL):
+    python3 presence.py
+или по расписанию: GET ?action=flush_presence функции notifications с
+заголовком X-Job-Secret (scheduled_jobs.py) переносит одну пачку за вызов.
+Без переноса админка (users.last_seen_at) показывает устаревшее время.
+
+Использование:
+    from presence import record_heartbeat                  # notifications
+    from presence import attach_last_seen                  # forum, deals
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+PRESENCE_HEARTBEAT_INTERVAL = int(os.environ.get('PRESENCE_HEARTBEAT_INTERVAL', '60'))
+PRESENCE_FLUSH_INTERVAL = float(os.environ.get('PRESENCE_FLUSH_INTERVAL', '300'))
+PRESENCE_FLUSH_BATCH_SIZE = int(os.environ.get('PRESENCE_FLUSH_BATCH_SIZE', '1000'))
+# Строки старше срока удаляются из user_presence после переноса в users
+PRESENCE_RETENTION = int(os.environ.get('PRESENCE_RETENTION', '86400'))
+PRESENCE_CACHE_SIZE = 10000
+
+_lock = threading.Lock()
+_written: 'OrderedDict[int, float]' = OrderedDict()
+
+
+def record_heartbeat(cur, user_id) -> bool:
+    """Отметить активность пользователя; False - отметка свежая, запись не нужна"""
+    user_id = int(user_id)
+    now = time.monotonic()
+    with _lock:
+        written_at = _written.get(user_id)
+        if written_at is not None and now - written_at < PRESENCE_HEARTBEAT_INTERVAL:
+            return False
+        _written[user_id] = now
+        _written.move_to_end(user_id)
+        while len(_written) > PRESENCE_CACHE_SIZE:
+            _written.popitem(last=False)
+
+    cur.execute("""
+        INSERT INTO user_presence (user_id, last_seen_at)
+        VALUES (%s, NOW())
+        ON CONFLICT (user_id) DO UPDATE
+        SET last_seen_at = EXCLUDED.last_seen_at
+        WHERE user_presence.last_seen_at < EXCLUDED.last_seen_at - make_interval(secs => %s)
+    """, (user_id, PRESENCE_HEARTBEAT_INTERVAL))
+    return True
+
+
+def get_last_seen(cur, user_ids: Iterable[Any]) -> Dict[int, datetime]:
+    """Последняя активность пользователей из user_presence"""
+    ids = sorted({int(user_id) for user_id in user_ids if user_id is not None})
+    if not ids:
+        return {}
+    cur.execute(
+        "SELECT user_id, last_seen_at FROM user_presence WHERE user_id = ANY(%s)",
+        (ids,)
+    )
+    return {row['user_id']: row['last_seen_at'] for row in cur.fetchall()}
+
+
+def attach_last_seen(cur, rows: List[Dict[str, Any]], id_key: str, field: str) -> None:
+    """Проставить строкам field по user_id из id_key; более раннее значение заменяется"""
+    last_seen = get_last_seen(cur, (row.get(id_key) for row in rows))
+    for row in rows:
+        seen = last_seen.get(row.get(id_key))
+        if seen is not None and (row.get(field) is None or row[field] < seen):
+            row[field] = seen
+        else:
+            row.setdefault(field, None)
+
+
+def flush_batch(conn, after_id: int = 0,
+                batch_size: int = PRESENCE_FLUSH_BATCH_SIZE) -> Tuple[Dict[str, int], int]:
+    """Перенести пачку user_presence после after_id в users.last_seen_at, вернуть (статистика, последний id)"""
+    stats = {'checked': 0, 'flushed': 0, 'expired': 0}
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT user_id FROM user_presence WHERE user_id > %s ORDER BY user_id LIMIT %s",
+            (after_id, batch_size)
+        )
+        ids = [row['user_id'] for row in cur.fetchall()]
+        if not ids:
+            conn.commit()
+            return stats, after_id
+
+        cur.execute("""
+            WITH locked AS (
+                SELECT id FROM users
+                WHERE id = ANY(%s)
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE users u
+            SET last_seen_at = p.last_seen_at
+            FROM user_presence p, locked
+            WHERE p.user_id = locked.id AND u.id = locked.id
+              AND (u.last_seen_at IS NULL OR u.last_seen_at < p.last_seen_at)
+        """, (ids,))
+        stats['flushed'] = cur.rowcount
+
+        cur.execute("""
+            DELETE FROM user_presence p
+            USING users u
+            WHERE p.user_id = ANY(%s) AND u.id = p.user_id
+              AND p.last_seen_at < NOW() - make_interval(secs => %s)
+              AND u.last_seen_at >= p.last_seen_at
+        """, (ids, PRESENCE_RETENTION))
+        stats['expired'] = cur.rowcount
+        stats['checked'] = len(ids)
+    conn.commit()
+    return stats, ids[-1]
+
+
+def flush_presence(conn, batch_size: int = PRESENCE_FLUSH_BATCH_SIZE) -> Dict[str, int]:
+    """Перенести весь user_presence в users.last_seen_at пачками, удалить старые строки"""
+    total = {'checked': 0, 'flushed': 0, 'expired': 0}
+    last_id = 0
+    while True:
+        stats, last_id = flush_batch(conn, last_id, batch_size)
+        if not stats['checked']:
+            return total
+        for key in total:
+            total[key] += stats[key]
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    while True:
+        worker_conn = get_db_connection()
+        try:
+            result = flush_presence(worker_conn)
+            if result['flushed'] or result['expired']:
+                print(f"[PRESENCE] {result}")
+        except Exception as e:
+            print(f"[PRESENCE] flush failed: {e}")
+        finally:
+            worker_conn.close()
+        time.sleep(PRESENCE_FLUSH_INTERVAL)
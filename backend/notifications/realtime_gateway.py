@@ -0,0 +1,514 @@
+"""
+Push-шлюз событий (Server-Sent Events): уведомления, личные сообщения, чат
+сделки и чат тикета
+Клиент держит одно соединение вместо опроса notifications, deals (action=deal)
+и support-tickets (get_messages). Шлюз слушает канал realtime_events одним
+соединением LISTEN; NOTIFY отправляют триггеры миграции V0148 и несут только
+id и ключи маршрутизации. Строки читаются пачкой - один запрос на таблицу
+на все NOTIFY, пришедшие вместе, и только для каналов, у которых есть
+подписчики. Счётчики непрочитанного приходят в payload целиком и
+рассылаются без запросов. Payload не в формате триггеров отбрасывается, а
+если рассылка пачки упала, её адресаты получают resync.
+
+Каналы: user (уведомления, сообщения и счётчики пользователя), deal:<id>
+(продавец, покупатель, админ), ticket:<id> (автор тикета, админ). Права
+проверяются при подключении. Идентификация, как и у функций, по user_id -
+EventSource не умеет передавать заголовки, поэтому он принимается и из
+query. События клиента: counters, notification, message, deal_message,
+ticket_message; resync - соединение с базой восстанавливалось, события
+могли потеряться, данные нужно перечитать. Клиент, не успевающий читать
+(REALTIME_CLIENT_QUEUE событий в очереди), отключается и переподключается
+сам. Пока клиент подключён, шлюз отмечает его присутствие в user_presence.
+
+Запуск:
+    python3 realtime_gateway.py
+
+Клиент:
+    new EventSource('<REALTIME_URL>/events?user_id=1&channels=user,deal:5')
+Статистика:
+    GET /stats
+"""
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+from db_pool import POOL_MAX_SIZE, get_db_connection
+from presence import PRESENCE_HEARTBEAT_INTERVAL
+from user_counters import get_user_counters
+
+REALTIME_HOST = os.environ.get('REALTIME_HOST', '0.0.0.0')
+REALTIME_PORT = int(os.environ.get('REALTIME_PORT', '8090'))
+REALTIME_CHANNEL = 'realtime_events'
+REALTIME_PING_INTERVAL = float(os.environ.get('REALTIME_PING_INTERVAL', '25'))
+REALTIME_CLIENT_QUEUE = int(os.environ.get('REALTIME_CLIENT_QUEUE', '100'))
+REALTIME_MAX_CLIENTS = int(os.environ.get('REALTIME_MAX_CLIENTS', '10000'))
+REALTIME_MAX_CHANNELS = 5
+REALTIME_RECONNECT_DELAY = float(os.environ.get('REALTIME_RECONNECT_DELAY', '5'))
+REALTIME_REQUEST_TIMEOUT = 10
+REALTIME_RETRY_MS = 5000
+
+CORS_HEADERS = (
+    'Access-Control-Allow-Origin: *\r\n'
+    'Access-Control-Allow-Methods: GET, OPTIONS\r\n'
+    'Access-Control-Allow-Headers: Content-Type, X-User-Id\r\n'
+)
+
+# Таблица -> (событие клиента, запрос строк по id)
+ROW_QUERIES = {
+    'notifications': ('notification', """
+        SELECT id, user_id, type, title, message, link, is_read, created_at
+        FROM notifications
+        WHERE id = ANY(%s)
+    """),
+    'messages': ('message', """
+        SELECT
+            m.id, m.subject, m.content, m.is_read, m.created_at,
+            m.from_user_id, u1.username as from_username, u1.avatar_url as from_avatar, u1.role as from_role,
+            m.to_user_id, u2.username as to_username, u2.avatar_url as to_avatar, u2.role as to_role
+        FROM messages m
+        JOIN users u1 ON m.from_user_id = u1.id
+        JOIN users u2 ON m.to_user_id = u2.id
+        WHERE m.id = ANY(%s)
+    """),
+    'deal_messages': ('deal_message', """
+        SELECT dm.id, dm.deal_id, dm.user_id, dm.message, dm.is_system, dm.created_at,
+               u.username, u.avatar_url
+        FROM deal_messages dm
+        LEFT JOIN users u ON dm.user_id = u.id
+        WHERE dm.id = ANY(%s)
+    """),
+    'ticket_messages': ('ticket_message', """
+        SELECT id, ticket_id, user_id, author_username, message, is_admin, created_at
+        FROM ticket_messages
+        WHERE id = ANY(%s)
+    """),
+}
+
+
+# Таблица -> обязательные целые поля payload (аргументы триггеров V0148)
+PAYLOAD_KEYS = {
+    'notifications': ('id', 'user_id'),
+    'messages': ('id', 'from_user_id', 'to_user_id'),
+    'deal_messages': ('id', 'deal_id'),
+    'ticket_messages': ('id', 'ticket_id'),
+    'user_counters': ('user_id', 'unread_notifications', 'unread_messages'),
+}
+
+
+def parse_payload(raw: str) -> Optional[Dict[str, Any]]:
+    """Payload NOTIFY или None, если он не от триггеров V0148"""
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get('t') not in PAYLOAD_KEYS:
+        return None
+    for key in PAYLOAD_KEYS[payload['t']]:
+        value = payload.get(key)
+        if not isinstance(value, int) or isinstance(value, bool):
+            return None
+    return payload
+
+
+def event_channels(payload: Dict[str, Any]) -> List[str]:
+    """Каналы, которым адресовано событие"""
+    table = payload.get('t')
+    if table in ('notifications', 'user_counters'):
+        return [f"user:{payload.get('user_id')}"]
+    if table == 'messages':
+        return [f"user:{payload.get('to_user_id')}", f"user:{payload.get('from_user_id')}"]
+    if table == 'deal_messages':
+        return [f"deal:{payload.get('deal_id')}"]
+    if table == 'ticket_messages':
+        return [f"ticket:{payload.get('ticket_id')}"]
+    return []
+
+
+def format_event(event: str, data: Any) -> bytes:
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'.encode()
+
+
+def parse_channels(user_id: int, value: Optional[str]) -> List[str]:
+    """Каналы из ?channels=user,deal:5,ticket:7; ValueError - некорректный список"""
+    channels = []
+    for name in (value or 'user').split(','):
+        name = name.strip()
+        if name == 'user':
+            channels.append(f'user:{user_id}')
+            continue
+        kind, _, key = name.partition(':')
+        if kind not in ('deal', 'ticket') or not key.isdigit():
+            raise ValueError(f'Неизвестный канал: {name}')
+        channels.append(f'{kind}:{int(key)}')
+    channels = list(dict.fromkeys(channels))
+    if not channels or len(channels) > REALTIME_MAX_CHANNELS:
+        raise ValueError('Неверный список каналов')
+    return channels
+
+
+def authorize_channels(user_id: int, channels: List[str]) -> bool:
+    """Доступ к чатам сделок и тикетов: участник или админ"""
+    private = [c for c in channels if not c.startswith('user:')]
+    if not private:
+        return True
+    conn = get_db_connection(cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT role FROM users WHERE id = %s", (user_id,))
+            user = cur.fetchone()
+            if not user:
+                return False
+            if user['role'] == 'admin':
+                return True
+            for channel in private:
+                kind, _, key = channel.partition(':')
+                if kind == 'deal':
+                    cur.execute("SELECT seller_id, buyer_id FROM deals WHERE id = %s", (int(key),))
+                    deal = cur.fetchone()
+                    if not deal or user_id not in (deal['seller_id'], deal['buyer_id']):
+                        return False
+                else:
+                    cur.execute("SELECT user_id FROM support_tickets WHERE id = %s", (int(key),))
+                    ticket = cur.fetchone()
+                    if not ticket or ticket['user_id'] != user_id:
+                        return False
+        return True
+    finally:
+        conn.close()
+
+
+def load_counters(user_id: int) -> Dict[str, int]:
+    conn = get_db_connection(cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cur:
+            return get_user_counters(cur, user_id)
+    finally:
+        conn.close()
+
+
+def load_rows(ids_by_table: Dict[str, List[int]]) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """Строки событий: один запрос на таблицу"""
+    rows: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    conn = get_db_connection(cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cur:
+            for table, ids in ids_by_table.items():
+                cur.execute(ROW_QUERIES[table][1], (ids,))
+                rows[table] = {row['id']: dict(row) for row in cur.fetchall()}
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def touch_presence(user_ids: List[int]) -> None:
+    """Отметить присутствие подключённых пользователей одним запросом"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO user_presence (user_id, last_seen_at)
+                SELECT unnest(%s::int[]), NOW()
+                ON CONFLICT (user_id) DO UPDATE
+                SET last_seen_at = EXCLUDED.last_seen_at
+            """, (user_ids,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class Client:
+    """Подключённый клиент: очередь готовых SSE-сообщений"""
+
+    def __init__(self, user_id: int, channels: List[str]):
+        self.user_id = user_id
+        self.channels = channels
+        self.queue: 'asyncio.Queue[Optional[bytes]]' = asyncio.Queue(maxsize=REALTIME_CLIENT_QUEUE)
+        self.closed = False
+
+    def send(self, message: bytes) -> bool:
+        """Поставить сообщение в очередь; False - клиент не успевает и отключён"""
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.close()
+            return False
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Gateway:
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Client]] = defaultdict(set)
+        self.clients: Set[Client] = set()
+        self.batches: 'asyncio.Queue[List[Dict[str, Any]]]' = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=POOL_MAX_SIZE, thread_name_prefix='realtime-db')
+        self.stats = {
+            'connections': 0, 'rejected': 0, 'notifies': 0, 'events_sent': 0,
+            'rows_loaded': 0, 'slow_clients_dropped': 0, 'listener_reconnects': 0,
+            'invalid_payloads': 0, 'failed_batches': 0
+        }
+
+    async def run_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def register(self, client: Client) -> None:
+        self.clients.add(client)
+        for channel in client.channels:
+            self.subscribers[channel].add(client)
+
+    def unregister(self, client: Client) -> None:
+        self.clients.discard(client)
+        for channel in client.channels:
+            subscribers = self.subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.subscribers[channel]
+
+    def publish(self, channels: List[str], message: bytes) -> None:
+        for channel in channels:
+            for client in list(self.subscribers.get(channel, ())):
+                if client.send(message):
+                    self.stats['events_sent'] += 1
+                else:
+                    self.stats['slow_clients_dropped'] += 1
+
+    def broadcast(self, event: str, data: Any) -> None:
+        message = format_event(event, data)
+        for client in list(self.clients):
+            client.send(message)
+
+    # --- LISTEN ---
+
+    @staticmethod
+    def connect_listener():
+        conn = psycopg2.connect(
+            os.environ['DATABASE_URL'],
+            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN {REALTIME_CHANNEL}')
+        return conn
+
+    async def listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        connected_before = False
+        while True:
+            try:
+                conn = await loop.run_in_executor(None, self.connect_listener)
+            except psycopg2.Error as e:
+                print(f'[REALTIME] listener connect failed: {e}')
+                await asyncio.sleep(REALTIME_RECONNECT_DELAY)
+                continue
+
+            if connected_before:
+                # Пока соединения не было, NOTIFY терялись
+                self.stats['listener_reconnects'] += 1
+                self.broadcast('resync', {})
+            connected_before = True
+            lost = loop.create_future()
+
+            def on_readable():
+                try:
+                    conn.poll()
+                except psycopg2.Error as e:
+                    if not lost.done():
+                        lost.set_result(e)
+                    return
+                batch = []
+                while conn.notifies:
+                    payload = parse_payload(conn.notifies.pop(0).payload)
+                    if payload is None:
+                        self.stats['invalid_payloads'] += 1
+                        continue
+                    batch.append(payload)
+                if batch:
+                    self.stats['notifies'] += len(batch)
+                    self.batches.put_nowait(batch)
+
+            fd = conn.fileno()
+            loop.add_reader(fd, on_readable)
+            error = await lost
+            loop.remove_reader(fd)
+            conn.close()
+            print(f'[REALTIME] listener connection lost: {error}')
+            await asyncio.sleep(REALTIME_RECONNECT_DELAY)
+
+    async def deliver(self) -> None:
+        """Рассылка пачек NOTIFY по порядку; ошибка в пачке не останавливает рассылку"""
+        while True:
+            batch = await self.batches.get()
+            try:
+                await self.deliver_batch(batch)
+            except Exception as e:
+                self.stats['failed_batches'] += 1
+                print(f'[REALTIME] failed to deliver batch: {e!r}')
+                # Адресаты пачки перечитают данные сами
+                self.publish(list({c for p in batch for c in event_channels(p)}), format_event('resync', {}))
+
+    async def deliver_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Разослать одну пачку; строки читаются одним запросом на таблицу"""
+        ids_by_table: Dict[str, List[int]] = defaultdict(list)
+        for payload in batch:
+            table = payload.get('t')
+            if table in ROW_QUERIES and any(c in self.subscribers for c in event_channels(payload)):
+                ids_by_table[table].append(payload['id'])
+
+        rows: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        if ids_by_table:
+            try:
+                rows = await self.run_db(load_rows, dict(ids_by_table))
+                self.stats['rows_loaded'] += sum(len(r) for r in rows.values())
+            except psycopg2.Error as e:
+                print(f'[REALTIME] failed to load rows: {e}')
+                self.publish(list({c for p in batch for c in event_channels(p)}), format_event('resync', {}))
+                return
+
+        for payload in batch:
+            table = payload.get('t')
+            if table == 'user_counters':
+                self.publish(event_channels(payload), format_event('counters', {
+                    'notifications': payload.get('unread_notifications') or 0,
+                    'messages': payload.get('unread_messages') or 0
+                }))
+                continue
+            row = rows.get(table, {}).get(payload.get('id'))
+            if row is not None:
+                self.publish(event_channels(payload), format_event(ROW_QUERIES[table][0], row))
+
+    async def keep_presence(self) -> None:
+        """Подключённые пользователи - в сети, опрос notifications для этого не нужен"""
+        while True:
+            await asyncio.sleep(PRESENCE_HEARTBEAT_INTERVAL)
+            user_ids = sorted({client.user_id for client in self.clients})
+            if not user_ids:
+                continue
+            try:
+                await self.run_db(touch_presence, user_ids)
+            except psycopg2.Error as e:
+                print(f'[REALTIME] failed to update presence: {e}')
+
+    # --- HTTP ---
+
+    @staticmethod
+    async def respond(writer, status: str, body: Optional[Dict[str, Any]] = None) -> None:
+        content = json.dumps(body).encode() if body is not None else b''
+        writer.write(
+            f'HTTP/1.1 {status}\r\n{CORS_HEADERS}'
+            f'Content-Type: application/json\r\nContent-Length: {len(content)}\r\n'
+            f'Connection: close\r\n\r\n'.encode() + content
+        )
+        await writer.drain()
+
+    async def handle(self, reader, writer) -> None:
+        try:
+            await self.serve(reader, writer)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, reader, writer) -> None:
+        request_line = await asyncio.wait_for(reader.readline(), REALTIME_REQUEST_TIMEOUT)
+        headers: Dict[str, str] = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), REALTIME_REQUEST_TIMEOUT)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            await self.respond(writer, '400 Bad Request', {'error': 'Invalid request'})
+            return
+        method, target = parts[0], urlsplit(parts[1])
+        if method == 'OPTIONS':
+            await self.respond(writer, '204 No Content')
+            return
+        if method != 'GET' or target.path not in ('/events', '/stats'):
+            await self.respond(writer, '404 Not Found', {'error': 'Not found'})
+            return
+        if target.path == '/stats':
+            await self.respond(writer, '200 OK', {
+                **self.stats, 'clients': len(self.clients), 'channels': len(self.subscribers)
+            })
+            return
+
+        params = {k: v[0] for k, v in parse_qs(target.query).items()}
+        user_id = headers.get('x-user-id') or params.get('user_id')
+        if not user_id or not user_id.isdigit():
+            await self.respond(writer, '401 Unauthorized', {'error': 'Требуется авторизация'})
+            return
+        user_id = int(user_id)
+        try:
+            channels = parse_channels(user_id, params.get('channels'))
+        except ValueError as e:
+            await self.respond(writer, '400 Bad Request', {'error': str(e)})
+            return
+        if len(self.clients) >= REALTIME_MAX_CLIENTS:
+            self.stats['rejected'] += 1
+            await self.respond(writer, '503 Service Unavailable', {'error': 'Слишком много подключений'})
+            return
+        if not await self.run_db(authorize_channels, user_id, channels):
+            await self.respond(writer, '403 Forbidden', {'error': 'Нет доступа'})
+            return
+
+        client = Client(user_id, channels)
+        self.register(client)
+        self.stats['connections'] += 1
+        try:
+            writer.write(
+                f'HTTP/1.1 200 OK\r\n{CORS_HEADERS}'
+                'Content-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                'Connection: keep-alive\r\nX-Accel-Buffering: no\r\n\r\n'
+                f'retry: {REALTIME_RETRY_MS}\n\n'.encode()
+            )
+            if f'user:{user_id}' in channels:
+                client.send(format_event('counters', await self.run_db(load_counters, user_id)))
+            while True:
+                try:
+                    message = await asyncio.wait_for(client.queue.get(), REALTIME_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    message = b': ping\n\n'
+                if message is None:
+                    break
+                writer.write(message)
+                await writer.drain()
+        finally:
+            client.close()
+            self.unregister(client)
+
+
+async def main() -> None:
+    gateway = Gateway()
+    server = await asyncio.start_server(gateway.handle, REALTIME_HOST, REALTIME_PORT)
+    print(f'[REALTIME] listening on {REALTIME_HOST}:{REALTIME_PORT}')
+    async with server:
+        await asyncio.gather(
+            server.serve_forever(), gateway.listen(), gateway.deliver(), gateway.keep_presence()
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
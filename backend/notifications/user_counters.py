@@ -0,0 +1,119 @@
+"""
+Счётчики непрочитанных уведомлений и сообщений (user_counters)
+Значения ведут триггеры notifications и messages (миграция V0146), код
+записи их не трогает. Значки читаются одним запросом по первичному ключу.
+Сверка пересчитывает COUNT(*) пачками пользователей и исправляет
+расхождения: строки счётчиков пачки блокируются до пересчёта, поэтому
+параллельные вставки и отметки о прочтении ждут сверку и не теряются.
+
+Запускается воркером (полный проход раз в COUNTERS_RECONCILE_INTERVAL):
+    python3 user_counters.py
+или по расписанию: GET ?action=reconcile_counters функции notifications с
+заголовком X-Job-Secret (scheduled_jobs.py) сверяет одну пачку за вызов.
+
+Использование:
+    from user_counters import get_user_counters, reconcile_batch, reconcile_counters
+"""
+
+import os
+import time
+from typing import Dict, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+COUNTERS_RECONCILE_BATCH_SIZE = int(os.environ.get('COUNTERS_RECONCILE_BATCH_SIZE', '500'))
+COUNTERS_RECONCILE_INTERVAL = float(os.environ.get('COUNTERS_RECONCILE_INTERVAL', '3600'))
+
+
+def get_user_counters(cur, user_id) -> Dict[str, int]:
+    """Непрочитанные уведомления и сообщения пользователя"""
+    cur.execute(
+        "SELECT unread_notifications, unread_messages FROM user_counters WHERE user_id = %s",
+        (user_id,)
+    )
+    row = cur.fetchone()
+    if not row:
+        return {'notifications': 0, 'messages': 0}
+    return {'notifications': row['unread_notifications'], 'messages': row['unread_messages']}
+
+
+def reconcile_batch(conn, after_id: int = 0,
+                    batch_size: int = COUNTERS_RECONCILE_BATCH_SIZE) -> Tuple[Dict[str, int], int]:
+    """Сверить счётчики пачки пользователей после after_id, вернуть (статистика, последний id)"""
+    stats = {'checked': 0, 'fixed': 0}
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s",
+            (after_id, batch_size)
+        )
+        ids = [row['id'] for row in cur.fetchall()]
+        if not ids:
+            conn.commit()
+            return stats, after_id
+
+        # Строка счётчика нужна, чтобы было что блокировать
+        cur.execute("""
+            INSERT INTO user_counters (user_id)
+            SELECT unnest(%s::int[])
+            ON CONFLICT (user_id) DO NOTHING
+        """, (ids,))
+        cur.execute(
+            "SELECT user_id FROM user_counters WHERE user_id = ANY(%s) ORDER BY user_id FOR UPDATE",
+            (ids,)
+        )
+        # Отдельный запрос - снимок после блокировки видит все завершённые записи
+        cur.execute("""
+            WITH actual AS (
+                SELECT c.user_id,
+                       (SELECT COUNT(*) FROM notifications n
+                        WHERE n.user_id = c.user_id AND n.is_read = FALSE) AS unread_notifications,
+                       (SELECT COUNT(*) FROM messages m
+                        WHERE m.to_user_id = c.user_id AND m.is_read = FALSE) AS unread_messages
+                FROM user_counters c
+                WHERE c.user_id = ANY(%s)
+            )
+            UPDATE user_counters c
+            SET unread_notifications = a.unread_notifications,
+                unread_messages = a.unread_messages,
+                updated_at = NOW()
+            FROM actual a
+            WHERE c.user_id = a.user_id
+              AND (c.unread_notifications <> a.unread_notifications
+                   OR c.unread_messages <> a.unread_messages)
+            RETURNING c.user_id
+        """, (ids,))
+        fixed = [row['user_id'] for row in cur.fetchall()]
+    conn.commit()
+
+    if fixed:
+        print(f"[COUNTERS] fixed drift for users {fixed[:20]}")
+    stats['checked'] = len(ids)
+    stats['fixed'] = len(fixed)
+    return stats, ids[-1]
+
+
+def reconcile_counters(conn, batch_size: int = COUNTERS_RECONCILE_BATCH_SIZE) -> Dict[str, int]:
+    """Сверить счётчики всех пользователей"""
+    total = {'checked': 0, 'fixed': 0}
+    last_id = 0
+    while True:
+        stats, last_id = reconcile_batch(conn, last_id, batch_size)
+        if not stats['checked']:
+            return total
+        for key in total:
+            total[key] += stats[key]
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    while True:
+        worker_conn = get_db_connection()
+        try:
+            result = reconcile_counters(worker_conn)
+            print(f"[COUNTERS] {result}")
+        except Exception as e:
+            print(f"[COUNTERS] reconcile failed: {e}")
+        finally:
+            worker_conn.close()
+        time.sleep(COUNTERS_RECONCILE_INTERVAL)
@@ -3,20 +3,15 @@
 '''
 
 import json
-import os
 import hashlib
 import secrets
 import datetime
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 
 SCHEMA = 't_p32599880_plugin_site_developm'
 
-def get_db_connection():
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
@@ -42,7 +37,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
-        conn = get_db_connection()
+        conn = get_db_connection(cursor_factory=RealDictCursor)
         cur = conn.cursor()
         
         if method == 'GET':
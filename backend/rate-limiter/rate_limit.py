@@ -0,0 +1,425 @@
+"""
+Движок rate limiting: GCRA поверх подключаемого хранилища
+GCRA (generic cell rate algorithm) - точный скользящий лимит «requests
+запросов за window секунд» с одним числом состояния на клиента: TAT,
+теоретическим временем прихода следующего запроса. Каждый разрешённый
+запрос сдвигает TAT на window / requests; запрос отклоняется, если TAT
+ушёл вперёд больше чем на window. Проверка - O(1) при любом числе клиентов,
+счётчик не сбрасывается скачком на границе окна.
+
+Хранилища (RATE_LIMIT_BACKEND):
+- memory   - словарь в памяти контейнера, разбитый на RATE_LIMIT_SHARDS
+             частей со своими блокировками; устаревшие ключи вытесняются
+             понемногу при каждой проверке, размер части ограничен;
+- postgres - UNLOGGED таблица rate_limit_state (V0143), общая для всех
+             контейнеров: проверка и сдвиг TAT - один атомарный
+             INSERT ... ON CONFLICT DO UPDATE по часам PostgreSQL.
+             Отказ запоминается в памяти до окончания блокировки, поэтому
+             поток запросов заблокированного клиента не доходит до БД.
+             При недоступности БД проверка выполняется по memory.
+По умолчанию postgres, если задан DATABASE_URL, иначе memory. В общем
+хранилище живут только классы RATE_LIMIT_SHARED_TYPES (вход, вывод средств,
+посты форума), остальные проверяются в памяти контейнера за микросекунды.
+
+Использование в обработчике функции (проверка в том же процессе, без
+отдельного запроса к rate-limiter):
+    from rate_limit import rate_limited
+
+    @rate_limited()
+    def handler(event, context):
+        ...
+
+Класс запроса задаётся явными списками action: вход, вывод средств и
+POST-действия форума, создающие темы и комментарии; чтение форума и действия
+администратора идут по default. Роль администратора (повышенный лимит)
+кэшируется на ADMIN_ROLE_CACHE_TTL секунд и не применяется к классам
+ADMIN_EXEMPT_TYPES: X-User-Id присылает клиент, и подставленный id
+администратора не должен снимать лимит входа и вывода. Нарушения пишутся в
+security_logs пачками (security_log.py).
+
+Отдельная проверка:
+    result = check_rate_limit(get_client_key(event), 'auth')
+    if not result['allowed']:
+        ...  # 429, Retry-After: result['retry_after']
+"""
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from db_pool import get_db_connection
+from security_log import log_security_event
+
+# Конфигурация rate limiting
+RATE_LIMITS = {
+    'default': {'requests': 100, 'window': 60},      # 100 запросов в минуту
+    'auth': {'requests': 10, 'window': 60},          # 10 попыток входа в минуту
+    'withdrawal': {'requests': 5, 'window': 300},    # 5 заявок на вывод за 5 минут
+    'forum': {'requests': 30, 'window': 60},         # 30 постов/комментов в минуту
+    'admin': {'requests': 200, 'window': 60}         # 200 запросов для админов
+}
+
+AUTH_ACTIONS = frozenset({'login', 'register', 'reset_password', 'change_password'})
+# process_withdrawal - одобрение заявок администратором (роль проверяет обработчик), класс default
+WITHDRAWAL_ACTIONS = frozenset({'create_withdrawal', 'withdraw_btc'})
+# Только создание контента; GET get_comments, search и admin_* сюда не попадают
+FORUM_WRITE_ACTIONS = frozenset({'create_topic', 'create_comment'})
+ADMIN_EXEMPT_TYPES = frozenset({'auth', 'withdrawal'})
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or ('postgres' if os.environ.get('DATABASE_URL') else 'memory')
+RATE_LIMIT_SHARED_TYPES = set(os.environ.get('RATE_LIMIT_SHARED_TYPES', 'auth,withdrawal,forum').split(','))
+RATE_LIMIT_SHARDS = int(os.environ.get('RATE_LIMIT_SHARDS', '64'))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '200000'))
+# Сколько устаревших ключей вытесняется за одну проверку
+RATE_LIMIT_EVICT_BATCH = 4
+# Раз в сколько проверок контейнер чистит устаревшие строки rate_limit_state
+RATE_LIMIT_PG_CLEANUP_EVERY = int(os.environ.get('RATE_LIMIT_PG_CLEANUP_EVERY', '1000'))
+RATE_LIMIT_PG_CLEANUP_BATCH = 1000
+ADMIN_ROLE_CACHE_TTL = float(os.environ.get('ADMIN_ROLE_CACHE_TTL', '60'))
+ADMIN_ROLE_CACHE_SIZE = 10000
+
+_stats_lock = threading.Lock()
+_stats = {'checks': 0, 'allowed': 0, 'denied': 0, 'local_denials': 0, 'backend_errors': 0,
+          'admin_cache_hits': 0, 'admin_cache_misses': 0}
+
+_admin_lock = threading.Lock()
+_admin_roles: 'OrderedDict[str, Tuple[float, bool]]' = OrderedDict()
+
+
+class MemoryStore:
+    """TAT клиентов в памяти контейнера: шарды OrderedDict в порядке последнего обновления"""
+
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(max(1, shards))]
+        self._max_keys_per_shard = max(1, max_keys // len(self._shards))
+
+    def consume(self, key: str, emission: float, tau: float) -> Tuple[bool, float, float]:
+        """(разрешён ли запрос, TAT после проверки, текущее время)"""
+        lock, tats = self._shards[hash(key) % len(self._shards)]
+        now = time.time()
+        with lock:
+            tat = max(tats.get(key, now), now)
+            allowed = tat - now <= tau
+            if allowed:
+                tat += emission
+                tats[key] = tat
+                tats.move_to_end(key)
+
+            # В начале шарда - давно не обновлявшиеся ключи; TAT в прошлом равен пустому состоянию
+            for _ in range(RATE_LIMIT_EVICT_BATCH):
+                if not tats:
+                    break
+                oldest_key = next(iter(tats))
+                if tats[oldest_key] > now:
+                    break
+                del tats[oldest_key]
+            while len(tats) > self._max_keys_per_shard:
+                tats.popitem(last=False)
+        return allowed, tat, now
+
+    def size(self) -> int:
+        return sum(len(tats) for _, tats in self._shards)
+
+    def clear(self) -> None:
+        for lock, tats in self._shards:
+            with lock:
+                tats.clear()
+
+
+class PostgresStore:
+    """TAT клиентов в rate_limit_state: одно состояние на все контейнеры"""
+
+    def __init__(self, max_denied_keys: int = 10000):
+        self._lock = threading.Lock()
+        self._denied: 'OrderedDict[str, float]' = OrderedDict()
+        self._max_denied_keys = max_denied_keys
+        self._checks = 0
+
+    def consume(self, key: str, emission: float, tau: float) -> Tuple[bool, float, float]:
+        now = time.time()
+        # Клиент уже заблокирован - отвечаем без запроса к БД до конца блокировки
+        with self._lock:
+            blocked_until = self._denied.get(key)
+        if blocked_until is not None and blocked_until > now:
+            with _stats_lock:
+                _stats['local_denials'] += 1
+            return False, blocked_until + tau, now
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                # Строка обновляется, только если запрос укладывается в лимит
+                cur.execute("""
+                    WITH clock AS (SELECT EXTRACT(EPOCH FROM clock_timestamp())::DOUBLE PRECISION AS now)
+                    INSERT INTO rate_limit_state AS s (key, tat)
+                    SELECT %(key)s, clock.now + %(emission)s FROM clock
+                    ON CONFLICT (key) DO UPDATE
+                        SET tat = GREATEST(s.tat, EXCLUDED.tat - %(emission)s) + %(emission)s
+                        WHERE GREATEST(s.tat, EXCLUDED.tat - %(emission)s) - (EXCLUDED.tat - %(emission)s) <= %(tau)s
+                    RETURNING s.tat, (SELECT now FROM clock)
+                """, {'key': key, 'emission': emission, 'tau': tau})
+                row = cur.fetchone()
+                allowed = row is not None
+                if not allowed:
+                    cur.execute("""
+                        SELECT tat, EXTRACT(EPOCH FROM clock_timestamp())::DOUBLE PRECISION
+                        FROM rate_limit_state WHERE key = %s
+                    """, (key,))
+                    row = cur.fetchone()
+
+                self._checks += 1
+                if self._checks % RATE_LIMIT_PG_CLEANUP_EVERY == 0:
+                    cur.execute("""
+                        DELETE FROM rate_limit_state WHERE key IN (
+                            SELECT key FROM rate_limit_state
+                            WHERE tat < EXTRACT(EPOCH FROM clock_timestamp())
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                    """, (RATE_LIMIT_PG_CLEANUP_BATCH,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        tat, db_now = row
+        if not allowed:
+            self._remember_denial(key, time.time() + (tat - db_now - tau))
+        return allowed, tat, db_now
+
+    def _remember_denial(self, key: str, blocked_until: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._denied[key] = blocked_until
+            self._denied.move_to_end(key)
+            for _ in range(RATE_LIMIT_EVICT_BATCH):
+                oldest_key = next(iter(self._denied))
+                if self._denied[oldest_key] > now:
+                    break
+                del self._denied[oldest_key]
+            while len(self._denied) > self._max_denied_keys:
+                self._denied.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._denied.clear()
+
+
+_memory_store = MemoryStore()
+_postgres_store: Optional[PostgresStore] = PostgresStore() if RATE_LIMIT_BACKEND == 'postgres' else None
+
+
+def _header(event: Dict[str, Any], name: str) -> str:
+    name = name.lower()
+    return next((v for k, v in (event.get('headers') or {}).items() if k.lower() == name), None) or ''
+
+
+def get_client_key(event: Dict[str, Any]) -> str:
+    """Получение уникального ключа клиента"""
+    # IP адрес из разных источников
+    source_ip = (
+        (event.get('requestContext') or {}).get('identity', {}).get('sourceIp') or
+        _header(event, 'X-Forwarded-For').split(',')[0].strip() or
+        _header(event, 'X-Real-IP') or
+        'unknown'
+    )
+
+    # User-Agent для дополнительной идентификации. crc32, а не hash(): hash() строк
+    # случаен в каждом процессе, и ключ одного клиента в разных контейнерах не совпадал бы
+    user_agent = _header(event, 'User-Agent')
+
+    # Комбинированный ключ
+    return f"{source_ip}:{zlib.crc32(user_agent.encode('utf-8')) % 10000}"
+
+
+def get_rate_limit_type(event: Dict[str, Any], default_action: Optional[str] = None) -> str:
+    """Определение типа rate limit по action из тела или query string.
+    default_action - действие, которое обработчик выполняет для запроса без action."""
+    action = (event.get('queryStringParameters') or {}).get('action') or ''
+    if event.get('body'):
+        try:
+            body = json.loads(event['body'])
+            if isinstance(body, dict):
+                action = body.get('action') or action
+        except (TypeError, ValueError):
+            pass
+    action = str(action or default_action or '')
+
+    # Определяем тип по action
+    if action in AUTH_ACTIONS:
+        return 'auth'
+    elif action in WITHDRAWAL_ACTIONS:
+        return 'withdrawal'
+    elif action in FORUM_WRITE_ACTIONS and event.get('httpMethod') == 'POST':
+        return 'forum'
+
+    return 'default'
+
+
+def is_admin_user(user_id: Any) -> bool:
+    """Роль admin у пользователя; ответ кэшируется на ADMIN_ROLE_CACHE_TTL секунд"""
+    if not user_id:
+        return False
+    user_id = str(user_id)
+    now = time.monotonic()
+    with _admin_lock:
+        cached = _admin_roles.get(user_id)
+        if cached and cached[0] > now:
+            _stats['admin_cache_hits'] += 1
+            return cached[1]
+        _stats['admin_cache_misses'] += 1
+
+    try:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT role FROM users WHERE id = %s", (int(user_id),))
+                row = cur.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+    except (ValueError, TypeError):
+        row = None
+    except Exception as e:
+        # Без БД проверяем с обычным лимитом и не кэшируем ответ
+        print(f'Admin role lookup failed: {e}')
+        return False
+
+    is_admin = bool(row) and row[0] == 'admin'
+    with _admin_lock:
+        _admin_roles[user_id] = (now + ADMIN_ROLE_CACHE_TTL, is_admin)
+        _admin_roles.move_to_end(user_id)
+        while len(_admin_roles) > ADMIN_ROLE_CACHE_SIZE:
+            _admin_roles.popitem(last=False)
+    return is_admin
+
+
+def check_rate_limit(client_key: str, limit_type: str = 'default', is_admin: bool = False) -> Dict[str, Any]:
+    """Проверка rate limit для клиента: учитывает запрос, если он укладывается в лимит"""
+    # Админы получают больший лимит, кроме входа и вывода средств
+    if is_admin and limit_type not in ADMIN_EXEMPT_TYPES:
+        limit_type = 'admin'
+    if limit_type not in RATE_LIMITS:
+        limit_type = 'default'
+    config = RATE_LIMITS[limit_type]
+    max_requests = config['requests']
+    emission = config['window'] / max_requests
+    tau = config['window'] - emission
+    key = f'{limit_type}:{client_key}'
+
+    try:
+        store = _postgres_store if _postgres_store and limit_type in RATE_LIMIT_SHARED_TYPES else _memory_store
+        allowed, tat, now = store.consume(key, emission, tau)
+    except Exception as e:
+        print(f'Rate limit backend error, falling back to memory: {e}')
+        with _stats_lock:
+            _stats['backend_errors'] += 1
+        allowed, tat, now = _memory_store.consume(key, emission, tau)
+
+    with _stats_lock:
+        _stats['checks'] += 1
+        _stats['allowed' if allowed else 'denied'] += 1
+
+    if not allowed:
+        return {
+            'allowed': False,
+            'reason': 'rate_limit_exceeded',
+            'retry_after': max(1, math.ceil(tat - now - tau)),
+            'limit': max_requests,
+            'remaining': 0
+        }
+
+    # Запрос разрешен
+    return {
+        'allowed': True,
+        'limit': max_requests,
+        # Сколько запросов подряд ещё пройдёт прямо сейчас
+        'remaining': max(0, math.floor((tau - (tat - now)) / emission + 1e-9) + 1),
+        'reset': math.ceil(tat)
+    }
+
+
+def rate_limit_headers(result: Dict[str, Any]) -> Dict[str, str]:
+    if not result['allowed']:
+        return {
+            'X-RateLimit-Limit': str(result['limit']),
+            'X-RateLimit-Remaining': '0',
+            'Retry-After': str(result['retry_after'])
+        }
+    return {
+        'X-RateLimit-Limit': str(result['limit']),
+        'X-RateLimit-Remaining': str(result['remaining']),
+        'X-RateLimit-Reset': str(result['reset'])
+    }
+
+
+def rate_limited_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Ответ 429 на запрос сверх лимита"""
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            **rate_limit_headers(result)
+        },
+        'body': json.dumps({
+            'error': 'Too many requests',
+            'message': f'Превышен лимит запросов. Попробуйте через {result["retry_after"]} секунд.',
+            'retry_after': result['retry_after']
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def rate_limited(limit_type: Optional[str] = None, default_action: Optional[str] = None) -> Callable:
+    """Декоратор обработчика: rate limit до вызова, X-RateLimit-* в ответе.
+    limit_type=None - класс определяется по action запроса (get_rate_limit_type);
+    default_action - действие обработчика для запроса без action (auth-new: login).
+    Ошибка самого лимитера не мешает обработать запрос."""
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            if event.get('httpMethod') == 'OPTIONS':
+                return handler(event, context)
+            try:
+                client_key = get_client_key(event)
+                request_type = limit_type or get_rate_limit_type(event, default_action)
+                is_admin = request_type not in ADMIN_EXEMPT_TYPES and is_admin_user(_header(event, 'X-User-Id'))
+                result = check_rate_limit(client_key, request_type, is_admin)
+            except Exception as e:
+                print(f'Rate limit check failed: {e}')
+                return handler(event, context)
+
+            if not result['allowed']:
+                log_security_event('rate_limit_violation', client_key,
+                                   f'Rate limit exceeded for {request_type}', _header(event, 'User-Agent') or 'unknown')
+                return rate_limited_response(result)
+
+            response = handler(event, context)
+            if isinstance(response, dict):
+                response['headers'] = {**(response.get('headers') or {}), **rate_limit_headers(result)}
+            return response
+        return wrapper
+    return decorator
+
+
+def get_limiter_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['backend'] = 'postgres' if _postgres_store else 'memory'
+    stats['memory_keys'] = _memory_store.size()
+    return stats
+
+
+def reset_rate_limits() -> None:
+    """Сбросить состояние в памяти контейнера (тесты, бенчмарк)"""
+    _memory_store.clear()
+    with _admin_lock:
+        _admin_roles.clear()
+    if _postgres_store:
+        _postgres_store.clear()
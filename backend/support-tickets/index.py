@@ -7,26 +7,9 @@ Returns: HTTP response dict с тикетами или результатом о
 import json
 import os
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
-import requests
-
-TELEGRAM_NOTIFY_URL = 'https://functions.poehali.dev/02d813a8-279b-4a13-bfe4-ffb7d0cf5a3f'
-
-def send_telegram_notification(event_type: str, user_info: dict, details: dict):
-    """Отправить уведомление в Telegram"""
-    try:
-        requests.post(
-            TELEGRAM_NOTIFY_URL,
-            json={
-                'event_type': event_type,
-                'user_info': user_info,
-                'details': details
-            },
-            timeout=5
-        )
-    except Exception as e:
-        print(f'Failed to send telegram notification: {e}')
+from db_pool import get_db_connection
+from notification_outbox import enqueue_notification
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -59,7 +42,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     try:
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         conn.autocommit = True
         
         if method == 'GET':
@@ -145,6 +128,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
+                # Тикет, первое сообщение и уведомление в outbox - одной транзакцией
+                conn.autocommit = False
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     cur.execute("""
                         INSERT INTO support_tickets 
@@ -164,8 +149,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     if ticket.get('created_at'):
                         ticket['created_at'] = ticket['created_at'].isoformat()
                     
-                    # Отправляем уведомление в Telegram
-                    send_telegram_notification(
+                    # Уведомление в Telegram ставится в outbox этой же транзакции
+                    enqueue_notification(
+                        cur,
                         'support_ticket_created',
                         {'username': username, 'user_id': user_id},
                         {
@@ -173,8 +159,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                             'category': category,
                             'subject': subject,
                             'message': message
-                        }
+                        },
+                        dedup_key=f"support_ticket_created:{ticket['id']}"
                     )
+                    conn.commit()
                     
                     return {
                         'statusCode': 200,
@@ -0,0 +1,216 @@
+"""
+Отправка сообщений в Telegram Bot API с учётом лимитов
+Все запросы идут через один requests.Session (keep-alive к api.telegram.org).
+Перед каждым sendMessage берётся токен из token bucket чата
+(TELEGRAM_RATE_PER_SEC, ёмкость TELEGRAM_BURST); ответ 429 с
+parameters.retry_after блокирует bucket на указанное время, после чего
+сообщение отправляется повторно. TELEGRAM_MAX_WAIT - общий бюджет вызова
+функции: ожидание токенов и сами запросы (таймаут каждого урезается до
+оставшегося времени). Неотправленное к сроку возвращается как неудача
+(notification-outbox повторит доставку позже). Бюджет должен быть меньше
+OUTBOX_DELIVERY_TIMEOUT notification-outbox, иначе outbox сочтёт пачку
+недоставленной, пока отправка ещё идёт, и доставит её повторно.
+
+Батч событий склеивается в сводки: события, попавшие в окно
+DIGEST_WINDOW секунд, объединяются в одно сообщение (не больше
+DIGEST_MAX_EVENTS событий и TELEGRAM_MESSAGE_LIMIT символов).
+
+TELEGRAM_API_BASE позволяет направить отправку на локальный mock Bot API
+(см. scripts/mock_telegram_bot_api.py).
+
+Использование:
+    from telegram_sender import send_telegram_message, build_digests, send_digests, get_sender_stats
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+TELEGRAM_RATE_PER_SEC = float(os.environ.get('TELEGRAM_RATE_PER_SEC', '1'))
+TELEGRAM_BURST = float(os.environ.get('TELEGRAM_BURST', '3'))
+TELEGRAM_MAX_WAIT = float(os.environ.get('TELEGRAM_MAX_WAIT', '20'))
+TELEGRAM_MAX_ATTEMPTS = int(os.environ.get('TELEGRAM_MAX_ATTEMPTS', '3'))
+TELEGRAM_REQUEST_TIMEOUT = float(os.environ.get('TELEGRAM_REQUEST_TIMEOUT', '10'))
+# Меньше этого времени до срока новый запрос не начинается
+TELEGRAM_MIN_REQUEST_TIME = 1.0
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+DIGEST_WINDOW = float(os.environ.get('TELEGRAM_DIGEST_WINDOW', '60'))
+DIGEST_MAX_EVENTS = int(os.environ.get('TELEGRAM_DIGEST_MAX_EVENTS', '20'))
+DIGEST_SEPARATOR = '\n\n➖➖➖➖➖\n\n'
+
+_session = requests.Session()
+_buckets: Dict[str, 'TokenBucket'] = {}
+_buckets_lock = threading.Lock()
+_stats = {'sent': 0, 'coalesced': 0, 'dropped': 0, 'rate_limited': 0, 'retries': 0}
+_stats_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket с блокировкой по retry_after"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Занять токен; вернуть сколько ждать перед отправкой или None, если дольше max_wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(self._blocked_until - now, 0.0)
+            if self._tokens < 1:
+                wait = max(wait, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def block(self, seconds: float) -> None:
+        """Telegram ответил 429: не отправлять seconds секунд"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+
+def _bucket_for(chat_id: str) -> TokenBucket:
+    with _buckets_lock:
+        bucket = _buckets.get(chat_id)
+        if bucket is None:
+            bucket = _buckets[chat_id] = TokenBucket(TELEGRAM_RATE_PER_SEC, TELEGRAM_BURST)
+        return bucket
+
+
+def _count(name: str, value: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += value
+
+
+def get_sender_stats() -> Dict[str, int]:
+    """Счётчики контейнера: sent/coalesced/dropped/rate_limited/retries"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def send_telegram_message(text: str, deadline: Optional[float] = None) -> bool:
+    """Отправить сообщение администратору с учётом лимитов чата"""
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    chat_id = os.environ.get('TELEGRAM_ADMIN_CHAT_ID')
+
+    if not bot_token or not chat_id:
+        print('Telegram credentials not configured')
+        return False
+
+    if deadline is None:
+        deadline = time.monotonic() + TELEGRAM_MAX_WAIT
+    url = f'{TELEGRAM_API_BASE}/bot{bot_token}/sendMessage'
+    payload = {
+        'chat_id': chat_id,
+        'text': text,
+        'parse_mode': 'HTML'
+    }
+    bucket = _bucket_for(chat_id)
+
+    for attempt in range(TELEGRAM_MAX_ATTEMPTS):
+        if attempt:
+            _count('retries')
+        wait = bucket.reserve(deadline - time.monotonic() - TELEGRAM_MIN_REQUEST_TIME)
+        if wait is None:
+            print('Telegram send does not fit into TELEGRAM_MAX_WAIT')
+            return False
+        if wait > 0:
+            time.sleep(wait)
+
+        remaining = deadline - time.monotonic()
+        if remaining < TELEGRAM_MIN_REQUEST_TIME:
+            print('Telegram send does not fit into TELEGRAM_MAX_WAIT')
+            return False
+        try:
+            response = _session.post(url, json=payload, timeout=min(TELEGRAM_REQUEST_TIMEOUT, remaining))
+        except requests.RequestException as e:
+            print(f'Error sending Telegram message: {e}')
+            continue
+
+        if response.status_code == 200:
+            _count('sent')
+            return True
+
+        if response.status_code == 429:
+            _count('rate_limited')
+            try:
+                retry_after = float(response.json().get('parameters', {}).get('retry_after', 1))
+            except ValueError:
+                retry_after = 1.0
+            bucket.block(retry_after)
+            continue
+
+        print(f'Telegram API error {response.status_code}: {response.text[:200]}')
+        if response.status_code < 500:
+            return False
+
+    return False
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def build_digests(items: List[Tuple[Any, str, Any]]) -> List[Tuple[str, List[Any]]]:
+    """Сгруппировать (id, текст, created_at) в сводки: [(текст сообщения, [id событий])]"""
+    ordered = sorted(items, key=lambda item: str(item[2] or ''))
+    groups: List[List[Tuple[Any, str, Any]]] = []
+    group_start: Optional[datetime] = None
+    group_length = 0
+
+    for item in ordered:
+        created_at = _parse_time(item[2])
+        fits = bool(groups) and len(groups[-1]) < DIGEST_MAX_EVENTS \
+            and group_length + len(DIGEST_SEPARATOR) + len(item[1]) <= TELEGRAM_MESSAGE_LIMIT - 100
+        if fits and created_at and group_start:
+            fits = (created_at - group_start).total_seconds() <= DIGEST_WINDOW
+        if fits:
+            groups[-1].append(item)
+            group_length += len(DIGEST_SEPARATOR) + len(item[1])
+        else:
+            groups.append([item])
+            group_start = created_at
+            group_length = len(item[1])
+
+    digests = []
+    for group in groups:
+        if len(group) == 1:
+            digests.append((group[0][1], [group[0][0]]))
+            continue
+        header = f'📬 <b>Сводка уведомлений: {len(group)}</b>\n\n'
+        digests.append((header + DIGEST_SEPARATOR.join(item[1] for item in group), [item[0] for item in group]))
+    return digests
+
+
+def send_digests(digests: List[Tuple[str, List[Any]]]) -> Dict[Any, bool]:
+    """Отправить сводки в пределах общего TELEGRAM_MAX_WAIT, вернуть {id события: успех}"""
+    deadline = time.monotonic() + TELEGRAM_MAX_WAIT
+    results = {}
+    for text, event_ids in digests:
+        success = send_telegram_message(text, deadline)
+        if success and len(event_ids) > 1:
+            _count('coalesced', len(event_ids) - 1)
+        if not success:
+            _count('dropped', len(event_ids))
+        for event_id in event_ids:
+            results[event_id] = success
+    return results
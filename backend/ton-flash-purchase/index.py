@@ -5,8 +5,7 @@
 
 """
 import json
-import os
-import psycopg2
+from db_pool import get_db_connection
 from datetime import datetime
 from typing import Dict, Any
 
@@ -57,8 +56,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Missing required fields (userId, packageId, price, amount, tonAddress)'})
             }
         
-        dsn = os.environ['DATABASE_URL']
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cur = conn.cursor()
         
         cur.execute('SELECT balance, flash_btc_balance, flash_usdt_balance FROM users WHERE id = %s', (user_id,))
@@ -0,0 +1,271 @@
+"""
+Загрузка вложений частями с докачкой
+Протокол (POST upload-attachment, поле action в теле):
+- init     {filename, content_type, size} -> {upload_id, chunk_size, chunks_total}
+- append   {upload_id, index, chunk_data (base64), sha256} -> состояние загрузки
+- complete {upload_id, sha256?} -> ответ как у обычной загрузки (url, size, ...)
+GET ?action=status&upload_id=... - принятые части, чтобы продолжить прерванную загрузку.
+
+Все части, кроме последней, ровно chunk_size байт. Размер части проверяется
+ещё до декодирования base64, а сумма принятых байт не может превысить
+заявленный при init размер (не больше MAX_FILE_SIZE), поэтому лишние данные
+отклоняются на первой же части. Контрольная сумма SHA-256 каждой части
+сверяется при приёме и повторно при сборке, а сумма всего файла - до того,
+как собранный файл попадёт в хранилище. Повторная отправка уже принятой
+части идемпотентна. Части лежат в blob_store, а complete собирает файл
+потоково: в памяти одновременно не больше одной части. append и complete
+могут попасть в разные контейнеры, поэтому части хранятся только в общем
+хранилище (без него blob_store отклоняет операции с файлами).
+
+Использование:
+    from chunked_upload import init_upload, append_chunk, get_upload_status, complete_upload, UploadError
+"""
+
+import base64
+import binascii
+import hashlib
+import math
+import os
+import uuid
+from typing import Any, Dict, Iterator, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from blob_store import BlobChecksumError, delete_parts, put_blob_stream, put_part, read_part, register_blob
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+ALLOWED_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.pdf', '.doc', '.docx', '.txt', '.zip', '.rar']
+
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(512 * 1024)))
+UPLOAD_TTL_HOURS = 24
+
+
+class UploadError(Exception):
+    """Ошибка протокола загрузки; status_code - HTTP-статус ответа"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def validate_file(filename: Optional[str], size: int) -> None:
+    """Проверка имени и размера файла (общая для обычной загрузки и загрузки частями)"""
+    if size > MAX_FILE_SIZE:
+        raise UploadError('File size exceeds 5MB limit', 413)
+    file_ext = os.path.splitext(filename or '')[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise UploadError(f'File type {file_ext} not allowed')
+
+
+def _chunks_total(upload: Dict[str, Any]) -> int:
+    return max(1, math.ceil(upload['total_size'] / upload['chunk_size']))
+
+
+def _expected_chunk_size(upload: Dict[str, Any], index: int) -> int:
+    last = _chunks_total(upload) - 1
+    return upload['chunk_size'] if index < last else upload['total_size'] - upload['chunk_size'] * last
+
+
+def _get_upload(cur, upload_id: Any, for_update: bool = False) -> Dict[str, Any]:
+    if not isinstance(upload_id, str) or len(upload_id) != 32:
+        raise UploadError('Некорректный upload_id')
+    cur.execute(f"""
+        SELECT id, filename, content_type, total_size, chunk_size, received_size, status, attachment_id,
+               expires_at < CURRENT_TIMESTAMP AS expired
+        FROM attachment_uploads
+        WHERE id = %s
+        {'FOR UPDATE' if for_update else ''}
+    """, (upload_id,))
+    upload = cur.fetchone()
+    if not upload:
+        raise UploadError('Загрузка не найдена', 404)
+    if upload['expired'] and upload['status'] != 'complete':
+        raise UploadError('Загрузка устарела, начните заново', 410)
+    return upload
+
+
+def _status(cur, upload: Dict[str, Any]) -> Dict[str, Any]:
+    cur.execute(
+        "SELECT chunk_index FROM attachment_upload_chunks WHERE upload_id = %s ORDER BY chunk_index",
+        (upload['id'],)
+    )
+    received = [row['chunk_index'] for row in cur.fetchall()]
+    return {
+        'upload_id': upload['id'],
+        'status': upload['status'],
+        'chunk_size': upload['chunk_size'],
+        'chunks_total': _chunks_total(upload),
+        'total_size': upload['total_size'],
+        'received_size': upload['received_size'],
+        'received_chunks': received
+    }
+
+
+def purge_expired_uploads(cur, limit: int = 20) -> int:
+    """Удалить просроченные загрузки вместе с их частями"""
+    cur.execute("""
+        SELECT id, total_size, chunk_size, status FROM attachment_uploads
+        WHERE expires_at < CURRENT_TIMESTAMP
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (limit,))
+    expired = cur.fetchall()
+    for upload in expired:
+        if upload['status'] != 'complete':
+            delete_parts(upload['id'], _chunks_total(upload))
+    if expired:
+        cur.execute("DELETE FROM attachment_uploads WHERE id = ANY(%s)", ([u['id'] for u in expired],))
+    return len(expired)
+
+
+def init_upload(conn, filename: Optional[str], content_type: Optional[str], size: Any) -> Dict[str, Any]:
+    """Начать загрузку частями"""
+    try:
+        total_size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Missing file size')
+    if not filename or total_size <= 0:
+        raise UploadError('Missing filename or size')
+    validate_file(filename, total_size)
+
+    upload_id = uuid.uuid4().hex
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        purge_expired_uploads(cur)
+        cur.execute("""
+            INSERT INTO attachment_uploads (id, filename, content_type, total_size, chunk_size, expires_at)
+            VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 hour')
+        """, (upload_id, filename, content_type or 'application/octet-stream', total_size,
+              UPLOAD_CHUNK_SIZE, UPLOAD_TTL_HOURS))
+    conn.commit()
+
+    return {
+        'upload_id': upload_id,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'chunks_total': max(1, math.ceil(total_size / UPLOAD_CHUNK_SIZE)),
+        'total_size': total_size
+    }
+
+
+def append_chunk(conn, upload_id: Any, index: Any, chunk_data: Any, checksum: Any) -> Dict[str, Any]:
+    """Принять часть загрузки; повторная отправка принятой части ничего не меняет"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        upload = _get_upload(cur, upload_id)
+        if upload['status'] != 'uploading':
+            raise UploadError('Загрузка уже завершена', 409)
+
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            raise UploadError('Некорректный номер части')
+        if not 0 <= index < _chunks_total(upload):
+            raise UploadError('Некорректный номер части')
+        if not isinstance(chunk_data, str) or not isinstance(checksum, str):
+            raise UploadError('Missing chunk_data or sha256')
+
+        expected_size = _expected_chunk_size(upload, index)
+        # Проверка размера до декодирования: лишние данные не попадают в память как bytes
+        if len(chunk_data) > 4 * math.ceil(expected_size / 3):
+            raise UploadError('Chunk exceeds declared size', 413)
+        try:
+            data = base64.b64decode(chunk_data, validate=True)
+        except (binascii.Error, ValueError):
+            raise UploadError('Некорректные данные части')
+        if len(data) != expected_size:
+            raise UploadError(f'Chunk {index} must be {expected_size} bytes')
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        if sha256 != checksum.lower():
+            raise UploadError('Контрольная сумма части не совпадает', 422)
+
+        cur.execute("""
+            INSERT INTO attachment_upload_chunks (upload_id, chunk_index, sha256, size)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (upload_id, chunk_index) DO NOTHING
+            RETURNING chunk_index
+        """, (upload['id'], index, sha256, len(data)))
+
+        if cur.fetchone():
+            cur.execute("""
+                UPDATE attachment_uploads SET received_size = received_size + %s
+                WHERE id = %s AND received_size + %s <= total_size
+                RETURNING received_size
+            """, (len(data), upload['id'], len(data)))
+            row = cur.fetchone()
+            if not row:
+                conn.rollback()
+                raise UploadError('Upload exceeds declared size', 413)
+            upload['received_size'] = row['received_size']
+            # Часть пишется под заявкой на её номер: параллельная отправка того же номера ждёт коммита
+            put_part(upload['id'], index, data)
+        else:
+            cur.execute(
+                "SELECT sha256 FROM attachment_upload_chunks WHERE upload_id = %s AND chunk_index = %s",
+                (upload['id'], index)
+            )
+            if cur.fetchone()['sha256'] != sha256:
+                raise UploadError(f'Chunk {index} already received with different content', 409)
+
+        status = _status(cur, upload)
+    conn.commit()
+    return status
+
+
+def get_upload_status(conn, upload_id: Any) -> Dict[str, Any]:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        return _status(cur, _get_upload(cur, upload_id))
+
+
+def _iter_parts(upload_id: str, chunks: list) -> Iterator[bytes]:
+    for chunk in chunks:
+        data = read_part(upload_id, chunk['chunk_index'])
+        if hashlib.sha256(data).hexdigest() != chunk['sha256']:
+            raise UploadError(f"Chunk {chunk['chunk_index']} is corrupted, upload it again", 409)
+        yield data
+
+
+def complete_upload(conn, upload_id: Any, checksum: Optional[str] = None) -> Dict[str, Any]:
+    """Собрать файл из частей и создать вложение; повторный вызов вернёт то же вложение"""
+    if checksum is not None and not isinstance(checksum, str):
+        raise UploadError('Некорректная контрольная сумма файла')
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        upload = _get_upload(cur, upload_id, for_update=True)
+
+        if upload['status'] != 'complete':
+            cur.execute(
+                "SELECT chunk_index, sha256 FROM attachment_upload_chunks WHERE upload_id = %s ORDER BY chunk_index",
+                (upload['id'],)
+            )
+            chunks = cur.fetchall()
+            missing = sorted(set(range(_chunks_total(upload))) - {c['chunk_index'] for c in chunks})
+            if missing or upload['received_size'] != upload['total_size']:
+                raise UploadError(f'Missing chunks: {missing}', 409)
+
+            try:
+                blob_sha256, size = put_blob_stream(_iter_parts(upload['id'], chunks), checksum)
+            except BlobChecksumError:
+                raise UploadError('Контрольная сумма файла не совпадает', 422)
+
+            register_blob(cur, blob_sha256, size)
+            cur.execute("""
+                INSERT INTO forum_attachments (blob_sha256, filename, content_type, file_size)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (blob_sha256, upload['filename'], upload['content_type'], size))
+            upload['attachment_id'] = cur.fetchone()['id']
+            cur.execute(
+                "UPDATE attachment_uploads SET status = 'complete', attachment_id = %s WHERE id = %s",
+                (upload['attachment_id'], upload['id'])
+            )
+            conn.commit()
+            delete_parts(upload['id'], _chunks_total(upload))
+        else:
+            conn.commit()
+
+    return {
+        'success': True,
+        'url': f"/api/file?id={upload['attachment_id']}",
+        'filename': upload['filename'],
+        'size': upload['total_size'],
+        'content_type': upload['content_type']
+    }
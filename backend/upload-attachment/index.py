@@ -1,13 +1,55 @@
+import base64
 import json
 import os
-import psycopg2
+from db_pool import get_db_connection
 from typing import Dict, Any
 from cors_helper import fix_cors_response
+from blob_store import put_blob, register_blob, serve_blob, BlobNotFoundError
+from chunked_upload import (
+    ALLOWED_EXTENSIONS, MAX_FILE_SIZE, UploadError, append_chunk, complete_upload, get_upload_status, init_upload
+)
+
+# Длина base64 файла максимального размера: больше - отклоняется без декодирования
+MAX_FILE_DATA_LENGTH = 4 * ((MAX_FILE_SIZE + 2) // 3)
+
+
+def chunked_upload_response(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    '''Загрузка частями: init / append / complete / status'''
+    conn = get_db_connection()
+    try:
+        if action == 'init':
+            result = init_upload(conn, params.get('filename'), params.get('content_type'), params.get('size'))
+        elif action == 'append':
+            result = append_chunk(conn, params.get('upload_id'), params.get('index'),
+                                  params.get('chunk_data'), params.get('sha256'))
+        elif action == 'complete':
+            result = complete_upload(conn, params.get('upload_id'), params.get('sha256'))
+        else:
+            result = get_upload_status(conn, params.get('upload_id'))
+        status_code = 200
+    except UploadError as e:
+        conn.rollback()
+        result = {'error': str(e)}
+        status_code = e.status_code
+    finally:
+        conn.close()
+    
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'isBase64Encoded': False,
+        'body': json.dumps(result)
+    }
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
-    Business: Upload file attachments for forum comments (stored in database)
+    Business: Upload file attachments for forum comments (bytes in blob store, metadata in database)
     Args: event with httpMethod, body containing base64 file data, filename, and content type
+          (or action=init/append/complete for chunked upload, GET action=status to resume)
           context with request_id
     Returns: HTTP response with file ID or error
     '''
@@ -29,6 +71,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         query_params = event.get('queryStringParameters') or {}
         file_id = query_params.get('id')
         
+        if query_params.get('action') == 'status':
+            return chunked_upload_response('status', query_params)
+        
         if not file_id:
             return {
                 'statusCode': 400,
@@ -40,12 +85,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Missing file id'})
             }
         
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cur = conn.cursor()
         
+        # file_data читается только у ещё не перенесённых в хранилище вложений
         cur.execute("""
-            SELECT file_data, filename, content_type
+            SELECT blob_sha256, file_size, filename, content_type,
+                   CASE WHEN blob_sha256 IS NULL THEN file_data END
             FROM forum_attachments
             WHERE id = %s
         """, (file_id,))
@@ -54,18 +100,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         cur.close()
         conn.close()
         
+        not_found = {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'File not found'})
+        }
+        
         if not result:
-            return {
-                'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'isBase64Encoded': False,
-                'body': json.dumps({'error': 'File not found'})
-            }
+            return not_found
+        
+        blob_sha256, file_size, filename, content_type, file_data = result
         
-        file_data, filename, content_type = result
+        if blob_sha256:
+            try:
+                return serve_blob(event, blob_sha256, file_size, content_type, filename)
+            except BlobNotFoundError:
+                return not_found
         
         return {
             'statusCode': 200,
@@ -91,6 +145,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     try:
         body_data = json.loads(event.get('body', '{}'))
+        
+        if body_data.get('action') in ('init', 'append', 'complete'):
+            return chunked_upload_response(body_data['action'], body_data)
+        
         file_data = body_data.get('file_data')
         filename = body_data.get('filename')
         content_type = body_data.get('content_type', 'application/octet-stream')
@@ -106,11 +164,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Missing file_data or filename'})
             }
         
-        import base64
-        file_bytes = base64.b64decode(file_data)
-        file_size = len(file_bytes)
+        # Заведомо большой файл отклоняется по длине base64, без декодирования
+        if len(file_data) > MAX_FILE_DATA_LENGTH:
+            file_size = MAX_FILE_SIZE + 1
+        else:
+            file_bytes = base64.b64decode(file_data)
+            file_size = len(file_bytes)
         
-        if file_size > 5 * 1024 * 1024:
+        if file_size > MAX_FILE_SIZE:
             return {
                 'statusCode': 400,
                 'headers': {
@@ -121,9 +182,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'File size exceeds 5MB limit'})
             }
         
-        allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.pdf', '.doc', '.docx', '.txt', '.zip', '.rar']
         file_ext = os.path.splitext(filename)[1].lower()
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTENSIONS:
             return {
                 'statusCode': 400,
                 'headers': {
@@ -134,15 +194,19 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': f'File type {file_ext} not allowed'})
             }
         
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
+        # Байты - в хранилище (повторная загрузка того же файла не дублируется), в БД - метаданные
+        blob_sha256 = put_blob(file_bytes)
+        del file_bytes, file_data
+        
+        conn = get_db_connection()
         cur = conn.cursor()
         
+        register_blob(cur, blob_sha256, file_size)
         cur.execute("""
-            INSERT INTO forum_attachments (file_data, filename, content_type, file_size)
+            INSERT INTO forum_attachments (blob_sha256, filename, content_type, file_size)
             VALUES (%s, %s, %s, %s)
             RETURNING id
-        """, (file_data, filename, content_type, file_size))
+        """, (blob_sha256, filename, content_type, file_size))
         
         file_id = cur.fetchone()[0]
         conn.commit()
@@ -0,0 +1,94 @@
+"""
+Перенос вложений форума из forum_attachments.file_data в хранилище файлов
+Строки без blob_sha256 обрабатываются пачками по id: base64 декодируется,
+байты сохраняются в blob_store, строка получает blob_sha256, а file_data
+очищается только после того, как файл перечитан из хранилища и его хэш
+совпал (verify_blob). Не прошедшие проверку строки и строки с битым base64
+остаются с file_data и попадают в статистику failed. Пачка блокируется
+FOR UPDATE SKIP LOCKED, поэтому перенос можно запускать параллельно и
+повторно. file_data читается
+по одной строке: в памяти не больше одного файла.
+
+Без общего постоянного хранилища (BLOB_STORE_BUCKET или явный
+BLOB_STORE_PATH) перенос не запускается (require_blob_store).
+
+Место в таблице освобождается после VACUUM FULL forum_attachments.
+
+Запуск:
+    python3 migrate_attachments.py [batch_size]
+"""
+
+import base64
+import binascii
+import sys
+from typing import Dict, Tuple
+
+from blob_store import put_blob, register_blob, require_blob_store, verify_blob
+
+MIGRATE_BATCH_SIZE = 20
+
+
+def migrate_batch(conn, after_id: int = 0, batch_size: int = MIGRATE_BATCH_SIZE) -> Tuple[Dict[str, int], int]:
+    """Перенести одну пачку вложений после after_id, вернуть (статистика, последний id)"""
+    stats = {'migrated': 0, 'failed': 0, 'bytes': 0}
+    last_id = after_id
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id FROM forum_attachments
+            WHERE id > %s AND blob_sha256 IS NULL
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (after_id, batch_size))
+        ids = [row[0] for row in cur.fetchall()]
+
+        for attachment_id in ids:
+            last_id = attachment_id
+            cur.execute("SELECT file_data FROM forum_attachments WHERE id = %s", (attachment_id,))
+            try:
+                file_bytes = base64.b64decode(cur.fetchone()[0] or '')
+            except (binascii.Error, ValueError) as e:
+                print(f'[ATTACHMENTS] attachment {attachment_id}: {e}, file_data kept')
+                stats['failed'] += 1
+                continue
+            blob_sha256 = put_blob(file_bytes)
+            if not verify_blob(blob_sha256):
+                print(f'[ATTACHMENTS] attachment {attachment_id}: stored file does not match, file_data kept')
+                stats['failed'] += 1
+                continue
+            register_blob(cur, blob_sha256, len(file_bytes))
+            cur.execute("""
+                UPDATE forum_attachments
+                SET blob_sha256 = %s, file_size = %s, file_data = NULL
+                WHERE id = %s
+            """, (blob_sha256, len(file_bytes), attachment_id))
+            stats['migrated'] += 1
+            stats['bytes'] += len(file_bytes)
+    conn.commit()
+    return stats, last_id
+
+
+def migrate_attachments(conn, batch_size: int = MIGRATE_BATCH_SIZE) -> Dict[str, int]:
+    """Перенести все вложения"""
+    total = {'migrated': 0, 'failed': 0, 'bytes': 0}
+    last_id = 0
+    while True:
+        stats, last_id = migrate_batch(conn, last_id, batch_size)
+        if not stats['migrated'] and not stats['failed']:
+            return total
+        for key in total:
+            total[key] += stats[key]
+        print(f"[ATTACHMENTS] migrated {total['migrated']} files, {total['bytes']} bytes, failed {total['failed']}")
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    require_blob_store()
+
+    worker_conn = get_db_connection()
+    try:
+        result = migrate_attachments(worker_conn, int(sys.argv[1]) if len(sys.argv) > 1 else MIGRATE_BATCH_SIZE)
+        print(f"[ATTACHMENTS] done: {result}")
+    finally:
+        worker_conn.close()
@@ -0,0 +1,409 @@
+"""
+Контентно-адресуемое хранилище файлов (вложения форума)
+Байты файла хранятся вне PostgreSQL под ключом SHA-256 содержимого: один и
+тот же файл, загруженный несколько раз, хранится один раз. В БД остаются
+только метаданные (таблица blobs и ссылка blob_sha256 у владельца файла).
+
+Бэкенд выбирается переменной BLOB_STORE_BACKEND:
+- fs - локальная файловая система, каталог BLOB_STORE_PATH;
+- s3 - S3-совместимое хранилище (MinIO и т.п.): бакет BLOB_STORE_BUCKET,
+  адрес S3_ENDPOINT_URL, ключи AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY.
+По умолчанию s3, если задан BLOB_STORE_BUCKET, иначе fs. Хранилище должно
+быть общим для всех контейнеров и переживать их перезапуск, поэтому fs
+допускается только с явно заданным BLOB_STORE_PATH (общий том). Настройка
+проверяется при первом обращении к хранилищу (require_blob_store): без неё
+операции с файлами завершаются BlobStoreConfigError, а остальные действия
+функции работают.
+
+Части незавершённых загрузок (put_part / read_part / delete_parts) хранятся
+отдельно от контентно-адресуемых файлов, под ключом uploads/<upload_id>/<n>;
+put_blob_stream собирает из них файл потоково.
+
+serve_blob собирает HTTP-ответ функции: ETag по хэшу и Last-Modified, 304 на
+If-None-Match / If-Modified-Since, 206 на Range (читается только запрошенный
+диапазон), 416 на недопустимый диапазон.
+
+Использование:
+    from blob_store import put_blob, register_blob, read_blob, serve_blob
+
+    sha256 = put_blob(file_bytes)
+    register_blob(cur, sha256, len(file_bytes))
+    return serve_blob(event, sha256, size, content_type, filename)
+"""
+
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+BLOB_STORE_BUCKET = os.environ.get('BLOB_STORE_BUCKET', '')
+BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND', 's3' if BLOB_STORE_BUCKET else 'fs')
+BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH', '')
+BLOB_KEY_PREFIX = 'blobs'
+UPLOAD_KEY_PREFIX = 'uploads'
+VERIFY_CHUNK_SIZE = 1024 * 1024
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+_s3_client = None
+_s3_lock = threading.Lock()
+
+
+class BlobNotFoundError(Exception):
+    """Файла с таким хэшем нет в хранилище"""
+
+
+class BlobChecksumError(ValueError):
+    """Содержимое не совпало с ожидаемой контрольной суммой"""
+
+
+class BlobStoreConfigError(RuntimeError):
+    """Не настроено общее постоянное хранилище файлов"""
+
+
+def require_blob_store() -> None:
+    """Проверить, что настроено общее постоянное хранилище"""
+    if BLOB_STORE_BACKEND == 's3':
+        if not BLOB_STORE_BUCKET:
+            raise BlobStoreConfigError('BLOB_STORE_BACKEND=s3 requires BLOB_STORE_BUCKET')
+    elif BLOB_STORE_BACKEND == 'fs':
+        if not BLOB_STORE_PATH:
+            raise BlobStoreConfigError('Blob store is not configured: set BLOB_STORE_BUCKET '
+                                       'or BLOB_STORE_PATH on a shared persistent volume')
+    else:
+        raise BlobStoreConfigError(f'Unknown BLOB_STORE_BACKEND: {BLOB_STORE_BACKEND}')
+
+
+def _check_sha256(sha256: str) -> str:
+    if not isinstance(sha256, str) or not _SHA256_RE.match(sha256):
+        raise ValueError('Некорректный ключ файла')
+    return sha256
+
+
+def _fs_path(sha256: str) -> str:
+    return os.path.join(BLOB_STORE_PATH, sha256[:2], sha256[2:4], sha256)
+
+
+def _s3_key(sha256: str) -> str:
+    return f'{BLOB_KEY_PREFIX}/{sha256[:2]}/{sha256}'
+
+
+def _s3():
+    global _s3_client
+    with _s3_lock:
+        if _s3_client is None:
+            import boto3
+            _s3_client = boto3.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None)
+        return _s3_client
+
+
+def _is_s3_not_found(error: Exception) -> bool:
+    response = getattr(error, 'response', None) or {}
+    return str(response.get('Error', {}).get('Code')) in ('404', 'NoSuchKey', 'NotFound')
+
+
+def blob_exists(sha256: str) -> bool:
+    require_blob_store()
+    _check_sha256(sha256)
+    if BLOB_STORE_BACKEND == 's3':
+        try:
+            _s3().head_object(Bucket=BLOB_STORE_BUCKET, Key=_s3_key(sha256))
+        except Exception as e:
+            if _is_s3_not_found(e):
+                return False
+            raise
+        return True
+    return os.path.exists(_fs_path(sha256))
+
+
+def put_blob(data: bytes) -> str:
+    """Сохранить байты, вернуть SHA-256; уже сохранённое содержимое повторно не пишется"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    if blob_exists(sha256):
+        return sha256
+
+    if BLOB_STORE_BACKEND == 's3':
+        _s3().put_object(Bucket=BLOB_STORE_BUCKET, Key=_s3_key(sha256), Body=data)
+        return sha256
+
+    path = _fs_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Запись во временный файл и атомарное переименование: читатель не увидит недописанный файл
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return sha256
+
+
+def read_blob(sha256: str, start: int = 0, end: Optional[int] = None) -> bytes:
+    """Прочитать файл или диапазон байт [start, end] включительно"""
+    require_blob_store()
+    _check_sha256(sha256)
+    if BLOB_STORE_BACKEND == 's3':
+        params = {'Bucket': BLOB_STORE_BUCKET, 'Key': _s3_key(sha256)}
+        if start or end is not None:
+            params['Range'] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            return _s3().get_object(**params)['Body'].read()
+        except Exception as e:
+            if _is_s3_not_found(e):
+                raise BlobNotFoundError(sha256)
+            raise
+
+    try:
+        with open(_fs_path(sha256), 'rb') as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start + 1)
+    except FileNotFoundError:
+        raise BlobNotFoundError(sha256)
+
+
+def verify_blob(sha256: str) -> bool:
+    """Перечитать файл из хранилища целиком и сверить SHA-256 содержимого"""
+    require_blob_store()
+    _check_sha256(sha256)
+    digest = hashlib.sha256()
+    if BLOB_STORE_BACKEND == 's3':
+        try:
+            body = _s3().get_object(Bucket=BLOB_STORE_BUCKET, Key=_s3_key(sha256))['Body']
+        except Exception as e:
+            if _is_s3_not_found(e):
+                return False
+            raise
+        for chunk in body.iter_chunks(VERIFY_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        try:
+            with open(_fs_path(sha256), 'rb') as f:
+                for chunk in iter(lambda: f.read(VERIFY_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return False
+    return digest.hexdigest() == sha256
+
+
+def put_blob_stream(chunks: Iterable[bytes], expected_sha256: Optional[str] = None) -> Tuple[str, int]:
+    """Сохранить файл из последовательности частей, вернуть (SHA-256, размер).
+    Части пишутся во временный файл по одной: в памяти не больше одной части.
+    При несовпадении с expected_sha256 файл не попадает в хранилище (BlobChecksumError)."""
+    require_blob_store()
+    digest = hashlib.sha256()
+    size = 0
+    tmp_dir = BLOB_STORE_PATH if BLOB_STORE_BACKEND == 'fs' else None
+    if tmp_dir:
+        os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        sha256 = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise BlobChecksumError(sha256)
+
+        if not blob_exists(sha256):
+            if BLOB_STORE_BACKEND == 's3':
+                # upload_file сам переходит на multipart для крупных файлов
+                _s3().upload_file(tmp_path, BLOB_STORE_BUCKET, _s3_key(sha256))
+            else:
+                path = _fs_path(sha256)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return sha256, size
+
+
+def _part_key(upload_id: str, index: int) -> str:
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        raise ValueError('Некорректный идентификатор загрузки')
+    return f'{UPLOAD_KEY_PREFIX}/{upload_id}/{int(index)}'
+
+
+def put_part(upload_id: str, index: int, data: bytes) -> None:
+    """Сохранить часть незавершённой загрузки (вне контентно-адресуемого пространства)"""
+    require_blob_store()
+    key = _part_key(upload_id, index)
+    if BLOB_STORE_BACKEND == 's3':
+        _s3().put_object(Bucket=BLOB_STORE_BUCKET, Key=key, Body=data)
+        return
+
+    path = os.path.join(BLOB_STORE_PATH, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_part(upload_id: str, index: int) -> bytes:
+    require_blob_store()
+    key = _part_key(upload_id, index)
+    if BLOB_STORE_BACKEND == 's3':
+        try:
+            return _s3().get_object(Bucket=BLOB_STORE_BUCKET, Key=key)['Body'].read()
+        except Exception as e:
+            if _is_s3_not_found(e):
+                raise BlobNotFoundError(key)
+            raise
+
+    try:
+        with open(os.path.join(BLOB_STORE_PATH, key), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        raise BlobNotFoundError(key)
+
+
+def delete_parts(upload_id: str, count: int) -> None:
+    """Удалить части загрузки 0..count-1 (отсутствующие пропускаются)"""
+    require_blob_store()
+    keys = [_part_key(upload_id, index) for index in range(count)]
+    if BLOB_STORE_BACKEND == 's3':
+        for start in range(0, len(keys), 1000):
+            _s3().delete_objects(Bucket=BLOB_STORE_BUCKET, Delete={
+                'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True
+            })
+        return
+
+    for key in keys:
+        try:
+            os.unlink(os.path.join(BLOB_STORE_PATH, key))
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(os.path.join(BLOB_STORE_PATH, UPLOAD_KEY_PREFIX, upload_id))
+    except OSError:
+        pass
+
+
+def register_blob(cur, sha256: str, size: int) -> None:
+    """Записать метаданные файла в таблицу blobs (идемпотентно)"""
+    cur.execute("""
+        INSERT INTO blobs (sha256, size) VALUES (%s, %s)
+        ON CONFLICT (sha256) DO NOTHING
+    """, (_check_sha256(sha256), size))
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Диапазон из заголовка Range: (start, end) включительно.
+    None - заголовка нет или он не поддерживается (несколько диапазонов), отдаётся весь файл.
+    ValueError - диапазон вне файла (416)."""
+    match = _RANGE_RE.match((range_header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError('Unsatisfiable range')
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def _header(event: Dict[str, Any], name: str) -> str:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+
+def http_date(value: datetime) -> str:
+    """Дата для Last-Modified; наивные datetime из БД считаются UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(event: Dict[str, Any], etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Условный запрос: If-None-Match, а без него - If-Modified-Since"""
+    if_none_match = _header(event, 'if-none-match')
+    if if_none_match:
+        client_etags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return etag in client_etags or '*' in client_etags
+
+    if_modified_since = _header(event, 'if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+        return modified.replace(microsecond=0) <= since
+    return False
+
+
+def serve_blob(event: Dict[str, Any], sha256: Optional[str], size: int, content_type: str, filename: str,
+               cache_control: str = 'public, max-age=31536000, immutable', data: Optional[bytes] = None,
+               etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> Dict[str, Any]:
+    """HTTP-ответ с содержимым файла: 200, 206, 304 или 416.
+    data - уже прочитанное содержимое (кэш); без него читается только нужный диапазон из хранилища.
+    etag по умолчанию - хэш содержимого."""
+    etag = etag or f'"{sha256}"'
+    headers = {
+        'Content-Type': content_type,
+        'Content-Disposition': f'inline; filename="{filename}"',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag, Last-Modified, Content-Range, Accept-Ranges',
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+        'ETag': etag
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if is_not_modified(event, etag, last_modified):
+        return {'statusCode': 304, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+
+    byte_range = None
+    if_range = _header(event, 'if-range').strip()
+    if not if_range or if_range in (etag, headers.get('Last-Modified')):
+        try:
+            byte_range = parse_range(_header(event, 'range'), size)
+        except ValueError:
+            headers['Content-Range'] = f'bytes */{size}'
+            return {'statusCode': 416, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+
+    if byte_range:
+        start, end = byte_range
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        body = data[start:end + 1] if data is not None else read_blob(sha256, start, end)
+        status = 206
+    else:
+        body = data if data is not None else read_blob(sha256)
+        status = 200
+
+    return {
+        'statusCode': status,
+        'headers': headers,
+        'isBase64Encoded': True,
+        'body': base64.b64encode(body).decode()
+    }
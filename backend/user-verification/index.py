@@ -5,10 +5,10 @@ Returns: HTTP response с данными заявок на верификаци
 """
 
 import json
-import os
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
+from verification_photos import PhotoError, photo_response, store_photo
 
 SCHEMA = 't_p32599880_plugin_site_developm'
 
@@ -45,8 +45,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    conn = get_db_connection(cursor_factory=RealDictCursor)
     cur = conn.cursor()
     
     try:
@@ -86,20 +85,19 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     }
                 
                 status_filter = params.get('status', 'pending')
-                status_escaped = escape_sql_string(status_filter)
                 
                 query = f"""
                     SELECT vr.id, vr.user_id, vr.full_name, vr.birth_date, vr.status, 
                            vr.admin_comment, vr.created_at, vr.reviewed_at,
                            u.username, u.email, u.avatar_url,
-                           CASE WHEN vr.passport_photo IS NOT NULL THEN true ELSE false END as has_passport,
-                           CASE WHEN vr.selfie_photo IS NOT NULL THEN true ELSE false END as has_selfie
+                           (vr.passport_blob_sha256 IS NOT NULL OR vr.passport_photo IS NOT NULL) as has_passport,
+                           (vr.selfie_blob_sha256 IS NOT NULL OR vr.selfie_photo IS NOT NULL) as has_selfie
                     FROM {SCHEMA}.verification_requests vr
                     JOIN {SCHEMA}.users u ON vr.user_id = u.id
-                    WHERE vr.status = {status_escaped}
+                    WHERE vr.status = %s
                     ORDER BY vr.created_at DESC
                 """
-                cur.execute(query)
+                cur.execute(query, (status_filter,))
                 requests = cur.fetchall()
                 
                 return {
@@ -131,7 +129,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     }
                 
                 cur.execute(
-                    f"SELECT passport_photo, selfie_photo FROM {SCHEMA}.verification_requests WHERE id = {request_id}"
+                    f"""SELECT (passport_blob_sha256 IS NOT NULL OR passport_photo IS NOT NULL) AS has_passport,
+                              (selfie_blob_sha256 IS NOT NULL OR selfie_photo IS NOT NULL) AS has_selfie
+                       FROM {SCHEMA}.verification_requests WHERE id = %s""",
+                    (request_id,)
                 )
                 request = cur.fetchone()
                 
@@ -143,15 +144,48 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
+                # Сами фото отдаются по одному через action=photo
+                photo_url = f"?action=photo&request_id={int(request_id)}&kind="
                 return {
                     'statusCode': 200,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                     'body': json.dumps({
-                        'passport_photo': request['passport_photo'],
-                        'selfie_photo': request['selfie_photo']
+                        'passport_photo_url': photo_url + 'passport' if request['has_passport'] else None,
+                        'selfie_photo_url': photo_url + 'selfie' if request['has_selfie'] else None
                     }),
                     'isBase64Encoded': False
                 }
+            
+            elif action == 'photo':
+                cur.execute(f"SELECT role FROM {SCHEMA}.users WHERE id = %s", (user_id,))
+                user = cur.fetchone()
+                
+                if not user or user['role'] != 'admin':
+                    return {
+                        'statusCode': 403,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Доступ запрещен'}),
+                        'isBase64Encoded': False
+                    }
+                
+                try:
+                    response = photo_response(event, cur, params.get('request_id'), params.get('kind', 'passport'), params.get('w'))
+                except PhotoError as e:
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': str(e)}),
+                        'isBase64Encoded': False
+                    }
+                
+                if not response:
+                    return {
+                        'statusCode': 404,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Фото не найдено'}),
+                        'isBase64Encoded': False
+                    }
+                return response
         
         elif method == 'POST':
             try:
@@ -212,17 +246,28 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'isBase64Encoded': False
                     }
                 
-                full_name_esc = escape_sql_string(full_name)
-                birth_date_esc = escape_sql_string(birth_date)
-                passport_esc = escape_sql_string(passport_photo)
-                selfie_esc = escape_sql_string(selfie_photo) if selfie_photo else 'NULL'
+                # Фото - в blob_store, в заявку - только ключи; запрос параметризован, а не склеен из 10 МБ строк
+                try:
+                    passport_sha256, passport_content_type = store_photo(cur, passport_photo)
+                    selfie_sha256, selfie_content_type = store_photo(cur, selfie_photo) if selfie_photo else (None, None)
+                except PhotoError as e:
+                    return {
+                        'statusCode': 400,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': str(e)}),
+                        'isBase64Encoded': False
+                    }
+                del passport_photo, selfie_photo
                 
                 print(f"Inserting verification request for user {user_id}")
                 cur.execute(
                     f"""INSERT INTO {SCHEMA}.verification_requests 
-                    (user_id, full_name, birth_date, passport_photo, selfie_photo, status)
-                    VALUES ({user_id}, {full_name_esc}, {birth_date_esc}, {passport_esc}, {selfie_esc}, 'pending')
-                    RETURNING id"""
+                    (user_id, full_name, birth_date, passport_blob_sha256, passport_content_type,
+                     selfie_blob_sha256, selfie_content_type, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'pending')
+                    RETURNING id""",
+                    (user_id, full_name, birth_date, passport_sha256, passport_content_type,
+                     selfie_sha256, selfie_content_type)
                 )
                 request_id = cur.fetchone()['id']
                 print(f"Created verification request {request_id}")
@@ -0,0 +1,70 @@
+"""
+Перенос фото заявок на верификацию из verification_requests в blob_store
+Заявки с passport_photo / selfie_photo обрабатываются пачками по id
+(FOR UPDATE SKIP LOCKED): data URL декодируется, байты сохраняются в
+blob_store, заявка получает *_blob_sha256 и *_content_type, а столбец с
+data URL очищается. Фото, которое не удалось разобрать, остаётся в таблице.
+
+Запуск:
+    python3 migrate_verification_photos.py [batch_size]
+"""
+
+import sys
+from typing import Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from verification_photos import PHOTO_KINDS, SCHEMA, PhotoError, store_photo
+
+MIGRATE_BATCH_SIZE = 20
+
+
+def migrate_batch(conn, after_id: int = 0, batch_size: int = MIGRATE_BATCH_SIZE) -> Tuple[int, int]:
+    """Перенести фото одной пачки заявок с id > after_id, вернуть (число заявок, последний id)"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(f"""
+            SELECT id FROM {SCHEMA}.verification_requests
+            WHERE id > %s AND (passport_photo IS NOT NULL OR selfie_photo IS NOT NULL)
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (after_id, batch_size))
+        ids = [row['id'] for row in cur.fetchall()]
+
+        for request_id in ids:
+            for kind in PHOTO_KINDS:
+                # data URL читается по одному: в памяти не больше одного фото
+                cur.execute(f"SELECT {kind}_photo AS photo FROM {SCHEMA}.verification_requests WHERE id = %s", (request_id,))
+                value = cur.fetchone()['photo']
+                if not value:
+                    continue
+                try:
+                    sha256, content_type = store_photo(cur, value)
+                except PhotoError as e:
+                    print(f'[VERIFICATION] request {request_id} {kind}: {e}, left in table')
+                    continue
+                cur.execute(f"""
+                    UPDATE {SCHEMA}.verification_requests
+                    SET {kind}_blob_sha256 = %s, {kind}_content_type = %s, {kind}_photo = NULL
+                    WHERE id = %s
+                """, (sha256, content_type, request_id))
+    conn.commit()
+    return len(ids), ids[-1] if ids else after_id
+
+
+if __name__ == '__main__':
+    from db_pool import get_db_connection
+
+    worker_conn = get_db_connection()
+    try:
+        batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else MIGRATE_BATCH_SIZE
+        total, last_id = 0, 0
+        while True:
+            count, last_id = migrate_batch(worker_conn, last_id, batch_size)
+            if not count:
+                break
+            total += count
+            print(f'[VERIFICATION] migrated {total} requests')
+        print(f'[VERIFICATION] done: {total} requests')
+    finally:
+        worker_conn.close()
@@ -0,0 +1,103 @@
+"""
+Фото документов для верификации в blob_store
+Фото приходят в submit как data URL (data:image/jpeg;base64,...): байты
+сохраняются в blob_store, в verification_requests записываются только ключ
+SHA-256 и тип файла. Администратор получает каждое фото отдельным запросом
+(action=photo&request_id=...&kind=passport|selfie), при w=... - уменьшенную
+копию для списка заявок. Заявки, поданные до переноса, отдаются из
+passport_photo / selfie_photo.
+
+Использование:
+    from verification_photos import store_photo, photo_response, PhotoError
+
+Перенос фото уже поданных заявок: python3 migrate_verification_photos.py
+"""
+
+import base64
+import binascii
+from typing import Any, Dict, Optional, Tuple
+
+from blob_store import BlobNotFoundError, put_blob, read_blob, register_blob, serve_blob
+from db_pool import get_db_connection
+from thumbnails import THUMBNAIL_CONTENT_TYPES, get_thumbnail, select_format, select_width
+
+SCHEMA = 't_p32599880_plugin_site_developm'
+
+PHOTO_KINDS = ('passport', 'selfie')
+# Документы пользователя: только личный кэш браузера администратора
+PHOTO_CACHE_CONTROL = 'private, max-age=86400'
+
+
+class PhotoError(Exception):
+    """Некорректное фото или запрос фото"""
+
+
+def parse_data_url(value: str) -> Tuple[str, bytes]:
+    """(content_type, bytes) из data URL; строка без префикса считается base64 JPEG"""
+    content_type = 'image/jpeg'
+    data = value
+    if value.startswith('data:'):
+        header, _, data = value.partition(',')
+        content_type = header[5:].split(';')[0] or content_type
+        if ';base64' not in header:
+            raise PhotoError('Фото должно быть передано в base64')
+    if not content_type.startswith('image/'):
+        raise PhotoError('Допускаются только изображения')
+    try:
+        return content_type, base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise PhotoError('Некорректные данные фото')
+
+
+def store_photo(cur, data_url: str) -> Tuple[str, str]:
+    """Сохранить фото в blob_store, вернуть (sha256, content_type)"""
+    content_type, data = parse_data_url(data_url)
+    sha256 = put_blob(data)
+    register_blob(cur, sha256, len(data))
+    return sha256, content_type
+
+
+def photo_response(event: Dict[str, Any], cur, request_id: Any, kind: str, width: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """HTTP-ответ с одним фото заявки; None - заявки или фото нет"""
+    if kind not in PHOTO_KINDS:
+        raise PhotoError('kind должен быть passport или selfie')
+    try:
+        request_id = int(request_id)
+    except (TypeError, ValueError):
+        raise PhotoError('request_id обязателен')
+
+    # Строка с data URL читается только у не перенесённых заявок
+    cur.execute(f"""
+        SELECT vr.{kind}_blob_sha256 AS sha256, vr.{kind}_content_type AS content_type, b.size, vr.created_at,
+               CASE WHEN vr.{kind}_blob_sha256 IS NULL THEN vr.{kind}_photo END AS legacy_photo
+        FROM {SCHEMA}.verification_requests vr
+        LEFT JOIN {SCHEMA}.blobs b ON b.sha256 = vr.{kind}_blob_sha256
+        WHERE vr.id = %s
+    """, (request_id,))
+    photo = cur.fetchone()
+    if not photo or not (photo['sha256'] or photo['legacy_photo']):
+        return None
+
+    filename = f'{kind}-{request_id}'
+    if not photo['sha256']:
+        content_type, data = parse_data_url(photo['legacy_photo'])
+        return serve_blob(event, None, len(data), content_type, filename, cache_control=PHOTO_CACHE_CONTROL,
+                          data=data, etag=f'"verification-{request_id}-{kind}"', last_modified=photo['created_at'])
+
+    sha256, size, content_type = photo['sha256'], int(photo['size'] or 0), photo['content_type']
+    thumbnail_width = select_width(width) if content_type in THUMBNAIL_CONTENT_TYPES else None
+    try:
+        if thumbnail_width:
+            accept = next((v for k, v in (event.get('headers') or {}).items() if k.lower() == 'accept'), '')
+            source_sha256 = sha256
+            sha256, size, content_type = get_thumbnail(
+                get_db_connection, source_sha256, size, content_type,
+                thumbnail_width, select_format(accept), lambda: read_blob(source_sha256)
+            )
+        response = serve_blob(event, sha256, size, content_type, filename, cache_control=PHOTO_CACHE_CONTROL,
+                              last_modified=photo['created_at'])
+    except BlobNotFoundError:
+        return None
+    if thumbnail_width:
+        response['headers']['Vary'] = 'Accept'
+    return response
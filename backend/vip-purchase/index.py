@@ -2,8 +2,8 @@ import json
 import os
 from datetime import datetime, timedelta
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -77,7 +77,7 @@ def purchase_vip(user_id: int) -> Dict[str, Any]:
     
     conn = None
     try:
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
         cur.execute(
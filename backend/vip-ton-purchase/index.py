@@ -1,7 +1,7 @@
 import json
 import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 from datetime import datetime, timedelta
 from typing import Dict, Any
 
@@ -52,7 +52,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(dsn)
+    conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -5,28 +5,15 @@ Returns: HTTP response с информацией о заявках на выво
 """
 
 import json
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_db_connection
 from datetime import datetime, timezone
 from typing import Dict, Any
-import requests
+from notification_outbox import enqueue_notification
+from rate_limit import rate_limited
 
 SCHEMA = 't_p32599880_plugin_site_developm'
 
-def send_telegram_notification(event_type: str, user_info: Dict, details: Dict):
-    '''Send notification to admin via Telegram'''
-    try:
-        telegram_url = 'https://functions.poehali.dev/02d813a8-279b-4a13-bfe4-ffb7d0cf5a3f'
-        payload = {
-            'event_type': event_type,
-            'user_info': user_info,
-            'details': details
-        }
-        requests.post(telegram_url, json=payload, timeout=5)
-    except:
-        pass
-
 def serialize_datetime(obj):
     """Сериализация datetime объектов в ISO формат с UTC"""
     if isinstance(obj, datetime):
@@ -35,6 +22,7 @@ def serialize_datetime(obj):
         return obj.isoformat()
     return str(obj)
 
+@rate_limited()
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -62,11 +50,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    dsn = os.environ.get('DATABASE_URL')
     conn = None
     
     try:
-        conn = psycopg2.connect(dsn)
+        conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         if method == 'GET':
@@ -261,15 +248,16 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     VALUES (%s, %s, %s, %s, %s)
                 """, ('withdrawal_request', '💸 Заявка на вывод', f"Пользователь {username} создал заявку на вывод {amount} USDT", withdrawal_id, 'withdrawal'))
                 
-                conn.commit()
-                
-                # Send Telegram notification to admin
-                send_telegram_notification(
+                enqueue_notification(
+                    cursor,
                     'withdrawal_request',
                     {'username': user['username'], 'user_id': user_id},
-                    {'amount': amount, 'wallet': usdt_wallet}
+                    {'amount': amount, 'wallet': usdt_wallet},
+                    dedup_key=f'withdrawal_request:{withdrawal_id}'
                 )
                 
+                conn.commit()
+                
                 cursor.close()
                 
                 return {
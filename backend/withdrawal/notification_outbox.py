@@ -0,0 +1,36 @@
+"""
+Постановка уведомлений администратору в outbox
+Вместо синхронного POST в telegram-notify уведомление записывается в
+notification_outbox тем же курсором, что и бизнес-изменение, и
+фиксируется вместе с ним одним commit. Доставкой (батчи, повторы с
+backoff) занимается функция notification-outbox, поэтому время ответа
+не зависит от Telegram. Повторная постановка с тем же dedup_key
+игнорируется.
+
+Использование:
+    from notification_outbox import enqueue_notification
+
+    enqueue_notification(cur, 'withdrawal_request', {'username': username, 'user_id': user_id},
+                         {'amount': amount}, dedup_key=f'withdrawal_request:{withdrawal_id}')
+    conn.commit()
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+OUTBOX_TABLE = 't_p32599880_plugin_site_developm.notification_outbox'
+
+
+def enqueue_notification(cur, event_type: str, user_info: Dict[str, Any], details: Dict[str, Any],
+                         dedup_key: Optional[str] = None) -> None:
+    """Добавить уведомление в outbox (в текущей транзакции)"""
+    cur.execute(f"""
+        INSERT INTO {OUTBOX_TABLE} (event_type, user_info, details, dedup_key)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (dedup_key) DO NOTHING
+    """, (
+        event_type,
+        json.dumps(user_info, ensure_ascii=False, default=str),
+        json.dumps(details, ensure_ascii=False, default=str),
+        dedup_key
+    ))
@@ -0,0 +1,129 @@
+"""
+Асинхронная запись событий безопасности в security_logs
+Событие кладётся в буфер в памяти и не задерживает ответ; фоновый поток
+записывает накопленное одним COPY на пачку - раз в
+SECURITY_LOG_FLUSH_INTERVAL секунд или сразу, как только в буфере
+SECURITY_LOG_BATCH_SIZE событий. Время события фиксируется при постановке
+в буфер, а не при записи. Стоимость записи - одно соединение из пула и
+один запрос на пачку, а не на событие.
+
+Перегрузка (флуд нарушений): буфер ограничен SECURITY_LOG_MAX_BUFFER
+событиями. Когда он заполнен наполовину, сохраняется только каждое
+SECURITY_LOG_SAMPLE_RATE-е событие, при полном буфере новые события
+отбрасываются. Потери считаются (get_security_log_stats) и попадают в
+security_logs одной строкой security_log_overflow на пачку. Пачка, которую
+не удалось записать, возвращается в буфер, если в нём есть место.
+
+Использование:
+    from security_log import log_security_event
+
+    log_security_event('rate_limit_violation', client_key, 'Rate limit exceeded for auth', user_agent)
+"""
+
+import csv
+import io
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from db_pool import get_db_connection
+
+SECURITY_LOG_BATCH_SIZE = int(os.environ.get('SECURITY_LOG_BATCH_SIZE', '100'))
+SECURITY_LOG_FLUSH_INTERVAL = float(os.environ.get('SECURITY_LOG_FLUSH_INTERVAL', '2'))
+SECURITY_LOG_MAX_BUFFER = int(os.environ.get('SECURITY_LOG_MAX_BUFFER', '5000'))
+SECURITY_LOG_SAMPLE_RATE = int(os.environ.get('SECURITY_LOG_SAMPLE_RATE', '10'))
+
+_lock = threading.Lock()
+_buffer: List[Tuple[str, str, Optional[str], Optional[str], datetime]] = []
+_wakeup = threading.Event()
+_worker: Optional[threading.Thread] = None
+_sample_counter = 0
+_lost_since_flush = 0
+_stats = {'queued': 0, 'written': 0, 'batches': 0, 'sampled_out': 0, 'dropped': 0, 'write_errors': 0}
+
+
+def log_security_event(event_type: str, client_key: str, reason: Optional[str] = None,
+                       user_agent: Optional[str] = None) -> None:
+    """Поставить событие в очередь на запись"""
+    global _worker, _sample_counter, _lost_since_flush
+    with _lock:
+        if len(_buffer) >= SECURITY_LOG_MAX_BUFFER:
+            _stats['dropped'] += 1
+            _lost_since_flush += 1
+            return
+        if len(_buffer) >= SECURITY_LOG_MAX_BUFFER // 2:
+            _sample_counter += 1
+            if _sample_counter % SECURITY_LOG_SAMPLE_RATE:
+                _stats['sampled_out'] += 1
+                _lost_since_flush += 1
+                return
+
+        _buffer.append((event_type[:50], client_key[:255], reason, user_agent, datetime.now()))
+        _stats['queued'] += 1
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_flush_loop, name='security-log-writer', daemon=True)
+            _worker.start()
+        if len(_buffer) >= SECURITY_LOG_BATCH_SIZE:
+            _wakeup.set()
+
+
+def _copy_rows(cur, rows: List[Tuple[Any, ...]]) -> None:
+    data = io.StringIO()
+    writer = csv.writer(data)
+    for event_type, client_key, reason, user_agent, created_at in rows:
+        writer.writerow((event_type, client_key, reason, user_agent, created_at.isoformat(sep=' ')))
+    data.seek(0)
+    cur.copy_expert(
+        "COPY security_logs (event_type, client_key, reason, user_agent, created_at) FROM STDIN WITH (FORMAT csv)",
+        data
+    )
+
+
+def flush_security_events() -> int:
+    """Записать накопленные события; возвращает число записанных"""
+    global _lost_since_flush
+    with _lock:
+        batch = _buffer[:]
+        del _buffer[:]
+        lost, _lost_since_flush = _lost_since_flush, 0
+    if lost:
+        batch.append(('security_log_overflow', 'security_log', f'{lost} events dropped or sampled out', None, datetime.now()))
+    if not batch or not os.environ.get('DATABASE_URL'):
+        return 0
+
+    try:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                _copy_rows(cur, batch)
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception:
+        with _lock:
+            _stats['write_errors'] += 1
+            room = max(0, SECURITY_LOG_MAX_BUFFER - len(_buffer))
+            _buffer[:0] = batch[:room]
+            _stats['dropped'] += max(0, len(batch) - room)
+        raise
+
+    with _lock:
+        _stats['written'] += len(batch)
+        _stats['batches'] += 1
+    return len(batch)
+
+
+def get_security_log_stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, 'buffered': len(_buffer)}
+
+
+def _flush_loop() -> None:
+    while True:
+        _wakeup.wait(SECURITY_LOG_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush_security_events()
+        except Exception as e:
+            print(f'Failed to write security events: {e}')
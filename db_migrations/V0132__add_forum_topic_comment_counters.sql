@@ -0,0 +1,31 @@
+-- Денормализованные счётчики комментариев для списка тем форума
+ALTER TABLE t_p32599880_plugin_site_developm.forum_topics
+ADD COLUMN IF NOT EXISTS comments_count INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE t_p32599880_plugin_site_developm.forum_topics
+ADD COLUMN IF NOT EXISTS last_comment_at TIMESTAMP;
+
+UPDATE t_p32599880_plugin_site_developm.forum_topics
+SET is_pinned = FALSE
+WHERE is_pinned IS NULL;
+
+-- Backfill по текущим (не удалённым) комментариям
+UPDATE t_p32599880_plugin_site_developm.forum_topics ft
+SET comments_count = stats.comments_count,
+    last_comment_at = stats.last_comment_at
+FROM (
+    SELECT topic_id, COUNT(*) AS comments_count, MAX(created_at) AS last_comment_at
+    FROM t_p32599880_plugin_site_developm.forum_comments
+    WHERE removed_at IS NULL
+    GROUP BY topic_id
+) stats
+WHERE ft.id = stats.topic_id;
+
+-- Индексы под keyset-пагинацию (is_pinned, created_at, id)
+CREATE INDEX IF NOT EXISTS idx_forum_topics_listing
+ON t_p32599880_plugin_site_developm.forum_topics(is_pinned DESC, created_at DESC, id DESC)
+WHERE removed_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_forum_topics_category_listing
+ON t_p32599880_plugin_site_developm.forum_topics(category_id, is_pinned DESC, created_at DESC, id DESC)
+WHERE removed_at IS NULL;
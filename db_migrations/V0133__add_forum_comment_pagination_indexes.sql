@@ -0,0 +1,8 @@
+-- Индексы под постраничную загрузку комментариев темы и ответов
+CREATE INDEX IF NOT EXISTS idx_forum_comments_topic_roots
+ON t_p32599880_plugin_site_developm.forum_comments(topic_id, created_at, id)
+WHERE parent_id IS NULL AND removed_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_forum_comments_replies
+ON t_p32599880_plugin_site_developm.forum_comments(parent_id, created_at, id)
+WHERE removed_at IS NULL;
@@ -0,0 +1,9 @@
+-- Буфер просмотров тем: append-only дельты, периодически переносятся в forum_topics.views
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.topic_view_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    topic_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_topic_view_deltas_topic_id ON t_p32599880_plugin_site_developm.topic_view_deltas(topic_id);
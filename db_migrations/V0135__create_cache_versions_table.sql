@@ -0,0 +1,10 @@
+-- Версии кэшей в памяти функций (кэш дерева категорий форума и т.п.)
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.cache_versions (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO t_p32599880_plugin_site_developm.cache_versions (name, version)
+VALUES ('forum_categories', 1)
+ON CONFLICT (name) DO NOTHING;
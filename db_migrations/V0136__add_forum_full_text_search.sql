@@ -0,0 +1,48 @@
+-- Полнотекстовый поиск по темам и комментариям форума (русская + английская морфология)
+ALTER TABLE t_p32599880_plugin_site_developm.forum_topics
+ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+ALTER TABLE t_p32599880_plugin_site_developm.forum_comments
+ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.forum_topics_search_vector_update()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', COALESCE(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', COALESCE(NEW.content, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.content, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.forum_comments_search_vector_update()
+RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        to_tsvector('russian', COALESCE(NEW.content, '')) ||
+        to_tsvector('english', COALESCE(NEW.content, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_forum_topics_search_vector ON t_p32599880_plugin_site_developm.forum_topics;
+CREATE TRIGGER trg_forum_topics_search_vector
+BEFORE INSERT OR UPDATE OF title, content ON t_p32599880_plugin_site_developm.forum_topics
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.forum_topics_search_vector_update();
+
+DROP TRIGGER IF EXISTS trg_forum_comments_search_vector ON t_p32599880_plugin_site_developm.forum_comments;
+CREATE TRIGGER trg_forum_comments_search_vector
+BEFORE INSERT OR UPDATE OF content ON t_p32599880_plugin_site_developm.forum_comments
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.forum_comments_search_vector_update();
+
+-- Backfill: UPDATE OF title/content запускает триггеры
+UPDATE t_p32599880_plugin_site_developm.forum_topics SET title = title;
+UPDATE t_p32599880_plugin_site_developm.forum_comments SET content = content;
+
+CREATE INDEX IF NOT EXISTS idx_forum_topics_search_vector
+ON t_p32599880_plugin_site_developm.forum_topics USING GIN(search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_forum_comments_search_vector
+ON t_p32599880_plugin_site_developm.forum_comments USING GIN(search_vector);
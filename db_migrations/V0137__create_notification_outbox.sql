@@ -0,0 +1,21 @@
+-- Outbox уведомлений администратору: пишется в транзакции бизнес-операции,
+-- доставляется в telegram-notify функцией notification-outbox
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    user_info JSONB NOT NULL DEFAULT '{}',
+    details JSONB NOT NULL DEFAULT '{}',
+    dedup_key VARCHAR(200) UNIQUE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending
+ON t_p32599880_plugin_site_developm.notification_outbox(next_attempt_at, id) WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_sent_at
+ON t_p32599880_plugin_site_developm.notification_outbox(sent_at) WHERE status = 'sent';
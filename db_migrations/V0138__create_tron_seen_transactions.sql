@@ -0,0 +1,33 @@
+-- Кэш входящих USDT TRC20 переводов на адреса пополнения: каждый перевод
+-- запрашивается у TronGrid один раз; payment_id - зачтённый платёж (NULL - ещё не сопоставлен)
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.tron_seen_transactions (
+    transaction_id VARCHAR(255) PRIMARY KEY,
+    wallet_address VARCHAR(255) NOT NULL,
+    amount DECIMAL(20, 6) NOT NULL,
+    from_address VARCHAR(255),
+    block_timestamp BIGINT NOT NULL,
+    payment_id INTEGER,
+    seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_tron_seen_transactions_unmatched
+ON t_p32599880_plugin_site_developm.tron_seen_transactions(wallet_address, block_timestamp) WHERE payment_id IS NULL;
+
+-- Курсор опроса TronGrid по адресу: время блока последнего полученного перевода, мс
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.tron_wallet_cursors (
+    wallet_address VARCHAR(255) PRIMARY KEY,
+    last_block_timestamp BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Уже зачтённые переводы не должны сопоставляться повторно
+INSERT INTO t_p32599880_plugin_site_developm.tron_seen_transactions
+    (transaction_id, wallet_address, amount, block_timestamp, payment_id, seen_at)
+SELECT DISTINCT ON (tx_hash)
+    tx_hash, wallet_address, amount,
+    (EXTRACT(EPOCH FROM COALESCE(confirmed_at, created_at)) * 1000)::BIGINT,
+    id, COALESCE(confirmed_at, created_at)
+FROM t_p32599880_plugin_site_developm.crypto_payments
+WHERE tx_hash IS NOT NULL
+ORDER BY tx_hash, id
+ON CONFLICT (transaction_id) DO NOTHING;
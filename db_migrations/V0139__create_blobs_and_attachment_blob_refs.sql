@@ -0,0 +1,18 @@
+-- Метаданные контентно-адресуемого хранилища файлов: сами байты лежат в
+-- BLOB_STORE (файловая система или S3) под ключом SHA-256
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Вложения ссылаются на файл в хранилище; file_data остаётся только у ещё
+-- не перенесённых строк (upload-attachment/migrate_attachments.py)
+ALTER TABLE t_p32599880_plugin_site_developm.forum_attachments
+    ADD COLUMN IF NOT EXISTS blob_sha256 CHAR(64);
+
+ALTER TABLE t_p32599880_plugin_site_developm.forum_attachments
+    ALTER COLUMN file_data DROP NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_forum_attachments_not_migrated
+ON t_p32599880_plugin_site_developm.forum_attachments(id) WHERE blob_sha256 IS NULL;
@@ -0,0 +1,12 @@
+-- Уменьшенные копии картинок из blob_store: оригинал + ширина + формат -> копия.
+-- derivative_sha256 = source_sha256, если оригинал не нужно уменьшать
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.blob_derivatives (
+    source_sha256 CHAR(64) NOT NULL,
+    width INTEGER NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    derivative_sha256 CHAR(64) NOT NULL,
+    size BIGINT NOT NULL,
+    content_type VARCHAR(100) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_sha256, width, format)
+);
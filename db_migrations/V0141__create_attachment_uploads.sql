@@ -0,0 +1,25 @@
+-- Загрузка вложений частями (upload-attachment action=init/append/complete):
+-- сами части лежат в blob_store под uploads/<id>/<n>, здесь - только учёт
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.attachment_uploads (
+    id CHAR(32) PRIMARY KEY,
+    filename TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    total_size INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    received_size INTEGER NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'uploading',
+    attachment_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.attachment_upload_chunks (
+    upload_id CHAR(32) NOT NULL REFERENCES t_p32599880_plugin_site_developm.attachment_uploads(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (upload_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_attachment_uploads_expires_at
+ON t_p32599880_plugin_site_developm.attachment_uploads(expires_at) WHERE status = 'uploading';
@@ -0,0 +1,15 @@
+-- Фото верификации хранятся в blob_store; в заявке - только ключ и тип файла.
+-- passport_photo / selfie_photo остаются у ещё не перенесённых заявок
+-- (user-verification/migrate_verification_photos.py)
+ALTER TABLE t_p32599880_plugin_site_developm.verification_requests
+    ADD COLUMN IF NOT EXISTS passport_blob_sha256 CHAR(64),
+    ADD COLUMN IF NOT EXISTS passport_content_type VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS selfie_blob_sha256 CHAR(64),
+    ADD COLUMN IF NOT EXISTS selfie_content_type VARCHAR(100);
+
+ALTER TABLE t_p32599880_plugin_site_developm.verification_requests
+    ALTER COLUMN passport_photo DROP NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_verification_requests_not_migrated
+ON t_p32599880_plugin_site_developm.verification_requests(id)
+WHERE passport_photo IS NOT NULL OR selfie_photo IS NOT NULL;
@@ -0,0 +1,13 @@
+-- Общее состояние rate limiter для всех контейнеров (GCRA): на ключ
+-- «класс лимита:клиент» хранится одно число - теоретическое время прихода
+-- следующего запроса (TAT, секунды Unix). UNLOGGED: состояние не пишется
+-- в WAL и теряется при аварийном рестарте - для счётчиков лимитов это допустимо.
+-- Индексов кроме первичного ключа нет, а fillfactor оставляет место на
+-- странице, чтобы частые UPDATE одной строки оставались HOT.
+CREATE UNLOGGED TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.rate_limit_state (
+    key VARCHAR(255) PRIMARY KEY,
+    tat DOUBLE PRECISION NOT NULL
+) WITH (fillfactor = 70);
+
+COMMENT ON TABLE t_p32599880_plugin_site_developm.rate_limit_state IS 'Состояние rate limiter (GCRA), общее для всех экземпляров функций';
+COMMENT ON COLUMN t_p32599880_plugin_site_developm.rate_limit_state.tat IS 'Теоретическое время прихода следующего запроса, секунды Unix; строка с tat в прошлом эквивалентна отсутствующей';
@@ -0,0 +1,10 @@
+-- Аватары в blob_store: avatar_sha256 - SHA-256 загруженного оригинала,
+-- квадратные копии фиксированных размеров лежат в blob_derivatives
+-- (format = 'avatar', width = сторона в пикселях). В avatar_url вместо
+-- base64 хранится короткий адрес /api/file?avatar=<sha256>: он меняется
+-- вместе с картинкой, поэтому кэшируется без срока. Старые base64 значения
+-- переносит auth-new/migrate_avatars.py.
+ALTER TABLE t_p32599880_plugin_site_developm.users
+    ADD COLUMN IF NOT EXISTS avatar_sha256 CHAR(64);
+
+COMMENT ON COLUMN t_p32599880_plugin_site_developm.users.avatar_sha256 IS 'SHA-256 оригинала аватара в blob_store (копии - blob_derivatives, format avatar)';
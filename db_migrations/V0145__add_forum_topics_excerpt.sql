@@ -0,0 +1,37 @@
+-- Превью темы для списка: текст без HTML-тегов и лишних пробелов, не длиннее
+-- 300 символов, и полная длина content. Список тем отдаёт только превью,
+-- полный текст - запрос темы по topic_id. Колонки поддерживает триггер на
+-- любое изменение content.
+ALTER TABLE t_p32599880_plugin_site_developm.forum_topics
+ADD COLUMN IF NOT EXISTS excerpt VARCHAR(300);
+
+ALTER TABLE t_p32599880_plugin_site_developm.forum_topics
+ADD COLUMN IF NOT EXISTS content_length INTEGER;
+
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.forum_topic_excerpt(content TEXT)
+RETURNS VARCHAR AS $$
+    SELECT left(btrim(regexp_replace(regexp_replace(COALESCE(content, ''), '<[^>]*>', ' ', 'g'), '\s+', ' ', 'g')), 300)
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.forum_topics_excerpt_update()
+RETURNS trigger AS $$
+BEGIN
+    NEW.excerpt := t_p32599880_plugin_site_developm.forum_topic_excerpt(NEW.content);
+    NEW.content_length := char_length(COALESCE(NEW.content, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_forum_topics_excerpt ON t_p32599880_plugin_site_developm.forum_topics;
+CREATE TRIGGER trg_forum_topics_excerpt
+BEFORE INSERT OR UPDATE OF content ON t_p32599880_plugin_site_developm.forum_topics
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.forum_topics_excerpt_update();
+
+-- Backfill без UPDATE OF content: триггер поискового индекса не пересчитывается
+UPDATE t_p32599880_plugin_site_developm.forum_topics
+SET excerpt = t_p32599880_plugin_site_developm.forum_topic_excerpt(content),
+    content_length = char_length(COALESCE(content, ''))
+WHERE excerpt IS NULL;
+
+COMMENT ON COLUMN t_p32599880_plugin_site_developm.forum_topics.excerpt IS 'Превью текста темы для списка (триггер trg_forum_topics_excerpt)';
+COMMENT ON COLUMN t_p32599880_plugin_site_developm.forum_topics.content_length IS 'Длина content в символах';
@@ -0,0 +1,152 @@
+-- Счётчики непрочитанного для значков: одна строка на пользователя вместо
+-- COUNT(*) по notifications и messages на каждый опрос. Счётчики ведут
+-- statement-триггеры с transition tables на вставку, изменение и удаление,
+-- поэтому они точны для любого пути записи (notifications, withdrawal,
+-- crypto, forum, deals, admin, outbox) и одна массовая операция (mark_all_read,
+-- clear_all_notifications) меняет счётчик одним запросом. Расхождения
+-- исправляет сверка user_counters.reconcile_counters функции notifications.
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.user_counters (
+    user_id INTEGER PRIMARY KEY,
+    unread_notifications INTEGER NOT NULL DEFAULT 0,
+    unread_messages INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE t_p32599880_plugin_site_developm.user_counters IS 'Счётчики непрочитанных уведомлений и сообщений (триггеры trg_*_counters_*)';
+
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.user_counters_notifications()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO t_p32599880_plugin_site_developm.user_counters AS c (user_id, unread_notifications)
+        SELECT user_id, COUNT(*) FROM new_rows
+        WHERE is_read = FALSE AND user_id IS NOT NULL
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET unread_notifications = c.unread_notifications + EXCLUDED.unread_notifications,
+            updated_at = NOW();
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE t_p32599880_plugin_site_developm.user_counters c
+        SET unread_notifications = GREATEST(c.unread_notifications + d.delta, 0),
+            updated_at = NOW()
+        FROM (
+            SELECT user_id, SUM(delta) AS delta FROM (
+                SELECT user_id, 1 AS delta FROM new_rows WHERE is_read = FALSE
+                UNION ALL
+                SELECT user_id, -1 FROM old_rows WHERE is_read = FALSE
+            ) changes
+            GROUP BY user_id
+            HAVING SUM(delta) <> 0
+        ) d
+        WHERE c.user_id = d.user_id;
+    ELSE
+        UPDATE t_p32599880_plugin_site_developm.user_counters c
+        SET unread_notifications = GREATEST(c.unread_notifications - d.cnt, 0),
+            updated_at = NOW()
+        FROM (
+            SELECT user_id, COUNT(*) AS cnt FROM old_rows
+            WHERE is_read = FALSE
+            GROUP BY user_id
+        ) d
+        WHERE c.user_id = d.user_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.user_counters_messages()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO t_p32599880_plugin_site_developm.user_counters AS c (user_id, unread_messages)
+        SELECT to_user_id, COUNT(*) FROM new_rows
+        WHERE is_read = FALSE AND to_user_id IS NOT NULL
+        GROUP BY to_user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET unread_messages = c.unread_messages + EXCLUDED.unread_messages,
+            updated_at = NOW();
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE t_p32599880_plugin_site_developm.user_counters c
+        SET unread_messages = GREATEST(c.unread_messages + d.delta, 0),
+            updated_at = NOW()
+        FROM (
+            SELECT to_user_id, SUM(delta) AS delta FROM (
+                SELECT to_user_id, 1 AS delta FROM new_rows WHERE is_read = FALSE
+                UNION ALL
+                SELECT to_user_id, -1 FROM old_rows WHERE is_read = FALSE
+            ) changes
+            GROUP BY to_user_id
+            HAVING SUM(delta) <> 0
+        ) d
+        WHERE c.user_id = d.to_user_id;
+    ELSE
+        UPDATE t_p32599880_plugin_site_developm.user_counters c
+        SET unread_messages = GREATEST(c.unread_messages - d.cnt, 0),
+            updated_at = NOW()
+        FROM (
+            SELECT to_user_id, COUNT(*) AS cnt FROM old_rows
+            WHERE is_read = FALSE
+            GROUP BY to_user_id
+        ) d
+        WHERE c.user_id = d.to_user_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Transition tables допускают только одно событие на триггер
+DROP TRIGGER IF EXISTS trg_notifications_counters_insert ON t_p32599880_plugin_site_developm.notifications;
+CREATE TRIGGER trg_notifications_counters_insert
+AFTER INSERT ON t_p32599880_plugin_site_developm.notifications
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p32599880_plugin_site_developm.user_counters_notifications();
+
+DROP TRIGGER IF EXISTS trg_notifications_counters_update ON t_p32599880_plugin_site_developm.notifications;
+CREATE TRIGGER trg_notifications_counters_update
+AFTER UPDATE ON t_p32599880_plugin_site_developm.notifications
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p32599880_plugin_site_developm.user_counters_notifications();
+
+DROP TRIGGER IF EXISTS trg_notifications_counters_delete ON t_p32599880_plugin_site_developm.notifications;
+CREATE TRIGGER trg_notifications_counters_delete
+AFTER DELETE ON t_p32599880_plugin_site_developm.notifications
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p32599880_plugin_site_developm.user_counters_notifications();
+
+DROP TRIGGER IF EXISTS trg_messages_counters_insert ON t_p32599880_plugin_site_developm.messages;
+CREATE TRIGGER trg_messages_counters_insert
+AFTER INSERT ON t_p32599880_plugin_site_developm.messages
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p32599880_plugin_site_developm.user_counters_messages();
+
+DROP TRIGGER IF EXISTS trg_messages_counters_update ON t_p32599880_plugin_site_developm.messages;
+CREATE TRIGGER trg_messages_counters_update
+AFTER UPDATE ON t_p32599880_plugin_site_developm.messages
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p32599880_plugin_site_developm.user_counters_messages();
+
+DROP TRIGGER IF EXISTS trg_messages_counters_delete ON t_p32599880_plugin_site_developm.messages;
+CREATE TRIGGER trg_messages_counters_delete
+AFTER DELETE ON t_p32599880_plugin_site_developm.messages
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p32599880_plugin_site_developm.user_counters_messages();
+
+-- Начальные значения; триггеры уже созданы и держат блокировку таблиц до
+-- конца миграции, поэтому параллельные записи не теряются
+INSERT INTO t_p32599880_plugin_site_developm.user_counters AS c (user_id, unread_notifications, unread_messages)
+SELECT user_id, SUM(unread_notifications), SUM(unread_messages) FROM (
+    SELECT user_id, COUNT(*) AS unread_notifications, 0 AS unread_messages
+    FROM t_p32599880_plugin_site_developm.notifications
+    WHERE is_read = FALSE AND user_id IS NOT NULL
+    GROUP BY user_id
+    UNION ALL
+    SELECT to_user_id, 0, COUNT(*)
+    FROM t_p32599880_plugin_site_developm.messages
+    WHERE is_read = FALSE AND to_user_id IS NOT NULL
+    GROUP BY to_user_id
+) unread
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE
+SET unread_notifications = EXCLUDED.unread_notifications,
+    unread_messages = EXCLUDED.unread_messages,
+    updated_at = NOW();
@@ -0,0 +1,12 @@
+-- Присутствие пользователей: время последнего запроса пишется сюда, а не в
+-- горячую строку users (там же балансы). UNLOGGED: без WAL, после аварийного
+-- рестарта таблица пуста, и значки «в сети» восстанавливаются со следующими
+-- запросами. В users.last_seen_at время переносится пачками
+-- (presence.flush_presence функции notifications). Индексов кроме первичного
+-- ключа нет, fillfactor оставляет место для HOT-обновлений.
+CREATE UNLOGGED TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.user_presence (
+    user_id INTEGER PRIMARY KEY,
+    last_seen_at TIMESTAMP NOT NULL
+) WITH (fillfactor = 70);
+
+COMMENT ON TABLE t_p32599880_plugin_site_developm.user_presence IS 'Последняя активность пользователей, переносится в users.last_seen_at пачками';
@@ -0,0 +1,57 @@
+-- События для push-шлюза (notifications/realtime_gateway.py): после вставки
+-- в notifications, messages, deal_messages, ticket_messages и после изменения
+-- user_counters в канал realtime_events уходит NOTIFY. В payload только
+-- имя таблицы и колонки из аргументов триггера (id и ключи маршрутизации),
+-- без текста строки: размер NOTIFY ограничен 8000 байт, а строку шлюз
+-- читает сам, и только если на неё есть подписчики. NOTIFY доставляется
+-- при фиксации транзакции, откаченные вставки шлюз не видит.
+CREATE OR REPLACE FUNCTION t_p32599880_plugin_site_developm.realtime_notify()
+RETURNS trigger AS $$
+DECLARE
+    row_data JSONB := to_jsonb(NEW);
+    payload JSONB := jsonb_build_object('t', TG_TABLE_NAME);
+    col TEXT;
+BEGIN
+    FOREACH col IN ARRAY TG_ARGV LOOP
+        payload := payload || jsonb_build_object(col, row_data -> col);
+    END LOOP;
+    PERFORM pg_notify('realtime_events', payload::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notifications_realtime ON t_p32599880_plugin_site_developm.notifications;
+CREATE TRIGGER trg_notifications_realtime
+AFTER INSERT ON t_p32599880_plugin_site_developm.notifications
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.realtime_notify('id', 'user_id');
+
+DROP TRIGGER IF EXISTS trg_messages_realtime ON t_p32599880_plugin_site_developm.messages;
+CREATE TRIGGER trg_messages_realtime
+AFTER INSERT ON t_p32599880_plugin_site_developm.messages
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.realtime_notify('id', 'from_user_id', 'to_user_id');
+
+DROP TRIGGER IF EXISTS trg_deal_messages_realtime ON t_p32599880_plugin_site_developm.deal_messages;
+CREATE TRIGGER trg_deal_messages_realtime
+AFTER INSERT ON t_p32599880_plugin_site_developm.deal_messages
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.realtime_notify('id', 'deal_id');
+
+DROP TRIGGER IF EXISTS trg_ticket_messages_realtime ON t_p32599880_plugin_site_developm.ticket_messages;
+CREATE TRIGGER trg_ticket_messages_realtime
+AFTER INSERT ON t_p32599880_plugin_site_developm.ticket_messages
+FOR EACH ROW EXECUTE FUNCTION t_p32599880_plugin_site_developm.realtime_notify('id', 'ticket_id');
+
+-- Значения счётчиков помещаются в payload целиком, шлюзу не нужен запрос
+DROP TRIGGER IF EXISTS trg_user_counters_realtime_insert ON t_p32599880_plugin_site_developm.user_counters;
+CREATE TRIGGER trg_user_counters_realtime_insert
+AFTER INSERT ON t_p32599880_plugin_site_developm.user_counters
+FOR EACH ROW
+WHEN (NEW.unread_notifications > 0 OR NEW.unread_messages > 0)
+EXECUTE FUNCTION t_p32599880_plugin_site_developm.realtime_notify('user_id', 'unread_notifications', 'unread_messages');
+
+DROP TRIGGER IF EXISTS trg_user_counters_realtime_update ON t_p32599880_plugin_site_developm.user_counters;
+CREATE TRIGGER trg_user_counters_realtime_update
+AFTER UPDATE ON t_p32599880_plugin_site_developm.user_counters
+FOR EACH ROW
+WHEN (OLD.unread_notifications IS DISTINCT FROM NEW.unread_notifications
+      OR OLD.unread_messages IS DISTINCT FROM NEW.unread_messages)
+EXECUTE FUNCTION t_p32599880_plugin_site_developm.realtime_notify('user_id', 'unread_notifications', 'unread_messages');
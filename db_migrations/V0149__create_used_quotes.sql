@@ -0,0 +1,15 @@
+-- Использованные котировки обмена (auth-new/exchange_quotes.py): nonce
+-- котировки записывается в той же транзакции, что и сама сделка, поэтому
+-- одну подписанную котировку нельзя провести дважды. Строки нужны только
+-- до истечения котировки и удаляются при следующих обменах.
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.used_quotes (
+    nonce VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    used_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_used_quotes_expires_at
+ON t_p32599880_plugin_site_developm.used_quotes (expires_at);
+
+COMMENT ON TABLE t_p32599880_plugin_site_developm.used_quotes IS 'Nonce проведённых котировок обмена, хранятся до истечения котировки';
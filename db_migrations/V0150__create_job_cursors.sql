@@ -0,0 +1,10 @@
+-- Курсоры пакетных задач, вызываемых по расписанию через HTTP
+-- (notifications/scheduled_jobs.py): за вызов обрабатывается одна пачка,
+-- следующий вызов продолжает после last_id.
+CREATE TABLE IF NOT EXISTS t_p32599880_plugin_site_developm.job_cursors (
+    name VARCHAR(64) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE t_p32599880_plugin_site_developm.job_cursors IS 'Позиция пакетных задач по расписанию: id последней обработанной строки';
@@ -0,0 +1,152 @@
+'''
+Бенчмарк поиска по форуму: tsvector + GIN (action=search) против ILIKE-сканирования
+Создаёт отдельную схему forum_search_bench, заполняет её синтетическими темами
+(фоновые слова с распределением, близким к Zipf, плюс редкие предметные слова
+на русском и английском), строит search_vector так же, как триггер V0136,
+и замеряет медиану времени одинаковых запросов обоими способами.
+
+Запуск:
+    DATABASE_URL=postgresql://... python3 scripts/benchmark_forum_search.py 100000 1000000
+
+Схема удаляется после прогона (--keep чтобы оставить).
+'''
+
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+import psycopg2
+
+BENCH_SCHEMA = 'forum_search_bench'
+PAGE_SIZE = 20
+REPEATS = 5
+
+WORDS_RU = [
+    'биткоин', 'кошелек', 'контракт', 'биржа', 'перевод', 'комиссия', 'токен', 'майнинг',
+    'блокчейн', 'безопасность', 'вывод', 'пополнение', 'сделка', 'гарант', 'обмен', 'курс',
+    'стейкинг', 'аудит', 'ликвидность', 'пул', 'адрес', 'транзакция', 'подтверждение', 'сеть'
+]
+WORDS_EN = [
+    'bitcoin', 'wallet', 'contract', 'exchange', 'transfer', 'fee', 'token', 'mining',
+    'blockchain', 'security', 'withdrawal', 'deposit', 'deal', 'escrow', 'swap', 'rate',
+    'staking', 'audit', 'liquidity', 'pool', 'address', 'transaction', 'confirmation', 'network'
+]
+
+# Доля слов текста, заменяемых предметным словом (остальное - фоновый словарь)
+KEYWORD_RATE = 0.004
+FILLER_VOCABULARY = 20000
+
+QUERIES = ['биткоин', 'контракт', 'staking', 'биткоин кошелек', 'escrow audit', 'несуществующее']
+
+FTS_SQL = f"""
+    WITH q AS (
+        SELECT (websearch_to_tsquery('russian', %s) || websearch_to_tsquery('english', %s)) AS query
+    )
+    SELECT t.id, ts_rank(t.search_vector, q.query) AS rank
+    FROM {BENCH_SCHEMA}.forum_topics t, q
+    WHERE t.search_vector @@ q.query
+    ORDER BY rank DESC, t.id DESC
+    LIMIT {PAGE_SIZE}
+"""
+
+
+def ilike_sql(words: List[str]) -> str:
+    conditions = ' AND '.join('(t.title ILIKE %s OR t.content ILIKE %s)' for _ in words)
+    return f"""
+        SELECT t.id
+        FROM {BENCH_SCHEMA}.forum_topics t
+        WHERE {conditions}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT {PAGE_SIZE}
+    """
+
+
+def populate(cur, rows: int):
+    cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    cur.execute(f"""
+        CREATE TABLE {BENCH_SCHEMA}.forum_topics (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR(300) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            search_vector tsvector
+        )
+    """)
+    cur.execute(f"""
+        INSERT INTO {BENCH_SCHEMA}.forum_topics (title, content, created_at)
+        SELECT
+            array_to_string(ARRAY(
+                SELECT CASE WHEN random() < %(rate)s * 10
+                    THEN w[1 + floor(random() * array_length(w, 1))::int]
+                    ELSE 'w' || floor(power(random(), 3) * %(vocabulary)s)::int END
+                FROM generate_series(1, 4 + g %% 3)
+            ), ' '),
+            array_to_string(ARRAY(
+                SELECT CASE WHEN random() < %(rate)s
+                    THEN w[1 + floor(random() * array_length(w, 1))::int]
+                    ELSE 'w' || floor(power(random(), 3) * %(vocabulary)s)::int END
+                FROM generate_series(1, 60 + g %% 40)
+            ), ' '),
+            NOW() - (g || ' minutes')::interval
+        FROM generate_series(1, %(rows)s) AS g, (SELECT %(words)s::text[] AS w) words
+    """, {'rate': KEYWORD_RATE, 'vocabulary': FILLER_VOCABULARY, 'rows': rows, 'words': WORDS_RU + WORDS_EN})
+    cur.execute(f"""
+        UPDATE {BENCH_SCHEMA}.forum_topics SET search_vector =
+            setweight(to_tsvector('russian', title), 'A') ||
+            setweight(to_tsvector('english', title), 'A') ||
+            setweight(to_tsvector('russian', content), 'B') ||
+            setweight(to_tsvector('english', content), 'B')
+    """)
+    cur.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.forum_topics USING GIN(search_vector)")
+    cur.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.forum_topics(created_at DESC, id DESC)")
+    cur.execute(f"ANALYZE {BENCH_SCHEMA}.forum_topics")
+
+
+def timed(cur, sql: str, params) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(cur, rows: int):
+    started = time.perf_counter()
+    populate(cur, rows)
+    print(f"\n{rows} тем, подготовка {time.perf_counter() - started:.1f} с")
+    print(f"{'запрос':<24}{'tsvector+GIN, мс':>18}{'ILIKE, мс':>14}{'ускорение':>12}")
+
+    for query in QUERIES:
+        words = query.split()
+        fts_ms = timed(cur, FTS_SQL, (query, query))
+        ilike_params = []
+        for word in words:
+            ilike_params.extend([f'%{word}%', f'%{word}%'])
+        ilike_ms = timed(cur, ilike_sql(words), ilike_params)
+        print(f"{query:<24}{fts_ms:>18.2f}{ilike_ms:>14.2f}{ilike_ms / fts_ms:>11.1f}x")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    sizes = [int(a) for a in args] or [100000, 1000000]
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        for rows in sizes:
+            run(cur, rows)
+    finally:
+        if '--keep' not in sys.argv:
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
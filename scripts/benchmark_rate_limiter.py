@@ -0,0 +1,89 @@
+'''
+Бенчмарк rate limiter (backend/rate-limiter/rate_limit.py): пропускная способность
+check_rate_limit при разном числе различных клиентов. GCRA хранит одно число
+на клиента, поэтому время проверки не должно расти с числом клиентов.
+Клиенты выбираются случайно (равномерно) из пула заданного размера, часть
+запросов превышает лимит - проверяются обе ветки.
+
+Запуск:
+    python3 scripts/benchmark_rate_limiter.py 1000 10000 100000 1000000
+    DATABASE_URL=postgresql://... python3 scripts/benchmark_rate_limiter.py --postgres 1000 10000
+
+Для PostgreSQL нужна таблица rate_limit_state (V0143); ключи бенчмарка
+имеют префикс bench- и удаляются после прогона.
+'''
+
+import os
+import random
+import statistics
+import sys
+import time
+
+CHECKS_PER_RUN = 200000
+POSTGRES_CHECKS_PER_RUN = 5000
+THREADS_NOTE = 'один поток'
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'rate-limiter'))
+
+
+def run(rate_limit, clients: int, checks: int) -> None:
+    rng = random.Random(clients)
+    keys = [f'bench-{i}' for i in range(clients)]
+    rate_limit.reset_rate_limits()
+
+    # Прогрев: каждый клиент хотя бы раз попадает в хранилище
+    for key in keys[:min(clients, checks)]:
+        rate_limit.check_rate_limit(key, 'forum')
+
+    latencies = []
+    denied = 0
+    started = time.perf_counter()
+    for _ in range(checks):
+        key = keys[rng.randrange(clients)]
+        t0 = time.perf_counter()
+        result = rate_limit.check_rate_limit(key, 'forum')
+        latencies.append(time.perf_counter() - t0)
+        denied += not result['allowed']
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f'{clients:>9} клиентов: {checks / elapsed:>10.0f} проверок/с, '
+          f'медиана {statistics.median(latencies) * 1e6:7.1f} мкс, p99 {p99 * 1e6:7.1f} мкс, '
+          f'отказов {denied / checks:6.1%}, ключей в памяти {rate_limit.get_limiter_stats()["memory_keys"]}')
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    use_postgres = '--postgres' in args
+    sizes = [int(a) for a in args if not a.startswith('--')] or [1000, 10000, 100000]
+
+    if use_postgres:
+        if not os.environ.get('DATABASE_URL'):
+            sys.exit('DATABASE_URL не задан')
+        os.environ['RATE_LIMIT_BACKEND'] = 'postgres'
+    else:
+        os.environ['RATE_LIMIT_BACKEND'] = 'memory'
+        os.environ.setdefault('RATE_LIMIT_MAX_KEYS', str(max(sizes) * 2))
+
+    import rate_limit
+    checks = POSTGRES_CHECKS_PER_RUN if use_postgres else CHECKS_PER_RUN
+    print(f'Хранилище: {rate_limit.RATE_LIMIT_BACKEND}, {checks} проверок на прогон, {THREADS_NOTE}')
+
+    try:
+        for clients in sizes:
+            run(rate_limit, clients, checks)
+    finally:
+        if use_postgres:
+            from db_pool import get_db_connection
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM rate_limit_state WHERE key LIKE 'forum:bench-%%'")
+                conn.commit()
+            finally:
+                conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+'''
+Локальный mock Telegram Bot API для проверки telegram-notify
+Mock принимает sendMessage и держит собственный лимит на чат
+(MOCK_RATE_PER_SEC, ёмкость MOCK_BURST). При превышении отвечает 429 с
+parameters.retry_after, как настоящий Bot API. Скрипт направляет
+telegram-notify на mock (TELEGRAM_API_BASE), отправляет всплеск событий
+одним батчем и печатает счётчики отправителя и mock.
+
+Запуск:
+    python3 scripts/mock_telegram_bot_api.py 200          # всплеск из 200 событий
+    python3 scripts/mock_telegram_bot_api.py --serve 8081 # только mock на порту 8081
+'''
+
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_RATE_PER_SEC = 1.0
+MOCK_BURST = 3.0
+MOCK_TOKEN = 'mock-token'
+MOCK_CHAT_ID = '1000'
+
+TELEGRAM_NOTIFY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'telegram-notify')
+
+
+class MockState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = MOCK_BURST
+        self.updated = time.monotonic()
+        self.messages = []
+        self.rejected = 0
+
+    def accept(self) -> float:
+        """0 - сообщение принято, иначе retry_after в секундах"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(MOCK_BURST, self.tokens + (now - self.updated) * MOCK_RATE_PER_SEC)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            self.rejected += 1
+            return max(1.0, (1 - self.tokens) / MOCK_RATE_PER_SEC)
+
+
+def make_handler(state: MockState):
+    class BotApiHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not self.path.endswith(f'/bot{MOCK_TOKEN}/sendMessage'):
+                self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                return
+            retry_after = state.accept()
+            if retry_after:
+                self._reply(429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f'Too Many Requests: retry after {int(retry_after)}',
+                    'parameters': {'retry_after': int(retry_after)}
+                })
+                return
+            with state.lock:
+                state.messages.append(payload.get('text', ''))
+            self._reply(200, {'ok': True, 'result': {'message_id': len(state.messages)}})
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return BotApiHandler
+
+
+def load_telegram_notify():
+    sys.path.insert(0, TELEGRAM_NOTIFY_DIR)
+    spec = importlib.util.spec_from_file_location('telegram_notify_index', os.path.join(TELEGRAM_NOTIFY_DIR, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_burst(port: int, events_count: int):
+    os.environ['TELEGRAM_API_BASE'] = f'http://127.0.0.1:{port}'
+    os.environ['TELEGRAM_BOT_TOKEN'] = MOCK_TOKEN
+    os.environ['TELEGRAM_ADMIN_CHAT_ID'] = MOCK_CHAT_ID
+    telegram_notify = load_telegram_notify()
+
+    started_at = datetime.now()
+    events = [{
+        'id': i,
+        'event_type': 'withdrawal_request' if i % 2 else 'balance_topup',
+        'user_info': {'username': f'user{i}', 'user_id': i},
+        'details': {'amount': 10 + i, 'wallet': f'TWallet{i}'},
+        'created_at': (started_at + timedelta(seconds=i * 0.5)).isoformat()
+    } for i in range(events_count)]
+
+    started = time.perf_counter()
+    response = telegram_notify.handler({'httpMethod': 'POST', 'body': json.dumps({'events': events})}, None)
+    elapsed = time.perf_counter() - started
+    body = json.loads(response['body'])
+    delivered = sum(1 for r in body['results'] if r['success'])
+    print(f"событий: {events_count}, доставлено: {delivered}, за {elapsed:.1f} с")
+    print(f"счётчики telegram-notify: {body['stats']}")
+    return body
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    state = MockState()
+
+    if '--serve' in sys.argv:
+        port = int(args[0]) if args else 8081
+        print(f'mock Bot API: http://127.0.0.1:{port} (token {MOCK_TOKEN})')
+        ThreadingHTTPServer(('127.0.0.1', port), make_handler(state)).serve_forever()
+        return
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        run_burst(server.server_port, int(args[0]) if args else 200)
+        print(f"mock: принято сообщений {len(state.messages)}, отклонено 429: {state.rejected}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ import AdminTokenBalanceDialog from '@/components/admin/AdminTokenBalanceDialog'
 import AdminTopicEditDialog from '@/components/admin/AdminTopicEditDialog';
 import { useToast } from '@/hooks/use-toast';
 import { AUTH_URL, FORUM_URL, ADMIN_URL, WITHDRAWAL_URL, CRYPTO_URL, FLASH_USDT_URL, SUPPORT_TICKETS_URL as TICKETS_URL, DEALS_URL } from '@/lib/api-urls';
+import { fetchForumTopicContent } from '@/utils/forumTopicContent';
 
 interface AdminPanelProps {
   currentUser: User;
@@ -405,10 +406,17 @@ const AdminPanel = ({ currentUser, onClose }: AdminPanelProps) => {
     }
   };
 
-  const handleEditTopic = (topic: ForumTopic) => {
+  const handleEditTopic = async (topic: ForumTopic) => {
     setEditingTopic(topic);
     setEditTitle(topic.title);
     setEditContent(topic.content || '');
+    if (topic.content === undefined) {
+      try {
+        setEditContent(await fetchForumTopicContent(FORUM_URL, topic.id));
+      } catch (error) {
+        console.error('Ошибка загрузки текста темы:', error);
+      }
+    }
   };
 
   const handleSaveEdit = async () => {
@@ -8,6 +8,7 @@ import AdminTokenBalanceDialog from '@/components/admin/AdminTokenBalanceDialog'
 import AdminTopicEditDialog from '@/components/admin/AdminTopicEditDialog';
 import { useToast } from '@/hooks/use-toast';
 import { AUTH_URL, FORUM_URL, ADMIN_URL, WITHDRAWAL_URL, CRYPTO_URL } from '@/lib/api-urls';
+import { fetchForumTopicContent } from '@/utils/forumTopicContent';
 
 interface AdminPanelGlassmorphismProps {
   currentUser: User;
@@ -344,10 +345,17 @@ const AdminPanelGlassmorphism = ({ currentUser, onClose }: AdminPanelGlassmorphi
               else if (activeTab === 'tickets') fetchTickets();
               else if (activeTab === 'deals') fetchDeals();
             }}
-            onEditTopic={(topic) => {
+            onEditTopic={async (topic) => {
               setEditingTopic(topic);
               setEditTitle(topic.title);
-              setEditContent(topic.content);
+              setEditContent(topic.content || '');
+              if (topic.content === undefined) {
+                try {
+                  setEditContent(await fetchForumTopicContent(FORUM_URL, topic.id));
+                } catch (error) {
+                  console.error('Ошибка загрузки текста темы:', error);
+                }
+              }
             }}
             onShowBalanceDialog={(action, username) => {
               setBalanceAction(action);
@@ -13,6 +13,7 @@ import { getAvatarGradient } from '@/utils/avatarColors';
 import { useToast } from '@/hooks/use-toast';
 import { triggerUserSync } from '@/utils/userSync';
 import { DealDialogMobile } from '@/components/DealDialogMobile';
+import { subscribeRealtime } from '@/utils/realtime';
 
 const useIsMobile = () => {
   const [isMobile, setIsMobile] = useState(() => {
@@ -50,6 +51,13 @@ const useIsDesktop = () => {
   return isDesktop;
 };
 
+const isUserOnline = (lastSeenAt?: string | null) => {
+  if (!lastSeenAt) return false;
+  const lastSeen = new Date(lastSeenAt);
+  if (isNaN(lastSeen.getTime())) return false;
+  return Date.now() - lastSeen.getTime() < 5 * 60 * 1000;
+};
+
 const DEALS_URL = 'https://functions.poehali.dev/8a665174-b0af-4138-82e0-a9422dbb8fc4';
 
 interface DealsViewProps {
@@ -168,6 +176,28 @@ export const DealsView = ({ user, onShowAuthDialog, onRefreshUserBalance }: Deal
     }
   }, [selectedDeal?.id, fetchDealDetails]);
 
+  // Чат открытой сделки push-событиями; системное сообщение означает смену этапа
+  const isDealParticipant = !!user && !!selectedDeal &&
+    (selectedDeal.seller_id === user.id || selectedDeal.buyer_id === user.id);
+
+  useEffect(() => {
+    if (!user || !selectedDeal || !isDealParticipant) return;
+
+    const dealId = selectedDeal.id;
+    const unsubscribe = subscribeRealtime(user.id, [`deal:${dealId}`], {
+      deal_message: (message) => {
+        if (message.is_system) {
+          fetchDealDetails(dealId);
+          return;
+        }
+        setDealMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+      },
+      resync: () => fetchDealDetails(dealId)
+    });
+
+    return () => unsubscribe?.();
+  }, [selectedDeal?.id, isDealParticipant, user?.id, fetchDealDetails]);
+
   const createDeal = async () => {
     if (!user) {
       onShowAuthDialog();
@@ -655,12 +685,17 @@ export const DealsView = ({ user, onShowAuthDialog, onRefreshUserBalance }: Deal
 
                 <div className="flex items-center justify-between pt-3 border-t border-border/50">
                   <div className="flex items-center gap-2">
-                    <Avatar className="w-8 h-8">
-                      <AvatarImage src={deal.seller_avatar} />
-                      <AvatarFallback className={`bg-gradient-to-br ${getAvatarGradient(deal.seller_name || '')} text-white text-xs`}>
-                        {deal.seller_name?.[0].toUpperCase()}
-                      </AvatarFallback>
-                    </Avatar>
+                    <div className="relative flex-shrink-0">
+                      <Avatar className="w-8 h-8">
+                        <AvatarImage src={deal.seller_avatar} />
+                        <AvatarFallback className={`bg-gradient-to-br ${getAvatarGradient(deal.seller_name || '')} text-white text-xs`}>
+                          {deal.seller_name?.[0].toUpperCase()}
+                        </AvatarFallback>
+                      </Avatar>
+                      {isUserOnline(deal.seller_last_seen) && (
+                        <div className="absolute -bottom-0.5 -right-0.5 w-2.5 h-2.5 bg-emerald-500 rounded-full border border-zinc-900"></div>
+                      )}
+                    </div>
                     <div className="text-xs">
                       <p className="font-medium">{deal.seller_name}</p>
                       <p className="text-muted-foreground">Продавец</p>
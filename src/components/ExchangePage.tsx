@@ -82,6 +82,7 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
   const [confirmAction, setConfirmAction] = useState<'buy' | 'sell' | null>(null);
   const [priceUpdateTimer, setPriceUpdateTimer] = useState(60);
   const [priceLoadTime, setPriceLoadTime] = useState<Date | null>(null);
+  const [quoteId, setQuoteId] = useState<string | null>(null);
   const [activeTab, setActiveTab] = useState<'buy' | 'sell' | 'withdraw'>('buy');
   
   const [priceHistory, setPriceHistory] = useState<Array<{time: string, price: number}>>([]);
@@ -138,8 +139,8 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
         const remaining = Math.max(0, 60 - elapsed);
         setPriceUpdateTimer(remaining);
         
-        if (remaining === 0) {
-          loadPrices();
+        if (remaining === 0 && confirmAction) {
+          loadQuote(confirmAction);
         }
       }, 1000);
 
@@ -186,6 +187,50 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
     }
   };
 
+  const loadQuote = async (side: 'buy' | 'sell'): Promise<boolean> => {
+    try {
+      const response = await fetch(AUTH_URL, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-User-Id': user.id.toString()
+        },
+        body: JSON.stringify({
+          action: 'get_quote',
+          crypto_symbol: selectedCrypto,
+          side
+        })
+      });
+      const data = await response.json();
+
+      if (data.success) {
+        setQuoteId(data.quote_id);
+        if (side === 'buy') {
+          setBuyPrices(prev => ({ ...prev, [selectedCrypto]: data.price }));
+        } else {
+          setSellPrices(prev => ({ ...prev, [selectedCrypto]: data.price }));
+        }
+        setPriceLoadTime(new Date());
+        setPriceUpdateTimer(60);
+        return true;
+      }
+
+      toast({
+        title: 'Ошибка',
+        description: data.error || 'Не удалось получить курс',
+        variant: 'destructive'
+      });
+    } catch (error) {
+      console.error('Ошибка получения котировки:', error);
+      toast({
+        title: 'Ошибка',
+        description: 'Ошибка подключения к серверу',
+        variant: 'destructive'
+      });
+    }
+    return false;
+  };
+
   const loadBalances = async () => {
     try {
       const response = await fetch(AUTH_URL, {
@@ -323,7 +368,7 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
       return;
     }
 
-    await loadPrices();
+    if (!(await loadQuote('buy'))) return;
     setConfirmAction('buy');
     setShowConfirmDialog(true);
   };
@@ -343,8 +388,7 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
         body: JSON.stringify({
           action: 'exchange_usdt_to_crypto',
           usdt_amount: usdt,
-          crypto_symbol: selectedCrypto,
-          crypto_price: buyPrices[selectedCrypto]
+          quote_id: quoteId
         })
       });
 
@@ -414,7 +458,7 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
       return;
     }
 
-    await loadPrices();
+    if (!(await loadQuote('sell'))) return;
     setConfirmAction('sell');
     setShowConfirmDialog(true);
   };
@@ -434,8 +478,7 @@ const ExchangePage = ({ user, onRefreshUserBalance }: ExchangePageProps) => {
         body: JSON.stringify({
           action: 'exchange_crypto_to_usdt',
           crypto_amount: crypto,
-          crypto_symbol: selectedCrypto,
-          crypto_price: sellPrices[selectedCrypto]
+          quote_id: quoteId
         })
       });
 
@@ -8,6 +8,7 @@ import { Avatar, AvatarFallback, AvatarImage } from '@/components/ui/avatar';
 import { ForumTopic, ForumComment, User } from '@/types';
 import { useState, useRef } from 'react';
 import { getAvatarGradient } from '@/utils/avatarColors';
+import { uploadFileInChunks } from '@/utils/chunkedUpload';
 
 interface ForumTopicDetailProps {
   selectedTopic: ForumTopic;
@@ -20,6 +21,10 @@ interface ForumTopicDetailProps {
   onUserClick: (userId: number) => void;
 }
 
+// Уменьшенная копия вложения-картинки из file-proxy (параметр w)
+const attachmentThumbnailUrl = (url: string, width: number) =>
+  url.includes('?id=') ? `${url}&w=${width}` : url;
+
 const isUserOnline = (lastSeenAt?: string) => {
   if (!lastSeenAt) return false;
   const lastSeen = new Date(lastSeenAt);
@@ -98,67 +103,12 @@ export const ForumTopicDetail = ({
     setUploading(true);
     
     try {
-      const reader = new FileReader();
-      
-      reader.onload = async () => {
-        try {
-          const base64 = reader.result as string;
-          const base64Data = base64.split(',')[1];
-          
-          const response = await fetch('https://functions.poehali.dev/2bef49b4-3b41-4785-8bef-19bfef20ccd7', {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-              file_data: base64Data,
-              filename: file.name,
-              content_type: file.type
-            })
-          });
-          
-          let data;
-          try {
-            data = await response.json();
-          } catch (parseError) {
-            throw new Error(`Ответ сервера не является JSON (статус ${response.status})`);
-          }
-          
-          if (!response.ok) {
-            const errorMsg = data.error || `HTTP ${response.status}`;
-            throw new Error(errorMsg);
-          }
-          
-          if (data.success) {
-            setAttachment({
-              url: data.url,
-              filename: data.filename,
-              size: data.size,
-              type: data.content_type
-            });
-          } else {
-            const errorMsg = data.error || 'Неизвестная ошибка';
-            console.error('Server error:', errorMsg);
-            alert('Ошибка загрузки файла: ' + errorMsg);
-          }
-        } catch (error) {
-          console.error('Upload error:', error);
-          const errorMsg = error instanceof Error ? error.message : 'Сетевая ошибка';
-          alert('Ошибка загрузки файла: ' + errorMsg);
-        } finally {
-          setUploading(false);
-        }
-      };
-      
-      reader.onerror = () => {
-        alert('Ошибка чтения файла');
-        setUploading(false);
-      };
-      
-      reader.readAsDataURL(file);
+      setAttachment(await uploadFileInChunks('https://functions.poehali.dev/2bef49b4-3b41-4785-8bef-19bfef20ccd7', file));
     } catch (error) {
-      console.error('File reader error:', error);
-      alert('Ошибка обработки файла');
+      console.error('Upload error:', error);
+      const errorMsg = error instanceof Error ? error.message : 'Сетевая ошибка';
+      alert('Ошибка загрузки файла: ' + errorMsg);
+    } finally {
       setUploading(false);
     }
   };
@@ -215,7 +165,10 @@ export const ForumTopicDetail = ({
                 {comment.attachment_type?.startsWith('image/') ? (
                   <a href={comment.attachment_url} target="_blank" rel="noopener noreferrer" className="block">
                     <img 
-                      src={comment.attachment_url} 
+                      src={attachmentThumbnailUrl(comment.attachment_url, 640)} 
+                      srcSet={`${attachmentThumbnailUrl(comment.attachment_url, 320)} 320w, ${attachmentThumbnailUrl(comment.attachment_url, 640)} 640w, ${attachmentThumbnailUrl(comment.attachment_url, 1280)} 1280w`}
+                      sizes="(max-width: 640px) 100vw, 640px"
+                      loading="lazy"
                       alt={comment.attachment_filename}
                       className="max-w-full max-h-96 rounded-lg border border-border hover:opacity-90 transition-opacity"
                     />
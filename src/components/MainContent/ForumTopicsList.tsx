@@ -127,7 +127,7 @@ export const ForumTopicsList = ({
     const query = searchQuery.toLowerCase();
     return topics.filter(topic => 
       topic.title.toLowerCase().includes(query) ||
-      topic.content.toLowerCase().includes(query) ||
+      (topic.excerpt ?? topic.content ?? '').toLowerCase().includes(query) ||
       topic.author_name.toLowerCase().includes(query)
     );
   };
@@ -5,6 +5,7 @@ import { Textarea } from '@/components/ui/textarea';
 import Icon from '@/components/ui/icon';
 import { User } from '@/types';
 import { useToast } from '@/hooks/use-toast';
+import { subscribeRealtime } from '@/utils/realtime';
 
 const TICKETS_URL = 'https://functions.poehali.dev/f2a5cbce-6afc-4ef1-91a6-f14075db8567';
 
@@ -74,6 +75,21 @@ const UserTicketsPage = ({ user }: UserTicketsPageProps) => {
     }
   }, [selectedTicket]);
 
+  // Новые сообщения открытого тикета без перезапроса
+  useEffect(() => {
+    if (!selectedTicket) return;
+
+    const ticketId = selectedTicket.id;
+    const unsubscribe = subscribeRealtime(user.id, [`ticket:${ticketId}`], {
+      ticket_message: (message: TicketMessage) => {
+        setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+      },
+      resync: () => loadMessages(ticketId)
+    });
+
+    return () => unsubscribe?.();
+  }, [selectedTicket?.id, user.id]);
+
   const loadTickets = async () => {
     try {
       const response = await fetch(`${TICKETS_URL}?action=user_tickets&user_id=${user.id}`, {
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { ForumTopic, ForumCategory } from '@/types';
+import { fetchForumTopicContent } from '@/utils/forumTopicContent';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Textarea } from '@/components/ui/textarea';
@@ -110,7 +111,7 @@ export const AdminForumModeration = ({ topics, onRefresh, currentUserId }: Admin
     fetchCategories();
   };
 
-  const handleEditTopic = (topic: ForumTopic) => {
+  const handleEditTopic = async (topic: ForumTopic) => {
     setEditingTopic(topic);
     setEditTitle(topic.title);
     setEditContent(topic.content || '');
@@ -118,6 +119,13 @@ export const AdminForumModeration = ({ topics, onRefresh, currentUserId }: Admin
     setEditIsPinned(topic.is_pinned);
     setEditIsClosed(false);
     fetchCategories();
+    if (topic.content === undefined) {
+      try {
+        setEditContent(await fetchForumTopicContent(FORUM_URL, topic.id));
+      } catch (error) {
+        console.error('Ошибка загрузки текста темы:', error);
+      }
+    }
   };
 
   const handleSaveEdit = async () => {
@@ -40,7 +40,7 @@ const AdminTopicsTab = ({ topics, onEditTopic, onDeleteTopic, onUpdateViews }: A
                   )}
                 </div>
                 <p className="text-xs sm:text-sm text-muted-foreground mb-2 line-clamp-2">
-                  {topic.content?.substring(0, 150)}...
+                  {(topic.excerpt ?? topic.content)?.substring(0, 150)}...
                 </p>
                 <div className="flex flex-wrap items-center gap-3 sm:gap-4 text-xs text-muted-foreground">
                   <span className="flex items-center gap-1">
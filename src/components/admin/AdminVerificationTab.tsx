@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button';
 import { Textarea } from '@/components/ui/textarea';
 import { useToast } from '@/hooks/use-toast';
@@ -22,8 +22,6 @@ interface VerificationRequest {
   birth_date: string;
   has_passport: boolean;
   has_selfie: boolean;
-  passport_photo?: string;
-  selfie_photo?: string;
   status: string;
   admin_comment?: string;
   created_at: string;
@@ -34,6 +32,78 @@ interface AdminVerificationTabProps {
   currentUser: User;
 }
 
+interface VerificationPhotoProps {
+  requestId: number;
+  kind: 'passport' | 'selfie';
+  userId: number;
+  width?: number;
+  alt: string;
+  className?: string;
+}
+
+// Фото заявки грузится отдельным запросом (нужен X-User-Id) и только когда попадает в область видимости
+const VerificationPhoto = ({ requestId, kind, userId, width, alt, className }: VerificationPhotoProps) => {
+  const containerRef = useRef<HTMLDivElement>(null);
+  const [visible, setVisible] = useState(false);
+  const [src, setSrc] = useState<string | null>(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    const element = containerRef.current;
+    if (!element) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some(entry => entry.isIntersecting)) {
+        setVisible(true);
+        observer.disconnect();
+      }
+    }, { rootMargin: '200px' });
+    observer.observe(element);
+    return () => observer.disconnect();
+  }, []);
+
+  useEffect(() => {
+    if (!visible) return;
+    let objectUrl: string | null = null;
+    let cancelled = false;
+
+    fetch(`${VERIFICATION_URL}?action=photo&request_id=${requestId}&kind=${kind}${width ? `&w=${width}` : ''}`, {
+      headers: { 'X-User-Id': userId.toString() }
+    })
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.blob();
+      })
+      .then(blob => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(blob);
+        setSrc(objectUrl);
+      })
+      .catch(error => {
+        console.error('Ошибка загрузки фото:', error);
+        if (!cancelled) setFailed(true);
+      });
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [visible, requestId, kind, userId, width]);
+
+  return (
+    <div ref={containerRef}>
+      {src ? (
+        <img src={src} alt={alt} className={className} />
+      ) : failed ? (
+        <div className="flex items-center justify-center bg-muted rounded-lg border text-muted-foreground p-4">
+          <Icon name="ImageOff" size={24} />
+        </div>
+      ) : (
+        <div className={`bg-muted rounded-lg border animate-pulse ${width ? 'w-20 h-14' : 'w-full h-64'}`} />
+      )}
+    </div>
+  );
+};
+
 const AdminVerificationTab = ({ currentUser }: AdminVerificationTabProps) => {
   const { toast } = useToast();
   const [requests, setRequests] = useState<VerificationRequest[]>([]);
@@ -90,31 +160,10 @@ const AdminVerificationTab = ({ currentUser }: AdminVerificationTabProps) => {
     }
   };
 
-  const handleReview = async (request: VerificationRequest) => {
+  const handleReview = (request: VerificationRequest) => {
     setSelectedRequest(request);
     setAdminComment('');
     setReviewDialogOpen(true);
-    
-    if (!request.passport_photo) {
-      try {
-        const response = await fetch(`${VERIFICATION_URL}?action=get_photos&request_id=${request.id}`, {
-          headers: {
-            'X-User-Id': currentUser.id.toString()
-          }
-        });
-        
-        if (response.ok) {
-          const photos = await response.json();
-          setSelectedRequest({
-            ...request,
-            passport_photo: photos.passport_photo,
-            selfie_photo: photos.selfie_photo
-          });
-        }
-      } catch (error) {
-        console.error('Ошибка загрузки фотографий:', error);
-      }
-    }
   };
 
   const handleSubmitReview = async (status: 'approved' | 'rejected') => {
@@ -237,6 +286,31 @@ const AdminVerificationTab = ({ currentUser }: AdminVerificationTabProps) => {
                     </div>
                   </div>
 
+                  {(request.has_passport || request.has_selfie) && (
+                    <div className="flex gap-2 mb-3">
+                      {request.has_passport && (
+                        <VerificationPhoto
+                          requestId={request.id}
+                          kind="passport"
+                          userId={currentUser.id}
+                          width={160}
+                          alt="Passport"
+                          className="w-20 h-14 object-cover rounded border"
+                        />
+                      )}
+                      {request.has_selfie && (
+                        <VerificationPhoto
+                          requestId={request.id}
+                          kind="selfie"
+                          userId={currentUser.id}
+                          width={160}
+                          alt="Selfie"
+                          className="w-20 h-14 object-cover rounded border"
+                        />
+                      )}
+                    </div>
+                  )}
+
                   {request.admin_comment && (
                     <div className="bg-accent rounded p-2 mb-3 text-sm">
                       <strong>Комментарий:</strong> {request.admin_comment}
@@ -288,18 +362,22 @@ const AdminVerificationTab = ({ currentUser }: AdminVerificationTabProps) => {
 
               <div>
                 <h3 className="font-bold mb-2">Фото паспорта</h3>
-                <img
-                  src={selectedRequest.passport_photo}
+                <VerificationPhoto
+                  requestId={selectedRequest.id}
+                  kind="passport"
+                  userId={currentUser.id}
                   alt="Passport"
                   className="max-w-full rounded-lg border"
                 />
               </div>
 
-              {selectedRequest.selfie_photo && (
+              {selectedRequest.has_selfie && (
                 <div>
                   <h3 className="font-bold mb-2">Селфи с паспортом</h3>
-                  <img
-                    src={selectedRequest.selfie_photo}
+                  <VerificationPhoto
+                    requestId={selectedRequest.id}
+                    kind="selfie"
+                    userId={currentUser.id}
                     alt="Selfie"
                     className="max-w-full rounded-lg border"
                   />
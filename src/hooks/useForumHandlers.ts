@@ -115,7 +115,8 @@ export const useForumHandlers = ({
       setTopicComments(data.comments || []);
       
       if (data.topic) {
-        const updatedTopic = { ...topic, views: data.topic.views };
+        // Список отдаёт только превью, полный текст и счётчики - из ответа по topic_id
+        const updatedTopic = { ...topic, ...data.topic };
         setSelectedTopic(updatedTopic);
         
         setForumTopics(prevTopics => 
@@ -85,7 +85,8 @@ export const useSearchHandlers = ({
 
     forumTopics.forEach(topic => {
       const titleScore = matchesKeywords(topic.title) * 3;
-      const contentScore = topic.content ? matchesKeywords(topic.content) : 0;
+      const preview = topic.excerpt ?? topic.content;
+      const contentScore = preview ? matchesKeywords(preview) : 0;
       const totalScore = titleScore + contentScore;
       
       if (totalScore > 0) {
@@ -93,7 +94,7 @@ export const useSearchHandlers = ({
           type: 'topic',
           id: topic.id,
           title: topic.title,
-          description: topic.content?.substring(0, 100),
+          description: preview?.substring(0, 100),
           score: totalScore
         });
       }
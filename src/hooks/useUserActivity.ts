@@ -2,6 +2,7 @@ import { useEffect, useCallback } from 'react';
 import { User } from '@/types';
 import { notificationsCache } from '@/utils/notificationsCache';
 import { requestCache } from '@/utils/requestCache';
+import { subscribeRealtime } from '@/utils/realtime';
 
 const AUTH_URL = 'https://functions.poehali.dev/2497448a-6aff-4df5-97ef-9181cf792f03';
 const VERIFICATION_URL = 'https://functions.poehali.dev/e0d94580-497a-452f-9044-0ef1b2ff42c8';
@@ -261,6 +262,23 @@ export const useUserActivity = ({
     };
   }, [user, updateActivity, fetchUnreadCount, checkBalanceUpdates, checkVerificationStatus]);
 
+  // Счётчики непрочитанного приходят push-событиями, если настроен шлюз
+  useEffect(() => {
+    if (!user) return;
+
+    const unsubscribe = subscribeRealtime(user.id, ['user'], {
+      counters: (counts) => {
+        setNotificationsUnread(counts.notifications || 0);
+        setMessagesUnread(counts.messages || 0);
+      },
+      resync: () => {
+        fetchUnreadCount();
+      }
+    });
+
+    return () => unsubscribe?.();
+  }, [user?.id, setNotificationsUnread, setMessagesUnread, fetchUnreadCount]);
+
   // Возвращаем методы для явного вызова из компонентов
   return {
     updateActivity,
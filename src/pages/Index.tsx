@@ -284,10 +284,10 @@ const Index = () => {
                   onOpenChange={(open) => {
                     state.setShowNotificationsPanel(open);
                     if (!open) {
-                      fetch(`${NOTIFICATIONS_URL}?action=notifications`, {
+                      fetch(`${NOTIFICATIONS_URL}?action=counters`, {
                         headers: { 'X-User-Id': state.user!.id.toString() }
                       }).then(res => res.json()).then(data => {
-                        state.setNotificationsUnread(data.unread_count || 0);
+                        state.setNotificationsUnread(data.notifications || 0);
                       }).catch(() => {});
                     }
                   }}
@@ -302,10 +302,10 @@ const Index = () => {
                   state.setShowMessagesPanel(open);
                   if (!open) {
                     state.setMessageRecipientId(null);
-                    fetch(`${NOTIFICATIONS_URL}?action=messages`, {
+                    fetch(`${NOTIFICATIONS_URL}?action=counters`, {
                       headers: { 'X-User-Id': state.user!.id.toString() }
                     }).then(res => res.json()).then(data => {
-                      state.setMessagesUnread(data.unread_count || 0);
+                      state.setMessagesUnread(data.messages || 0);
                     }).catch(() => {});
                   }
                 }}
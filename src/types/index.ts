@@ -67,6 +67,8 @@ export interface ForumTopic {
   id: number;
   title: string;
   content?: string;
+  excerpt?: string;
+  content_length?: number;
   views: number;
   is_pinned: boolean;
   created_at: string;
@@ -155,9 +157,11 @@ export interface Deal {
   seller_id: number;
   seller_name: string;
   seller_avatar?: string;
+  seller_last_seen?: string | null;
   buyer_id?: number;
   buyer_name?: string;
   buyer_avatar?: string;
+  buyer_last_seen?: string | null;
   title: string;
   description: string;
   price: number;
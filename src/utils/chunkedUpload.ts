@@ -0,0 +1,82 @@
+// Загрузка вложения частями (upload-attachment action=init/append/complete).
+// Каждая часть отправляется с SHA-256; сервер принимает повторную отправку части
+// идемпотентно, поэтому при сетевом сбое часть просто отправляется заново (до CHUNK_RETRIES раз).
+
+export interface UploadedAttachment {
+  url: string;
+  filename: string;
+  size: number;
+  type: string;
+}
+
+const CHUNK_RETRIES = 3;
+
+const postJson = async (url: string, body: Record<string, unknown>) => {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+
+  let data;
+  try {
+    data = await response.json();
+  } catch (parseError) {
+    throw new Error(`Ответ сервера не является JSON (статус ${response.status})`);
+  }
+
+  if (!response.ok) {
+    const error = new Error(data.error || `HTTP ${response.status}`) as Error & { status?: number };
+    error.status = response.status;
+    throw error;
+  }
+  return data;
+};
+
+const sha256Hex = async (buffer: ArrayBuffer) => {
+  const digest = await crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+};
+
+const toBase64 = (buffer: ArrayBuffer) => {
+  const bytes = new Uint8Array(buffer);
+  let binary = '';
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+};
+
+export const uploadFileInChunks = async (
+  url: string,
+  file: File,
+  onProgress?: (uploaded: number, total: number) => void
+): Promise<UploadedAttachment> => {
+  const upload = await postJson(url, {
+    action: 'init',
+    filename: file.name,
+    content_type: file.type || 'application/octet-stream',
+    size: file.size
+  });
+
+  for (let index = 0; index < upload.chunks_total; index++) {
+    const start = index * upload.chunk_size;
+    const buffer = await file.slice(start, start + upload.chunk_size).arrayBuffer();
+    const chunk = { action: 'append', upload_id: upload.upload_id, index, chunk_data: toBase64(buffer), sha256: await sha256Hex(buffer) };
+
+    for (let attempt = 1; ; attempt++) {
+      try {
+        await postJson(url, chunk);
+        break;
+      } catch (error) {
+        const status = (error as { status?: number }).status;
+        // Ошибки протокола (размер, контрольная сумма) повтор не исправит
+        if (attempt >= CHUNK_RETRIES || (status && status < 500)) throw error;
+      }
+    }
+    onProgress?.(Math.min(file.size, start + buffer.byteLength), file.size);
+  }
+
+  const data = await postJson(url, { action: 'complete', upload_id: upload.upload_id });
+  return { url: data.url, filename: data.filename, size: data.size, type: data.content_type };
+};
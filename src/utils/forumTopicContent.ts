@@ -0,0 +1,7 @@
+// Список тем форума отдаёт только превью (excerpt); полный текст темы
+// для редактирования запрашивается отдельно по topic_id.
+export const fetchForumTopicContent = async (forumUrl: string, topicId: number): Promise<string> => {
+  const response = await fetch(`${forumUrl}?topic_id=${topicId}`);
+  const data = await response.json();
+  return data.topic?.content || '';
+};
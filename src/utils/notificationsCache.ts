@@ -33,10 +33,7 @@ class NotificationsCache {
   private async fetchCounts(userId: number, userRole: string): Promise<NotificationCounts | null> {
     try {
       const requests = [
-        fetch(`${NOTIFICATIONS_URL}?action=notifications`, {
-          headers: { 'X-User-Id': userId.toString() }
-        }),
-        fetch(`${NOTIFICATIONS_URL}?action=messages`, {
+        fetch(`${NOTIFICATIONS_URL}?action=counters`, {
           headers: { 'X-User-Id': userId.toString() }
         })
       ];
@@ -51,15 +48,14 @@ class NotificationsCache {
       }
 
       const responses = await Promise.all(requests);
-      const [notifRes, msgRes, adminNotifRes] = responses;
+      const [countersRes, adminNotifRes] = responses;
 
-      if (notifRes.ok && msgRes.ok) {
-        const notifData = await notifRes.json();
-        const msgData = await msgRes.json();
+      if (countersRes.ok) {
+        const countersData = await countersRes.json();
         
         const counts: NotificationCounts = {
-          notifications: notifData.unread_count || 0,
-          messages: msgData.unread_count || 0
+          notifications: countersData.notifications || 0,
+          messages: countersData.messages || 0
         };
 
         if (adminNotifRes && adminNotifRes.ok) {
@@ -0,0 +1,48 @@
+// Push-события от realtime_gateway (SSE) вместо опроса уведомлений и чатов.
+// Без VITE_REALTIME_URL подписка не создаётся и компоненты работают как раньше.
+const REALTIME_URL: string | undefined = import.meta.env.VITE_REALTIME_URL;
+
+export type RealtimeHandlers = Record<string, (data: any) => void>;
+
+/**
+ * Подписаться на каналы шлюза: 'user', 'deal:<id>', 'ticket:<id>'.
+ * Событие resync и переподключение после обрыва вызывают handlers.resync -
+ * пропущенные события нужно перечитать обычным запросом.
+ * @returns функция отписки или null, если шлюз не настроен
+ */
+export const subscribeRealtime = (
+  userId: number,
+  channels: string[],
+  handlers: RealtimeHandlers
+): (() => void) | null => {
+  if (!REALTIME_URL || typeof EventSource === 'undefined') return null;
+
+  const url = new URL('/events', REALTIME_URL);
+  url.searchParams.set('user_id', userId.toString());
+  url.searchParams.set('channels', channels.join(','));
+
+  const source = new EventSource(url.toString());
+  let hadError = false;
+
+  source.onopen = () => {
+    if (hadError) {
+      hadError = false;
+      handlers.resync?.({});
+    }
+  };
+  source.onerror = () => {
+    hadError = true;
+  };
+
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => {
+      try {
+        handler(JSON.parse((e as MessageEvent).data));
+      } catch (error) {
+        console.error('[Realtime] Bad event:', error);
+      }
+    });
+  });
+
+  return () => source.close();
+};